@@ -0,0 +1,527 @@
+"""
+Консольный запуск макросов без графического интерфейса.
+
+В отличие от `python -m romashki_macros`, который загружает конфигурацию
+и создает окно приложения на PyQt5, этот модуль импортирует только модуль
+нужного макроса (и никогда не импортирует PyQt5). Поэтому он быстро запускается
+и подходит для сценариев, запуска по расписанию и замеров производительности.
+
+Формат команды:
+
+    python -m romashki_macros.cli <макрос> <действие> [--files ...] [--jobs N]
+
+Примеры:
+
+    python -m romashki_macros.cli export pdf --folder "D:\\Project" --jobs 3
+    python -m romashki_macros.cli positions missing --files "D:\\Project\\Сборка.cdw"
+    python -m romashki_macros.cli hidden-layers create --files-from drawings.txt --jobs 2
+    python -m romashki_macros.cli stamp fill --folder "D:\\Project" --template "Иванов" --jobs 3
+    python -m romashki_macros.cli select marking "2025\\.0012.*"
+    python -m romashki_macros.cli select query "file ~ Стандартные and name ~ 'Болт М8'"
+    python -m romashki_macros.cli structure table --output structure.ods --time
+
+Если список файлов не задан, действие выполняется с текущим документом
+в уже запущенном экземпляре Компас.
+
+Опции `--time` и `--profile` предназначены для замеров производительности:
+первая выводит время выполнения действия, вторая сохраняет статистику `cProfile`.
+
+Список макросов и действий:
+
+    python -m romashki_macros.cli --help
+    python -m romashki_macros.cli <макрос> --help
+
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import threading
+import time
+import typing
+
+
+class Action:
+    """
+    Действие макроса, доступное из командной строки.
+
+    Функция `handler(args)` выполняет действие и возвращает код завершения программы.
+    Модули макросов импортируются внутри `handler`, только при выполнении действия.
+    """
+    def __init__(
+            self,
+            macro: str,
+            name: str,
+            help: str,
+            handler: typing.Callable[[argparse.Namespace], int],
+            add_arguments: typing.Callable[[argparse.ArgumentParser], None] | None = None,
+            ) -> None:
+        self.macro: str = macro
+        self.name: str = name
+        self.help: str = help
+        self.handler = handler
+        self.add_arguments = add_arguments
+
+
+ACTIONS: list[Action] = []
+
+
+def register_action(
+        macro: str,
+        name: str,
+        help: str,
+        add_arguments: typing.Callable[[argparse.ArgumentParser], None] | None = None,
+        ):
+    """
+    Декоратор для регистрации функции-обработчика действия `name` макроса `macro`.
+    """
+    def _decorator(handler: typing.Callable[[argparse.Namespace], int]):
+        ACTIONS.append(Action(macro, name, help, handler, add_arguments))
+        return handler
+    return _decorator
+
+
+def import_macros(module_name: str):
+    """
+    Импортирует модуль макроса `romashki_macros.macros.<module_name>`.
+    """
+    return importlib.import_module(f"{__package__ or 'romashki_macros'}.macros.{module_name}")
+
+
+def get_files(args: argparse.Namespace, extensions: tuple[str, ...] = ()) -> list[str]:
+    """
+    Возвращает список файлов, заданный опциями `--files`, `--files-from` и `--folder`
+    (для папки - с фильтром по расширениям `extensions`). Пути нормализуются,
+    повторы удаляются.
+    """
+    files: list[str] = []
+    if args.files:
+        files.extend(args.files)
+    if args.files_from:
+        with open(args.files_from, "r", encoding="utf-8-sig") as f:
+            files.extend(line.strip() for line in f if line.strip() != "")
+    if args.folder:
+        extensions = tuple(e.lower() for e in extensions)
+        for dirpath, dirnames, filenames in os.walk(args.folder):
+            for filename in filenames:
+                if len(extensions) == 0 or filename.lower().endswith(extensions):
+                    files.append(os.path.join(dirpath, filename))
+        files.sort()
+    return list(dict.fromkeys(os.path.normpath(os.path.abspath(f)) for f in files))
+
+
+def run_for_documents(
+        files: list[str],
+        instances_count: int,
+        function: typing.Callable[[], typing.Any],
+        do_save: bool = False,
+        ) -> int:
+    """
+    Для каждого документа из `files` открывает его, делает текущим,
+    выполняет `function()`, сохраняет документ (если `do_save == True`)
+    и закрывает его. Документы обрабатываются на `instances_count` скрытых
+    экземплярах Компас (при `instances_count <= 0` - в уже запущенном).
+
+    Если список `files` пуст, `function()` выполняется один раз с текущим документом.
+
+    Возвращает количество документов, обработанных с ошибкой.
+    """
+    from .macros.lib_macros.core import get_app7
+    from .macros.lib_macros.kompas_pool import KompasInstancePool, JobResult
+
+    if len(files) == 0:
+        function()
+        return 0
+
+    def _job(path: str) -> typing.Any:
+        app = get_app7()
+        doc = app.Documents.Open(path, True, not do_save)
+        if doc is None:
+            raise Exception(f"Не удается открыть документ '{path}'")
+        try:
+            app.ActiveDocument = doc
+            result = function()
+            if do_save:
+                doc.Save()
+        finally:
+            doc.Close(0)
+        return result
+
+    def _on_result(jr: JobResult) -> None:
+        if jr.is_ok():
+            print(f"OK   {jr.item!r} ({jr.duration:.2f} с)")
+        else:
+            print(f"FAIL {jr.item!r}: {jr.error}")
+
+    results = KompasInstancePool(instances_count).run(_job, files, _on_result)
+    failed_count = sum(1 for jr in results if not jr.is_ok())
+    print(f"Обработано документов: {len(results) - failed_count}, ошибок: {failed_count}.")
+    return failed_count
+
+
+
+def _add_export_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--assembly", help="сборка: обрабатываются она и все её уникальные компоненты")
+    parser.add_argument("--output-dir", default="", help="папка для экспортированных файлов")
+    parser.add_argument("--log", default="", help="путь к CSV-журналу результатов")
+    parser.add_argument("--force", action="store_true", help="экспортировать даже актуальные файлы")
+
+
+def _export(args: argparse.Namespace, fmt: str) -> int:
+    batch_export = import_macros("batch_export")
+    sources = get_files(args, batch_export.SOURCE_EXTENSIONS[fmt])
+    if args.assembly:
+        sources.extend(batch_export.collect_sources_from_assembly(os.path.abspath(args.assembly)))
+    counts = batch_export.run_batch_export(sources, [fmt], args.output_dir, args.jobs, args.log, args.force)
+    return 1 if counts["FAIL"] > 0 else 0
+
+
+@register_action("export", "pdf", "пакетный экспорт чертежей и спецификаций в PDF", _add_export_arguments)
+def _export_pdf(args: argparse.Namespace) -> int:
+    return _export(args, "pdf")
+
+
+@register_action("export", "png", "пакетный экспорт документов в PNG", _add_export_arguments)
+def _export_png(args: argparse.Namespace) -> int:
+    return _export(args, "png")
+
+
+@register_action("export", "step", "пакетный экспорт 3D-моделей в STEP", _add_export_arguments)
+def _export_step(args: argparse.Namespace) -> int:
+    return _export(args, "step")
+
+
+def _add_thumbnails_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--assembly", help="сборка: миниатюры создаются для неё и всех её уникальных компонентов")
+    parser.add_argument("--cache-folder", default="", help="папка кэша миниатюр")
+
+
+@register_action("thumbnails", "render", "создание PNG-миниатюр 3D-моделей с кэшированием", _add_thumbnails_arguments)
+def _thumbnails_render(args: argparse.Namespace) -> int:
+    thumbnails = import_macros("thumbnails")
+    cache = thumbnails.ThumbnailCache(args.cache_folder) if args.cache_folder else thumbnails.ThumbnailCache()
+    if args.assembly:
+        result = thumbnails.render_assembly_thumbnails(os.path.abspath(args.assembly), cache, None, args.jobs)
+    else:
+        result = thumbnails.render_thumbnails(get_files(args, (".m3d", ".a3d")), cache, None, args.jobs)
+    for source, path in result.items():
+        print(f"{source!r} -> {path!r}")
+    return 0
+
+
+@register_action("positions", "missing", "вывод присутствующих и пропущенных номеров позиций на чертежах")
+def _positions_missing(args: argparse.Namespace) -> int:
+    dwg_positions = import_macros("dwg_positions")
+
+    def _f() -> None:
+        positions = dwg_positions.get_position_leaders()
+        if len(positions) == 0:
+            print("Позиции не найдены")
+            return
+        missing = set(range(min(positions), max(positions) + 1)).difference(positions)
+        print("present", sorted(positions))
+        print("missing", sorted(missing))
+
+    return int(run_for_documents(get_files(args, (".cdw",)), args.jobs, _f) > 0)
+
+
+def _add_positions_check_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--no-update", action="store_true", help="не обновлять кэш структуры сборок перед сверкой")
+
+
+@register_action("positions", "check", "сверка позиций чертежей с составом сборок из кэша структуры", _add_positions_check_arguments)
+def _positions_check(args: argparse.Namespace) -> int:
+    dwg_positions = import_macros("dwg_positions")
+
+    with dwg_positions.StructureCache() as cache:
+        report = dwg_positions.check_drawings_positions(get_files(args, (".cdw",)), cache, args.jobs, not args.no_update)
+    report.print_report()
+    return int(report.has_problems())
+
+
+def _add_hidden_layers_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--layer", type=int, default=900, help="номер скрытого слоя")
+
+
+@register_action("hidden-layers", "create", "создание скрытых слоев во всех видах чертежей", _add_hidden_layers_arguments)
+def _hidden_layers_create(args: argparse.Namespace) -> int:
+    dwg_hidden_layers = import_macros("dwg_hidden_layers")
+    files = get_files(args, (".cdw",))
+    return int(run_for_documents(files, args.jobs, lambda: dwg_hidden_layers.dwg_create_hidden_layers(args.layer), True) > 0)
+
+
+def _add_drawings_maintain_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--op", action="append", default=[], required=True, help="операция конвейера: имя или имя=аргумент (можно задать несколько раз)")
+    parser.add_argument("--log", default="", help="путь к CSV-журналу результатов (для продолжения прерванной обработки)")
+    parser.add_argument("--force", action="store_true", help="обработать документы, даже если они уже обработаны по журналу")
+
+
+@register_action("drawings", "maintain", "конвейер операций (скрытые слои, оформление, формат листа) над множеством чертежей", _add_drawings_maintain_arguments)
+def _drawings_maintain(args: argparse.Namespace) -> int:
+    batch_drawings = import_macros("batch_drawings")
+    pipeline = batch_drawings.parse_pipeline(args.op)
+    files = get_files(args, batch_drawings.SOURCE_EXTENSIONS)
+    counts = batch_drawings.run_maintenance(files, pipeline, args.jobs, args.log, args.force)
+    return int(counts[batch_drawings.STATUS_FAIL] > 0)
+
+
+def _add_stamp_fill_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--template", default="", help="имя шаблона основной надписи из настроек макроса \"Основная надпись\"")
+    parser.add_argument("--cell", action="append", default=[], metavar="НОМЕР=ТЕКСТ", help="значение ячейки (можно указать несколько раз; дополняет шаблон)")
+    parser.add_argument("--date-format", default="", help="формат даты (по умолчанию - из настроек макроса)")
+
+
+def _get_stamp_template(args: argparse.Namespace) -> tuple[dict[int|str, str], str]:
+    from . import config
+    config.cr.init_config()
+    stamp_config = config.cr.macros("stamp")
+    date_format = args.date_format or stamp_config.get("date_format", "%d.%m.%y")
+
+    template: dict[int|str, str] = {}
+    if args.template != "":
+        for t_name, t_data in stamp_config.get("templates", []):
+            if t_name == args.template:
+                template.update(t_data)
+                break
+        else:
+            raise Exception(f"Шаблон основной надписи не найден: {args.template!r}")
+
+    for cell in args.cell:
+        col_id, sep, value = cell.partition("=")
+        if sep == "" or not col_id.strip().isdigit():
+            raise Exception(f"Неверный формат значения ячейки (нужно НОМЕР=ТЕКСТ): {cell!r}")
+        template[int(col_id)] = value.replace("\\n", "\n")
+
+    if len(template) == 0:
+        raise Exception("Не задан ни шаблон (--template), ни значения ячеек (--cell)")
+    return template, date_format
+
+
+@register_action("stamp", "fill", "заполнение по шаблону основных надписей всех листов документов", _add_stamp_fill_arguments)
+def _stamp_fill(args: argparse.Namespace) -> int:
+    stamp = import_macros("stamp")
+    template, date_format = _get_stamp_template(args)
+    files = get_files(args, (".cdw", ".spw"))
+    if len(files) == 0:
+        stamp.stamp_template(template, date_format)
+        return 0
+    report = stamp.stamp_files(files, template, date_format, args.jobs)
+    return int(len(report.failed) > 0)
+
+
+def _add_select_marking_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("regex", help="регулярное выражение для обозначения компонентов")
+
+
+@register_action("select", "marking", "выбор в текущей модели компонентов по обозначению (RegExp)", _add_select_marking_arguments)
+def _select_marking(args: argparse.Namespace) -> int:
+    import re
+    select_by_properties = import_macros("select_by_properties")
+    select_by_properties.select_parts_by_marking_re(re.compile(args.regex, re.DOTALL | re.IGNORECASE))
+    return 0
+
+
+def _add_select_query_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("query", help="запрос, например: marking ^= \"2025.0012\" and not excluded")
+    parser.add_argument("--add", action="store_true", help="добавить к текущему выбору")
+
+
+@register_action("select", "query", "выбор в текущей модели компонентов всех уровней по запросу", _add_select_query_arguments)
+def _select_query(args: argparse.Namespace) -> int:
+    select_by_properties = import_macros("select_by_properties")
+    select_by_properties.select_parts_by_query(args.query, do_add=args.add)
+    return 0
+
+
+def _add_structure_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--output", default="", help="путь к файлу таблицы ODS, XLSX или CSV (по умолчанию - вывод в консоль)")
+    parser.add_argument("--by-levels", action="store_true", help="таблица по уровням вложенности")
+    parser.add_argument("--cached", action="store_true", help="использовать кэш структуры (заново читаются только измененные файлы)")
+
+
+@register_action("structure", "table", "таблица структуры сборки (текущей или из списка файлов)", _add_structure_arguments)
+def _structure_table(args: argparse.Namespace) -> int:
+    bulk_rename = import_macros("bulk_rename")
+    lines: list[list] = []
+
+    def _add_table(c, top_id: int) -> None:
+        if args.by_levels:
+            table = bulk_rename.get_structure_table_by_levels(c, top_id)
+        else:
+            table = bulk_rename.get_structure_table(c, top_id)
+        lines.extend(table + [[]])
+
+    def _f() -> None:
+        doc, toppart = bulk_rename.open_part()
+        c = bulk_rename.PDM_PartsContainer()
+        _add_table(c, bulk_rename.load_part_structure(toppart, c))
+
+    files = get_files(args, (".a3d",))
+    if args.cached:
+        if len(files) == 0:
+            raise Exception("Для работы с кэшем структуры укажите файлы сборок")
+        failed_count = 0
+        with bulk_rename.StructureCache() as cache:
+            for path in files:
+                c = bulk_rename.PDM_PartsContainer()
+                _add_table(c, bulk_rename.load_cached_structure(path, c, cache))
+    else:
+        failed_count = run_for_documents(files, args.jobs, _f)
+
+    if args.output != "":
+        from .utils.sheet_stream import open_sheet_writer
+        with open_sheet_writer(args.output) as w:
+            for line in lines:
+                w.write_row(line)
+        print(f"Таблица сохранена в '{args.output}'")
+    else:
+        for line in lines:
+            print("\t".join(str(v) for v in line))
+    return int(failed_count > 0)
+
+
+
+def _add_properties_write_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("table", help="файл ODS или XLSX с листом PROPERTIES (или CSV): обозначение, наименование, путь к файлу, комментарий")
+
+
+@register_action("properties", "write", "пакетная запись обозначений, наименований и комментариев из таблицы", _add_properties_write_arguments)
+def _properties_write(args: argparse.Namespace) -> int:
+    bulk_rename = import_macros("bulk_rename")
+    report = bulk_rename.rename_parts_from_file(args.table, args.jobs)
+    return int(len(report.failed) > 0)
+
+
+def _add_properties_edit_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--watch", action="store_true", help="записывать изменения после каждого сохранения таблицы (до нажатия Ctrl+C)")
+
+
+@register_action("properties", "edit", "редактирование свойств выбранных компонентов в табличном редакторе", _add_properties_edit_arguments)
+def _properties_edit(args: argparse.Namespace) -> int:
+    bulk_rename = import_macros("bulk_rename")
+    from . import config
+
+    session = bulk_rename.start_rename_session(config.PROGRAM_TEMP_FOLDER)
+    if args.watch:
+        stop_event = threading.Event()
+        try:
+            bulk_rename.watch_rename_session(session, stop_event, args.jobs)
+        except KeyboardInterrupt:
+            pass
+    else:
+        input("Отредактируйте и сохраните таблицу, затем нажмите Enter для записи свойств...")
+
+    report = bulk_rename.apply_rename_session(session, args.jobs)
+    return int(len(report.failed) > 0)
+
+
+def _add_where_used_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("path", help="файл модели, применяемость которого нужно определить")
+    parser.add_argument("--project", required=True, help="папка проекта")
+    parser.add_argument("--direct", action="store_true", help="только сборки, в которые файл входит непосредственно")
+
+
+@register_action("where-used", "find", "сборки папки проекта, в которые входит файл модели", _add_where_used_arguments)
+def _where_used_find(args: argparse.Namespace) -> int:
+    from .macros.lib_macros import where_used
+    from .macros.lib_macros.structure_cache import StructureCache
+
+    with StructureCache() as cache:
+        where_used.update_where_used_index(args.project, cache)
+        if args.direct:
+            result = where_used.get_direct_parents(args.path, cache)
+        else:
+            result = list(where_used.get_where_used(args.path, cache).items())
+
+    for parent, count in result:
+        print(f"{count}\t{parent}")
+    print(f"Найдено сборок: {len(result)}")
+    return 0
+
+
+def _add_where_used_missing_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--project", required=True, help="папка проекта")
+
+
+@register_action("where-used", "missing", "компоненты с ненайденными файлами во всех сборках папки проекта", _add_where_used_missing_arguments)
+def _where_used_missing(args: argparse.Namespace) -> int:
+    bulk_rename = import_macros("bulk_rename")
+
+    with bulk_rename.StructureCache() as cache:
+        parents, replacements = bulk_rename.find_missing_paths_indexed(args.project, cache)
+
+    for basename, new_path in replacements.items():
+        print(f"{basename!r} -> {new_path!r}")
+    print(f"Компонентов с ненайденными файлами: {len(replacements)}, в сборках: {len(parents)}")
+    return 0
+
+
+
+def _add_paths_replace_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--project", required=True, help="папка проекта")
+    parser.add_argument("--dry-run", action="store_true", help="только вывести план замены, ничего не изменяя")
+    parser.add_argument("--no-rebuild", action="store_true", help="не перестраивать модели после замены")
+
+
+@register_action("paths", "replace", "замена путей к ненайденным файлам компонентов во всех сборках папки проекта", _add_paths_replace_arguments)
+def _paths_replace(args: argparse.Namespace) -> int:
+    bulk_rename = import_macros("bulk_rename")
+
+    with bulk_rename.StructureCache() as cache:
+        parents, replacements = bulk_rename.find_missing_paths_indexed(args.project, cache)
+        counts = bulk_rename.replace_paths(parents, replacements, args.jobs, args.dry_run, cache, not args.no_rebuild)
+    return int(counts["FAIL"] > 0)
+
+
+
+def create_parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    g = common.add_argument_group("общие опции")
+    g.add_argument("--files", nargs="+", help="список файлов документов")
+    g.add_argument("--files-from", help="текстовый файл со списком путей к документам (по одному на строку)")
+    g.add_argument("--folder", help="папка с документами (обходится рекурсивно)")
+    g.add_argument("--jobs", type=int, default=0, help="количество скрытых экземпляров Компас (0 - использовать запущенный)")
+    g.add_argument("--time", action="store_true", help="вывести время выполнения действия")
+    g.add_argument("--profile", default="", help="сохранить статистику cProfile в указанный файл")
+
+    parser = argparse.ArgumentParser(
+        prog="python -m romashki_macros.cli",
+        description="Запуск макросов RomashkiMacros из командной строки без графического интерфейса.",
+    )
+    macros_subparsers = parser.add_subparsers(dest="macro", metavar="<макрос>", required=True)
+
+    actions_subparsers: dict[str, argparse._SubParsersAction] = {}
+    for action in ACTIONS:
+        if not action.macro in actions_subparsers:
+            p = macros_subparsers.add_parser(action.macro, help=f"действия: {', '.join(a.name for a in ACTIONS if a.macro == action.macro)}")
+            actions_subparsers[action.macro] = p.add_subparsers(dest="action", metavar="<действие>", required=True)
+        p = actions_subparsers[action.macro].add_parser(action.name, help=action.help, description=action.help, parents=[common])
+        if action.add_arguments is not None:
+            action.add_arguments(p)
+        p.set_defaults(handler=action.handler)
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = create_parser().parse_args(argv)
+
+    t0 = time.perf_counter()
+    if args.profile != "":
+        import cProfile
+        profiler = cProfile.Profile()
+        rc = profiler.runcall(args.handler, args)
+        profiler.dump_stats(args.profile)
+        print(f"Статистика cProfile сохранена в '{args.profile}'")
+    else:
+        rc = args.handler(args)
+
+    if args.time:
+        print(f"Время выполнения '{args.macro} {args.action}': {time.perf_counter() - t0:.3f} с")
+    return rc
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Модуль предоставляет классы для выполнения функций макросов в фоновом потоке,
+чтобы длительные макросы не "замораживали" окно приложения.
+
+Фоновый поток инициализирует COM (`pythoncom.CoInitialize()`) и привязывает
+к себе `progress.ProgressContext`, через который функция макроса сообщает
+о ходе выполнения и проверяет запрос отмены (см. `macros.lib_macros.progress`).
+Результат, исключение и сообщения о ходе выполнения передаются в поток
+графического интерфейса через сигналы Qt.
+
+"""
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+import pythoncom
+import traceback
+import typing
+
+from ..macros.lib_macros import progress
+
+
+class MacrosThread(QtCore.QThread):
+    """
+    Поток для выполнения функции макроса `func`.
+    """
+
+    progress_changed = QtCore.pyqtSignal(int, int, str)
+    """ Signature: `progress_changed(done: int, total: int, text: str)` """
+
+    succeeded = QtCore.pyqtSignal(object)
+    """ Signature: `succeeded(result: object)` """
+
+    failed = QtCore.pyqtSignal(object, str)
+    """ Signature: `failed(e: Exception, traceback_text: str)` """
+
+    cancelled = QtCore.pyqtSignal()
+
+    def __init__(self, func: typing.Callable[[], typing.Any], parent = None) -> None:
+        super().__init__(parent)
+        self._func = func
+        self._context = progress.ProgressContext(self.progress_changed.emit)
+
+    def cancel(self) -> None:
+        """ Запрашивает кооперативную отмену (см. `progress.check_cancelled()`). """
+        self._context.cancel()
+
+    def is_cancel_requested(self) -> bool:
+        return self._context.is_cancelled()
+
+    def run(self) -> None:
+        pythoncom.CoInitialize()
+        progress.set_context(self._context)
+        try:
+            result = self._func()
+        except progress.CancelledError:
+            print("Выполнение макроса отменено.")
+            self.cancelled.emit()
+        except Exception as e:
+            tb = traceback.format_exc()
+            print(tb)
+            self.failed.emit(e, tb)
+        else:
+            self.succeeded.emit(result)
+        finally:
+            progress.set_context(None)
+            pythoncom.CoUninitialize()
+
+
+class MacrosProgressDialog(QtWidgets.QProgressDialog):
+    """
+    Немодальное окно хода выполнения фонового макроса с кнопкой отмены.
+    Появляется, только если макрос выполняется дольше полсекунды.
+    """
+    def __init__(self, title: str, thread: MacrosThread, parent = None) -> None:
+        super().__init__(title, "Отмена", 0, 0, parent)
+        self._title = title
+        self.setWindowTitle(title)
+        self.setWindowModality(QtCore.Qt.WindowModality.NonModal)
+        self.setMinimumDuration(500)
+        self.setAutoClose(False)
+        self.setAutoReset(False)
+
+        thread.progress_changed.connect(self.set_progress)
+        self.canceled.connect(thread.cancel)
+        self.canceled.connect(lambda: self.setLabelText(f"{self._title}\nОтмена..."))
+
+    def set_progress(self, done: int, total: int, text: str) -> None:
+        if total > 0:
+            self.setMaximum(total)
+            self.setValue(min(done, total))
+        else:
+            self.setMaximum(0)
+        self.setLabelText(self._title if text == "" else f"{self._title}\n{text}")
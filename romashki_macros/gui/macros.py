@@ -7,6 +7,7 @@ from PyQt5 import QtCore, QtGui, QtWidgets
 import traceback
 
 from .. import config
+from .executor import MacrosThread, MacrosProgressDialog
 
 
 class Macros(QtCore.QObject):
@@ -24,6 +25,9 @@ class Macros(QtCore.QObject):
     toolbar_update_requested = QtCore.pyqtSignal(bool)
     """Signature: `toolbar_update_requested(is_immediate: bool)` """
 
+    _background_thread: MacrosThread|None = None
+    """ Фоновый поток выполняющегося макроса (общий для всех макросов, см. `execute_in_background()`). """
+
     def __init__(self, code_name: str, full_name: str) -> None:
         super().__init__()
         self.code_name = code_name
@@ -81,7 +85,13 @@ class Macros(QtCore.QObject):
         Функция `func`, как правило, работает с Компас-API и может выбросить
         исключение (Exception). Это исключение перехватится в этом методе и
         выведется в виде всплывающего сообщения на экран.
+
+        Пока в фоне выполняется другой макрос (см. `execute_in_background()`),
+        `func` не вызывается.
         """
+        if Macros.is_background_busy():
+            self.show_warning("Дождитесь завершения выполняющегося макроса или отмените его.")
+            return False
         QtWidgets.qApp.setOverrideCursor(QtCore.Qt.CursorShape.WaitCursor)
         try:
             func()
@@ -92,15 +102,61 @@ class Macros(QtCore.QObject):
         QtWidgets.qApp.restoreOverrideCursor()
         return True
 
-    def show_error(self, text: str = "Произошла ошибка", e: Exception|None = None) -> None:
+    def execute_in_background(self, func, title: str = "") -> bool:
+        """
+        Запускает функцию `func` в фоновом потоке (см. `gui.executor.MacrosThread`)
+        и сразу возвращает управление, не "замораживая" окно приложения.
+
+        Функция `func` может сообщать о ходе выполнения и проверять запрос
+        отмены через `macros.lib_macros.progress`; ход выполнения отображается
+        в немодальном окне с кнопкой отмены. Исключения перехватываются
+        и выводятся так же, как в `execute()`.
+
+        Одновременно в фоне может выполняться только один макрос.
+        Возвращает `False`, если запуск не выполнен.
+        """
+        if Macros.is_background_busy():
+            self.show_warning("Дождитесь завершения выполняющегося макроса или отмените его.")
+            return False
+
+        if title == "":
+            title = self.full_name
+
+        th = MacrosThread(func, self)
+        dialog = MacrosProgressDialog(title, th, self._parent_widget)
+
+        def _finished() -> None:
+            dialog.reset()
+            dialog.deleteLater()
+            Macros._background_thread = None
+            th.deleteLater()
+
+        th.failed.connect(lambda e, tb: self.show_error(e=e, tb=tb))
+        th.finished.connect(_finished)
+
+        Macros._background_thread = th
+        th.start()
+        return True
+
+    @staticmethod
+    def is_background_busy() -> bool:
+        """ Возвращает `True`, если в фоне выполняется какой-либо макрос. """
+        return Macros._background_thread is not None
+
+    def show_error(self, text: str = "Произошла ошибка", e: Exception|None = None, tb: str = "") -> None:
         """
         Отображает всплывающее сообщение об ошибке.
+
+        `tb` - текст трассировки; если не задан, берется трассировка текущего
+        обрабатываемого исключения.
         """
+        if tb == "":
+            tb = traceback.format_exc()
         if e is None:
             e_str = ""
         else:
-            e_str = f"<br>{e.__class__.__name__}: {str(e)}<br><pre>{traceback.format_exc()}</pre>"
-        print(traceback.format_exc())
+            e_str = f"<br>{e.__class__.__name__}: {str(e)}<br><pre>{tb}</pre>"
+        print(tb)
         QtWidgets.QMessageBox.critical(
             self._parent_widget,
             "Ошибка",
@@ -0,0 +1,322 @@
+"""
+Макрос для пакетного обслуживания 2D-документов (чертежей) проекта.
+
+Макросы `dwg_hidden_layers` и `sheet_layout` работают только с текущим
+документом. Этот макрос применяет к множеству документов конвейер операций:
+* каждый документ открывается один раз, делается текущим, к нему по очереди
+    применяются все операции конвейера, и он сохраняется один раз - только
+    если хотя бы одна операция его изменила;
+* документы распределяются по нескольким скрытым экземплярам Компас
+    (см. `lib_macros.kompas_pool`);
+* результаты записываются в CSV-журнал; при повторном запуске с тем же журналом
+    и тем же конвейером уже обработанные документы пропускаются, поэтому
+    прерванную обработку можно продолжить.
+
+Операции регистрируются декоратором `register_operation()`. Операция - это
+функция `operation(argument: str) -> bool`, которая изменяет текущий документ
+и возвращает `True`, если документ был изменен. Конвейер задается строками
+вида `"имя"` или `"имя=аргумент"`, например:
+
+    hidden-layers=900
+    layout-library=D:\\Templates\\company.lyt
+    sheet-format=A3,h
+
+Для этого макроса нет GUI-интерфейса. Запускать макрос следует командой:
+
+    python -m romashki_macros.macros.batch_drawings --folder "D:\\Project" --op layout-library=D:\\company.lyt --op hidden-layers --jobs 3 --log D:\\maintenance.csv
+
+"""
+
+from .lib_macros.core import *
+from .lib_macros import progress
+from .lib_macros.kompas_pool import KompasInstancePool, JobResult
+from .lib_macros.drawing_index import invalidate_drawing_index
+
+from . import dwg_hidden_layers
+from . import sheet_layout
+
+from ..utils.file_utils import ensure_folder
+
+import csv
+import datetime
+
+
+SOURCE_EXTENSIONS: tuple[str, ...] = (".cdw", ".frw")
+""" Расширения 2D-документов, которые обрабатываются при обходе папки. """
+
+STATUS_OK = "OK"
+""" документ изменен и сохранен """
+STATUS_SKIP = "SKIP"
+""" документ не изменился """
+STATUS_DONE = "DONE"
+""" документ обработан при предыдущем запуске (по журналу) """
+STATUS_FAIL = "FAIL"
+
+
+class Operation:
+    def __init__(self, name: str, help: str, function: typing.Callable[[str], bool], default_argument: str = "") -> None:
+        self.name: str = name
+        self.help: str = help
+        self.function: typing.Callable[[str], bool] = function
+        self.default_argument: str = default_argument
+
+
+OPERATIONS: dict[str, Operation] = {}
+
+
+def register_operation(name: str, help: str, default_argument: str = ""):
+    """
+    Декоратор для регистрации операции конвейера с именем `name`.
+    """
+    def _decorator(function: typing.Callable[[str], bool]):
+        OPERATIONS[name] = Operation(name, help, function, default_argument)
+        return function
+    return _decorator
+
+
+@register_operation("hidden-layers", "создание скрытого непечатаемого слоя во всех видах (аргумент - номер слоя)", "900")
+def _op_hidden_layers(argument: str) -> bool:
+    return dwg_hidden_layers.dwg_create_hidden_layers(int(argument)) != 0
+
+
+@register_operation("layout-library", "применение оформления листов из lyt-библиотеки (аргумент - путь; пусто - graphic.lyt)")
+def _op_layout_library(argument: str) -> bool:
+    return sheet_layout.set_sheets_layout_library(argument) != 0
+
+
+@register_operation("sheet-format", "формат первого листа (аргумент - A0...A5 и ориентация: v - вертикальная, h - горизонтальная)", "A4,v")
+def _op_sheet_format(argument: str) -> bool:
+    parts = [p.strip().lower() for p in argument.split(",")]
+    fmt = parts[0].removeprefix("a")
+    if not fmt.isdigit() or not 0 <= int(fmt) <= 5:
+        raise Exception(f"Некорректный формат листа: {argument!r}")
+    orientation = parts[1] if len(parts) > 1 else "v"
+    if not orientation in ("v", "h"):
+        raise Exception(f"Некорректная ориентация листа: {argument!r}")
+    return sheet_layout.set_sheet_format(int(fmt), orientation == "v")
+
+
+class PipelineStep:
+    """
+    Операция конвейера с аргументом.
+    """
+    def __init__(self, operation: Operation, argument: str) -> None:
+        self.operation: Operation = operation
+        self.argument: str = argument
+
+    def __str__(self) -> str:
+        return f"{self.operation.name}={self.argument}"
+
+
+def parse_pipeline(specs: typing.Iterable[str]) -> list[PipelineStep]:
+    """
+    Разбирает строки `"имя"` или `"имя=аргумент"` в конвейер операций.
+    """
+    pipeline: list[PipelineStep] = []
+    for spec in specs:
+        name, sep, argument = spec.partition("=")
+        name = name.strip()
+        if not name in OPERATIONS:
+            raise Exception(f"Неизвестная операция {name!r}. Доступные операции: {', '.join(OPERATIONS)}")
+        operation = OPERATIONS[name]
+        pipeline.append(PipelineStep(operation, argument.strip() if sep != "" else operation.default_argument))
+    if len(pipeline) == 0:
+        raise Exception("Не задано ни одной операции")
+    return pipeline
+
+
+def get_pipeline_signature(pipeline: typing.Iterable[PipelineStep]) -> str:
+    """
+    Возвращает строку, идентифицирующую конвейер в журнале.
+    """
+    return "; ".join(str(step) for step in pipeline)
+
+
+def collect_sources_from_folder(folder: str, extensions: typing.Iterable[str] = SOURCE_EXTENSIONS) -> list[str]:
+    """
+    Возвращает отсортированный список 2D-документов в папке `folder` (рекурсивно).
+    """
+    extensions = tuple(e.lower() for e in extensions)
+    sources: list[str] = []
+    for dirpath, dirnames, filenames in os.walk(folder):
+        for filename in filenames:
+            if filename.lower().endswith(extensions):
+                sources.append(os.path.normpath(os.path.join(dirpath, filename)))
+    sources.sort()
+    return sources
+
+
+def apply_pipeline(filepath: str, pipeline: list[PipelineStep]) -> list[str]:
+    """
+    Открывает документ `filepath`, делает его текущим, применяет к нему
+    все операции конвейера `pipeline` и сохраняет его, если хотя бы одна
+    операция его изменила. Документ, открытый функцией, закрывается.
+
+    Возвращает список имен операций, изменивших документ.
+    Если какая-либо операция не выполнена, документ не сохраняется,
+    а исключение передается дальше.
+    """
+    app = get_app7()
+    doc: KAPI7.IKompasDocument = find_opened_document(filepath)
+    was_opened = doc is not None
+    if not was_opened:
+        doc = app.Documents.Open(filepath, True, False)
+        if doc is None:
+            raise Exception(f"Не удается открыть документ '{filepath}'")
+
+    try:
+        app.ActiveDocument = doc
+        changed: list[str] = []
+        for step in pipeline:
+            try:
+                if step.operation.function(step.argument):
+                    changed.append(step.operation.name)
+            except Exception as e:
+                raise Exception(f"{step.operation.name}: {e}")
+        if len(changed) != 0 and not doc.Save():
+            raise Exception("Не удалось сохранить документ")
+        return changed
+    finally:
+        # индекс чертежа мог быть построен операциями; ссылка на документ
+        # после закрытия может достаться другому документу
+        invalidate_drawing_index(doc)
+        if not was_opened:
+            doc.Close(0)
+
+
+class MaintenanceLog:
+    """
+    Журнал пакетного обслуживания в формате CSV (разделитель `;`).
+
+    Строки журнала: время, статус (`OK`, `SKIP`, `FAIL`), документ, конвейер, сообщение.
+    Журнал дописывается после каждого документа, поэтому по нему можно
+    продолжить прерванную обработку (см. `read_done()`).
+    """
+    def __init__(self, filepath: str) -> None:
+        self.filepath: str = filepath
+        self.counts: dict[str, int] = {STATUS_OK: 0, STATUS_SKIP: 0, STATUS_DONE: 0, STATUS_FAIL: 0}
+        self._file = None
+        self._writer = None
+        if filepath != "":
+            ensure_folder(os.path.dirname(os.path.abspath(filepath)))
+            self._file = open(filepath, "a", encoding="utf-8-sig", newline="")
+            self._writer = csv.writer(self._file, delimiter=";")
+
+    @staticmethod
+    def read_done(filepath: str, signature: str) -> set[str]:
+        """
+        Возвращает множество документов (нормализованные пути), успешно
+        обработанных конвейером `signature` по журналу `filepath`.
+        """
+        done: set[str] = set()
+        if filepath == "" or not os.path.isfile(filepath):
+            return done
+        with open(filepath, "r", encoding="utf-8-sig", newline="") as f:
+            for row in csv.reader(f, delimiter=";"):
+                if len(row) < 4 or row[3] != signature:
+                    continue
+                key = os.path.normcase(os.path.abspath(row[2]))
+                if row[1] in (STATUS_OK, STATUS_SKIP):
+                    done.add(key)
+                else:
+                    done.discard(key)
+        return done
+
+    def write(self, status: str, filepath: str, signature: str, message: str = "") -> None:
+        self.counts[status] += 1
+        if status == STATUS_DONE:
+            return  # уже записано при предыдущем запуске
+        print(f"{status:4} {filepath!r} {message}")
+        if self._writer is not None:
+            now = datetime.datetime.now().isoformat(sep=" ", timespec="seconds")
+            self._writer.writerow([now, status, filepath, signature, message])
+            self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def summary(self) -> str:
+        return (
+            f"Изменено и сохранено: {self.counts[STATUS_OK]}, без изменений: {self.counts[STATUS_SKIP]}, "
+            f"обработано ранее: {self.counts[STATUS_DONE]}, ошибок: {self.counts[STATUS_FAIL]}."
+        )
+
+
+def run_maintenance(
+        sources: typing.Iterable[str],
+        pipeline: list[PipelineStep],
+        instances_count: int = 1,
+        log_path: str = "",
+        force: bool = False,
+        ) -> dict[str, int]:
+    """
+    Применяет конвейер операций `pipeline` к документам `sources`
+    на `instances_count` скрытых экземплярах Компас
+    (при `instances_count <= 0` - в уже запущенном экземпляре Компас).
+
+    Журнал результатов дописывается в файл `log_path` (если путь задан).
+    Документы, успешно обработанные тем же конвейером по журналу, пропускаются,
+    если не задано `force == True`.
+
+    Возвращает количество документов по статусам.
+    """
+    signature = get_pipeline_signature(pipeline)
+    sources = list(dict.fromkeys(os.path.normpath(os.path.abspath(s)) for s in sources))
+    done = set() if force else MaintenanceLog.read_done(log_path, signature)
+    todo = [s for s in sources if not os.path.normcase(s) in done]
+    print(f"Конвейер: {signature}")
+    print(f"Документов: {len(sources)}, обработано ранее: {len(sources) - len(todo)}.")
+
+    log = MaintenanceLog(log_path)
+    try:
+        for s in sources:
+            if os.path.normcase(s) in done:
+                log.write(STATUS_DONE, s, signature)
+
+        finished_count = 0
+
+        def _on_result(jr: JobResult) -> None:
+            nonlocal finished_count
+            finished_count += 1
+            if not jr.is_ok():
+                log.write(STATUS_FAIL, jr.item, signature, jr.error)
+            elif len(jr.result) != 0:
+                log.write(STATUS_OK, jr.item, signature, ", ".join(jr.result))
+            else:
+                log.write(STATUS_SKIP, jr.item, signature)
+            progress.report(finished_count, len(todo), "Обслуживание документов")
+
+        pool = KompasInstancePool(instances_count)
+        pool.run(lambda path: apply_pipeline(path, pipeline), todo, _on_result)
+        print(log.summary())
+    finally:
+        log.close()
+    return log.counts
+
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(
+        prog="python -m romashki_macros.macros.batch_drawings",
+        description="Пакетное обслуживание чертежей: конвейер операций над множеством документов.",
+        epilog="Операции: " + "; ".join(f"{op.name} - {op.help}" for op in OPERATIONS.values()),
+    )
+    g = parser.add_mutually_exclusive_group(required=True)
+    g.add_argument("--folder", help="папка проекта (обходится рекурсивно)")
+    g.add_argument("--files", nargs="+", help="список файлов документов")
+    parser.add_argument("--op", action="append", default=[], required=True, help="операция конвейера: имя или имя=аргумент (можно задать несколько раз)")
+    parser.add_argument("--jobs", type=int, default=1, help="количество скрытых экземпляров Компас (0 - использовать запущенный)")
+    parser.add_argument("--log", default="", help="путь к CSV-журналу результатов (для продолжения прерванной обработки)")
+    parser.add_argument("--force", action="store_true", help="обработать документы, даже если они уже обработаны по журналу")
+    args = parser.parse_args()
+
+    pipeline = parse_pipeline(args.op)
+    sources = collect_sources_from_folder(args.folder) if args.folder else args.files
+
+    counts = run_maintenance(sources, pipeline, args.jobs, args.log, args.force)
+    sys.exit(1 if counts[STATUS_FAIL] > 0 else 0)
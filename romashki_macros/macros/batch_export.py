@@ -0,0 +1,361 @@
+"""
+Макрос для пакетного экспорта документов проекта в форматы PDF, PNG и STEP.
+
+В отличие от `fast_export`, который работает только с текущим документом,
+этот макрос:
+* собирает список исходных документов из папки (рекурсивно), из списка файлов
+    или из дерева сборки (все уникальные компоненты и сама сборка);
+* формирует очередь заданий "документ -> набор форматов";
+* пропускает задания, для которых экспортированный файл новее исходного документа;
+* выполняет задания на нескольких скрытых экземплярах Компас одновременно
+    (см. `lib_macros.kompas_pool`), открывая каждый документ один раз для всех форматов;
+* записывает журнал результатов в CSV-файл.
+
+Для этого макроса нет GUI-интерфейса. Запускать макрос (например, на ночь
+по расписанию) следует командой:
+
+    python -m romashki_macros.macros.batch_export --folder "D:\\Project" --formats pdf,step --jobs 3
+
+Полный перечень параметров:
+
+    python -m romashki_macros.macros.batch_export --help
+
+"""
+
+from .lib_macros.core import *
+from .lib_macros.kompas_pool import KompasInstancePool, JobResult
+
+from . import fast_export
+
+from ..utils.file_utils import change_ext, ensure_folder
+
+import csv
+import datetime
+
+
+FORMAT_PDF = "pdf"
+FORMAT_PNG = "png"
+FORMAT_STEP = "step"
+
+SOURCE_EXTENSIONS: dict[str, tuple[str, ...]] = {
+    FORMAT_PDF: (".cdw", ".spw", ".kdw"),
+    FORMAT_PNG: (".cdw", ".frw", ".m3d", ".a3d"),
+    FORMAT_STEP: (".m3d", ".a3d"),
+}
+""" Расширения исходных документов, которые можно экспортировать в каждый из форматов. """
+
+TARGET_EXTENSIONS: dict[str, str] = {
+    FORMAT_PDF: "pdf",
+    FORMAT_PNG: "png",
+    FORMAT_STEP: "stp",
+}
+
+ALL_SOURCE_EXTENSIONS: tuple[str, ...] = tuple(sorted(set(sum(SOURCE_EXTENSIONS.values(), ()))))
+
+
+class ExportJob:
+    """
+    Задание на экспорт одного исходного документа `source` в файл `target` формата `fmt`.
+    """
+    def __init__(self, source: str, fmt: str, target: str) -> None:
+        self.source: str = source
+        self.fmt: str = fmt
+        self.target: str = target
+
+    def __repr__(self) -> str:
+        return f"<ExportJob {self.fmt}: {self.source!r} -> {self.target!r}>"
+
+
+def is_up_to_date(source: str, target: str) -> bool:
+    """
+    Проверяет, что файл `target` существует и не старше файла `source`.
+    """
+    try:
+        return os.path.getmtime(target) >= os.path.getmtime(source)
+    except OSError:
+        return False
+
+
+def collect_sources_from_folder(folder: str, extensions: typing.Iterable[str] = ALL_SOURCE_EXTENSIONS) -> list[str]:
+    """
+    Возвращает отсортированный список путей к файлам с расширениями `extensions`
+    в папке `folder` и её подпапках.
+    """
+    extensions = tuple(e.lower() for e in extensions)
+    sources: list[str] = []
+    for dirpath, dirnames, filenames in os.walk(folder):
+        for filename in filenames:
+            if filename.lower().endswith(extensions):
+                sources.append(os.path.normpath(os.path.join(dirpath, filename)))
+    sources.sort()
+    return sources
+
+
+def collect_sources_from_assembly(assembly_path: str) -> list[str]:
+    """
+    Возвращает список путей к файлам сборки `assembly_path` и всех её уникальных
+    компонентов (без компоновочной геометрии), обходя дерево сборки один раз.
+
+    Сборка открывается в Компас в скрытом режиме; сборка, открытая функцией, закрывается.
+    """
+    sources: list[str] = [os.path.normpath(assembly_path)]
+    visited: set[str] = {os.path.normcase(sources[0])}
+
+    def _f(part: KAPI7.IPart7) -> bool:
+        if part.IsLayoutGeometry:
+            return False
+        path = part.FileName
+        if path == "":
+            return False
+        path = os.path.normpath(path)
+        key = os.path.normcase(path)
+        if key in visited:
+            return False  # поддерево уже обойдено
+        visited.add(key)
+        sources.append(path)
+        return True
+
+    was_opened = find_opened_document(assembly_path) is not None
+    doc, toppart = open_part(assembly_path, is_hidden=True)
+    try:
+        apply_to_children_r(toppart, _f)
+    finally:
+        if not was_opened:
+            doc.Close(0)
+    return sources
+
+
+def get_sources_root(sources: typing.Iterable[str]) -> str:
+    """
+    Возвращает общую папку документов `sources`
+    или `""`, если ее нет (например, документы на разных дисках).
+    """
+    folders = [os.path.dirname(os.path.abspath(source)) for source in sources]
+    if len(folders) == 0:
+        return ""
+    try:
+        return os.path.commonpath(folders)
+    except ValueError:
+        return ""
+
+
+def get_target_path(source: str, fmt: str, output_dir: str = "", sources_root: str = "") -> str:
+    """
+    Возвращает путь к экспортированному файлу с расширением формата `fmt`:
+    рядом с исходным документом или, если задана папка `output_dir`, в ней.
+
+    В папке `output_dir` сохраняется структура папок относительно общей папки
+    документов `sources_root` (см. `get_sources_root()`), чтобы одноименные
+    документы из разных папок не записывались в один файл. Если `sources_root`
+    не задана, сохраняется полный путь документа (с буквой диска в виде папки).
+    """
+    target = change_ext(source, TARGET_EXTENSIONS[fmt])
+    if output_dir == "":
+        return target
+    target = os.path.abspath(target)
+    if sources_root != "":
+        relpath = os.path.relpath(target, sources_root)
+    else:
+        drive, tail = os.path.splitdrive(target)
+        relpath = os.path.join(drive.replace(":", "").strip("\\/"), tail.lstrip("\\/"))
+    return os.path.join(output_dir, relpath)
+
+
+def build_job_queue(
+        sources: typing.Iterable[str],
+        formats: typing.Iterable[str],
+        output_dir: str = "",
+        force: bool = False,
+        ) -> tuple[list[ExportJob], list[ExportJob]]:
+    """
+    Формирует очередь заданий экспорта документов `sources` в форматы `formats`.
+
+    Возвращает кортеж `(jobs, skipped)`:
+    * `jobs` - задания, которые нужно выполнить;
+    * `skipped` - задания, для которых экспортированный файл новее исходного
+    документа (при `force == True` не пропускается ничего).
+
+    Документы, которые нельзя экспортировать в формат (например, чертеж в STEP),
+    в очередь не попадают.
+    """
+    formats = list(formats)
+    sources = list(sources)
+    sources_root = get_sources_root(sources) if output_dir != "" else ""
+    for fmt in formats:
+        if not fmt in SOURCE_EXTENSIONS:
+            raise Exception(f"Неизвестный формат экспорта: {fmt!r}")
+
+    jobs: list[ExportJob] = []
+    skipped: list[ExportJob] = []
+    for source in sources:
+        ext = os.path.splitext(source)[1].lower()
+        for fmt in formats:
+            if not ext in SOURCE_EXTENSIONS[fmt]:
+                continue
+            job = ExportJob(source, fmt, get_target_path(source, fmt, output_dir, sources_root))
+            if not force and is_up_to_date(job.source, job.target):
+                skipped.append(job)
+            else:
+                jobs.append(job)
+    return jobs, skipped
+
+
+def group_jobs_by_source(jobs: typing.Iterable[ExportJob]) -> list[list[ExportJob]]:
+    """
+    Группирует задания по исходному документу, чтобы открывать каждый документ один раз.
+    """
+    groups: dict[str, list[ExportJob]] = {}
+    for job in jobs:
+        groups.setdefault(job.source, []).append(job)
+    return list(groups.values())
+
+
+def export_active_document(fmt: str, target: str) -> None:
+    """
+    Экспортирует текущий активный документ в формат `fmt` по пути `target`.
+    """
+    if fmt == FORMAT_PDF:
+        fast_export.save_as(target)
+    elif fmt == FORMAT_PNG:
+        fast_export.export_png_auto(target)
+    elif fmt == FORMAT_STEP:
+        fast_export.export_step(target)
+    else:
+        raise Exception(f"Неизвестный формат экспорта: {fmt!r}")
+
+
+def export_document_jobs(jobs: list[ExportJob]) -> list[str]:
+    """
+    Открывает исходный документ (общий для всех заданий `jobs`), делает его
+    активным, экспортирует во все форматы заданий и закрывает его.
+
+    Возвращает список путей экспортированных файлов.
+    Если хотя бы одно задание не выполнено, выбрасывает исключение.
+    """
+    source = jobs[0].source
+    app = get_app7()
+    doc: KAPI7.IKompasDocument = app.Documents.Open(source, True, True)  # только для чтения
+    if doc is None:
+        raise Exception(f"Не удается открыть документ '{source}'")
+
+    done: list[str] = []
+    errors: list[str] = []
+    try:
+        app.ActiveDocument = doc
+        for job in jobs:
+            try:
+                ensure_folder(os.path.dirname(job.target))
+                export_active_document(job.fmt, job.target)
+                done.append(job.target)
+            except Exception as e:
+                errors.append(f"{job.fmt}: {e}")
+    finally:
+        doc.Close(0)
+
+    if len(errors) != 0:
+        raise Exception("; ".join(errors))
+    return done
+
+
+class ResultsLog:
+    """
+    Журнал результатов пакетного экспорта в формате CSV (разделитель `;`).
+
+    Строки журнала: время, статус (`OK`, `SKIP`, `FAIL`), формат,
+    исходный документ, экспортированный файл, сообщение.
+    """
+    def __init__(self, filepath: str) -> None:
+        self.filepath: str = filepath
+        self.counts: dict[str, int] = {"OK": 0, "SKIP": 0, "FAIL": 0}
+        self._file = None
+        self._writer = None
+        if filepath != "":
+            ensure_folder(os.path.dirname(os.path.abspath(filepath)))
+            self._file = open(filepath, "a", encoding="utf-8-sig", newline="")
+            self._writer = csv.writer(self._file, delimiter=";")
+
+    def write(self, status: str, job: ExportJob, message: str = "") -> None:
+        self.counts[status] += 1
+        print(f"{status:4} {job.fmt:4} {job.source!r} -> {job.target!r} {message}")
+        if self._writer is not None:
+            now = datetime.datetime.now().isoformat(sep=" ", timespec="seconds")
+            self._writer.writerow([now, status, job.fmt, job.source, job.target, message])
+            self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def summary(self) -> str:
+        return f"Экспортировано: {self.counts['OK']}, пропущено: {self.counts['SKIP']}, ошибок: {self.counts['FAIL']}."
+
+
+def run_batch_export(
+        sources: typing.Iterable[str],
+        formats: typing.Iterable[str],
+        output_dir: str = "",
+        instances_count: int = 1,
+        log_path: str = "",
+        force: bool = False,
+        ) -> dict[str, int]:
+    """
+    Выполняет пакетный экспорт документов `sources` в форматы `formats`
+    на `instances_count` скрытых экземплярах Компас
+    (при `instances_count <= 0` - в уже запущенном экземпляре Компас).
+
+    Журнал результатов дописывается в файл `log_path` (если путь задан).
+
+    Возвращает количество заданий по статусам: `{"OK": ..., "SKIP": ..., "FAIL": ...}`.
+    """
+    jobs, skipped = build_job_queue(sources, formats, output_dir, force)
+    print(f"Заданий на экспорт: {len(jobs)}, пропускается актуальных: {len(skipped)}.")
+
+    log = ResultsLog(log_path)
+    try:
+        for job in skipped:
+            log.write("SKIP", job, "экспортированный файл новее исходного документа")
+
+        def _on_result(jr: JobResult) -> None:
+            for job in jr.item:
+                log.write("OK" if jr.is_ok() else "FAIL", job, jr.error)
+
+        pool = KompasInstancePool(instances_count)
+        pool.run(export_document_jobs, group_jobs_by_source(jobs), _on_result)
+        print(log.summary())
+    finally:
+        log.close()
+    return log.counts
+
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(
+        prog="python -m romashki_macros.macros.batch_export",
+        description="Пакетный экспорт документов Компас в PDF/PNG/STEP.",
+    )
+    g = parser.add_mutually_exclusive_group(required=True)
+    g.add_argument("--folder", help="папка проекта (обходится рекурсивно)")
+    g.add_argument("--files", nargs="+", help="список файлов документов")
+    g.add_argument("--assembly", help="сборка: экспортируются она и все её уникальные компоненты")
+    parser.add_argument("--formats", default=FORMAT_PDF, help=f"форматы через запятую: {', '.join(SOURCE_EXTENSIONS)}")
+    parser.add_argument("--output-dir", default="", help="папка для экспортированных файлов с сохранением структуры папок документов (по умолчанию - рядом с документами)")
+    parser.add_argument("--jobs", type=int, default=1, help="количество скрытых экземпляров Компас (0 - использовать запущенный)")
+    parser.add_argument("--log", default="", help="путь к CSV-журналу результатов")
+    parser.add_argument("--force", action="store_true", help="экспортировать даже актуальные файлы")
+    args = parser.parse_args()
+
+    formats = [f.strip().lower() for f in args.formats.split(",") if f.strip() != ""]
+
+    if args.folder:
+        sources = collect_sources_from_folder(args.folder)
+    elif args.files:
+        sources = [os.path.normpath(os.path.abspath(f)) for f in args.files]
+    else:
+        sources = collect_sources_from_assembly(os.path.abspath(args.assembly))
+
+    counts = run_batch_export(sources, formats, args.output_dir, args.jobs, args.log, args.force)
+    sys.exit(1 if counts["FAIL"] > 0 else 0)
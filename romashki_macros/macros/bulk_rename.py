@@ -12,6 +12,7 @@
 Макрос недоработан; работоспособность не гарантируется.
 """
 from .lib_macros.core import *
+from .lib_macros import progress
 
 # from PyQt5 import QtCore, QtGui, QtWidgets
 
@@ -25,8 +26,16 @@ from .lib_macros.core import *
 import traceback
 import subprocess
 import os
+import array
 
 from ..utils import ods_utils
+from ..utils.sheet_stream import iter_sheet_rows, open_sheet_writer
+from ..utils.edit_session import EditSession
+from ..utils.file_catalog import FileCatalog, get_cache_filepath
+from .lib_macros.structure_cache import StructureCache, update_structure, normalize_path
+from .lib_macros.kompas_pool import KompasInstancePool, JobResult
+from .lib_macros.properties import BulkWriteReport, PropertyDescriptors, PropertyReader, write_properties_batches
+from .lib_macros.where_used import update_where_used_index, get_unresolved_children, FILE_CATALOG_CACHE_FOLDER
 
 
 BULK_RENAME_SHEET_NAME = "PROPERTIES"
@@ -42,12 +51,14 @@ PROPERTY_SPECIFICATION_SECTION = 20.0
 
 
 class PDM_Part():
+    __slots__ = ("_id", "_name", "_marking", "_filepath", "_children")
+
     def __init__(self) -> None:
         self._id: int = 0
         self._name: str = ""
         self._marking: str = ""
         self._filepath: str = ""
-        self._children: list[int] = []
+        self._children: array.array = array.array("I")
 
     def name(self) -> str:
         return self._name
@@ -79,37 +90,40 @@ class PDM_Part():
 class PDM_PartsContainer():
     def __init__(self) -> None:
         self._parts: dict[int, PDM_Part] = {}
+        self._ids_by_identity: dict[str, int] = {}
+        self._last_id: int = 0
 
     def register(self, part: PDM_Part) -> tuple[int, bool]:
         """
             Возвращает `(id, True)`, если зарегистрирован новый объект,
             и `(id, False)`, если объект уже есть в контейнере.
         """
-        _id = self.get_part_id(part)
+        identity = part.identity()
+        _id = self._ids_by_identity.get(identity, 0)
         if _id != 0:
             return (_id, False)
 
         _id = self.get_next_id()
+        self._last_id = _id
         self._parts[_id] = part
+        self._ids_by_identity[identity] = _id
         part._id = _id
         return (_id, True)
 
     def get_next_id(self) -> int:
-        s = set(self._parts.keys())
-        s.add(0)
-        return max(s) + 1
+        return self._last_id + 1
 
     def get_part_id(self, part: PDM_Part) -> int:
-        for _id, p in self._parts.items():
-            if p.identity() == part.identity():
-                return _id
-        return 0
+        return self._ids_by_identity.get(part.identity(), 0)
 
     def get_part_by_id(self, _id: int) -> PDM_Part:
         if _id in self._parts:
             return self._parts[_id]
         return PDM_Part()
 
+    def __len__(self) -> int:
+        return len(self._parts)
+
 
 def load_part_structure(part: KAPI7.IPart7, container: PDM_PartsContainer) -> int:
     if part.IsLayoutGeometry:
@@ -121,7 +135,6 @@ def load_part_structure(part: KAPI7.IPart7, container: PDM_PartsContainer) -> in
         return top_id
 
     for child in iterate_child_parts(part):
-        c = PDM_Part.fromKAPI7(child)
         c_id = load_part_structure(child, container)
         if c_id != 0:
             p.add_child(c_id)
@@ -129,14 +142,117 @@ def load_part_structure(part: KAPI7.IPart7, container: PDM_PartsContainer) -> in
     return top_id
 
 
+def load_cached_structure(root_path: str, container: PDM_PartsContainer, cache: StructureCache) -> int:
+    """
+    Загружает структуру файла `root_path` в контейнер `container` из кэша
+    структуры `cache` (без обхода дерева в Компас), предварительно обновив
+    в кэше записи измененных файлов (см. `structure_cache.update_structure()`).
+
+    Аналог `load_part_structure()`.
+    """
+    update_structure(root_path, cache)
+
+    def _load(path: str, name: str = "") -> int:
+        record = cache.get_file(path) if path != "" else None
+        p = PDM_Part()
+        if record is not None:
+            p._name, p._marking, p._filepath = record.name, record.marking, record.path
+        else:
+            p._name = name
+        _id, is_new_obj = container.register(p)
+        if not is_new_obj or record is None:
+            return _id
+
+        for c in cache.get_children(path):
+            if c.is_layout_geometry:
+                continue
+            c_id = _load(c.path, c.name)
+            for _ in range(c.count):
+                p.add_child(c_id)
+        return _id
+
+    return _load(normalize_path(root_path))
+
+
+def get_children_counts(container: PDM_PartsContainer, _id: int) -> list[tuple[int, int]]:
+    """
+    Возвращает список `[(id дочернего компонента, количество вхождений), ...]`
+    в порядке первого вхождения дочерних компонентов.
+    """
+    counts: dict[int, int] = {}
+    for c_id in container.get_part_by_id(_id).iterate_children():
+        counts[c_id] = counts.get(c_id, 0) + 1
+    return list(counts.items())
+
+
+def get_topological_order(container: PDM_PartsContainer, _id: int) -> list[int]:
+    """
+    Возвращает список id всех компонентов структуры `_id` (включая сам `_id`),
+    упорядоченный так, что каждый компонент стоит раньше всех своих дочерних.
+    """
+    order: list[int] = []
+    state: dict[int, bool] = {}  # False - компонент обходится, True - обход завершен
+    stack: list[tuple[int, typing.Iterator[int]]] = [(_id, container.get_part_by_id(_id).iterate_children())]
+    state[_id] = False
+    while len(stack) != 0:
+        p_id, it = stack[-1]
+        for c_id in it:
+            if not c_id in state:
+                state[c_id] = False
+                stack.append((c_id, container.get_part_by_id(c_id).iterate_children()))
+                break
+            if state[c_id] == False:
+                raise Exception(f"Циклическая ссылка в структуре: компонент {container.get_part_by_id(c_id).identity()!r}")
+        else:
+            stack.pop()
+            state[p_id] = True
+            order.append(p_id)
+    order.reverse()
+    return order
+
+
+def get_total_quantities(container: PDM_PartsContainer, _id: int) -> dict[int, int]:
+    """
+    Возвращает словарь `{id компонента: общее количество}` для всех компонентов
+    структуры `_id` (количество самого `_id` равно 1).
+
+    Количества вычисляются за один проход по компонентам в топологическом порядке:
+    количество родителя умножается на количество вхождений один раз для каждой связи
+    "родитель - дочерний компонент", поэтому многократно используемые поддеревья
+    не обходятся повторно.
+    """
+    quantities: dict[int, int] = {_id: 1}
+    for p_id in get_topological_order(container, _id):
+        q = quantities[p_id]
+        for c_id, count in get_children_counts(container, p_id):
+            quantities[c_id] = quantities.get(c_id, 0) + q * count
+    return quantities
+
+
 def get_structure_table_by_levels(container: PDM_PartsContainer, _id: int, level = 0) -> list[list]:
-    toppart = container.get_part_by_id(_id)
-    lines = [
-        [level, toppart.marking(), toppart.name(), toppart.filepath()]
-    ]
-    for c_id in toppart.iterate_children():
-        new_lines = get_structure_table_by_levels(container, c_id, level + 1)
-        lines.extend(new_lines)
+    """
+    Возвращает таблицу структуры по уровням вложенности: строки
+    `[уровень, обозначение, наименование, путь к файлу, количество]`.
+
+    Одинаковые дочерние компоненты одного родителя объединяются в одну строку
+    с количеством вхождений в родителя, поэтому размер таблицы определяется
+    количеством связей "родитель - дочерний компонент", а не количеством экземпляров.
+    Списки дочерних компонентов подсчитываются один раз для каждого компонента.
+    """
+    get_topological_order(container, _id)  # проверка на циклические ссылки
+
+    children_counts: dict[int, list[tuple[int, int]]] = {}
+    lines = []
+    stack: list[tuple[int, int, int]] = [(level, _id, 1)]
+    while len(stack) != 0:
+        p_level, p_id, count = stack.pop()
+        part = container.get_part_by_id(p_id)
+        lines.append([p_level, part.marking(), part.name(), part.filepath(), count])
+
+        if not p_id in children_counts:
+            children_counts[p_id] = get_children_counts(container, p_id)
+        for c_id, c_count in reversed(children_counts[p_id]):
+            stack.append((p_level + 1, c_id, c_count))
     return lines
 
 
@@ -144,16 +260,8 @@ def get_structure_table(container: PDM_PartsContainer, _id: int) -> list[list]:
     toppart = container.get_part_by_id(_id)
 
     # { id: count }
-    top_dict: dict[int, int] = {}
-
-    def _count_children(children: typing.Iterable[int]) -> None:
-        for c_id in children:
-            if not c_id in top_dict:
-                top_dict[c_id] = 0
-            top_dict[c_id] += 1
-            _count_children(container.get_part_by_id(c_id).iterate_children())
-
-    _count_children(toppart.iterate_children())
+    top_dict: dict[int, int] = get_total_quantities(container, _id)
+    del top_dict[_id]
 
     def _get_line(part, count):
         return [part.marking(), part.name(), count, part.filepath()]
@@ -196,68 +304,96 @@ def _print_properties(filename: str = "") -> None:
 
 
 def get_property_value(doc: KAPI7.IKompasDocument, part: KAPI7.IPart7, p_id: float) -> typing.Any:
-    # FIXME doc можно получить через open_document(part.FileName) - ?
-
-    if not isinstance(p_id, float):
-        raise Exception("p_id должно быть типа float")
-
-    app = get_app7()
-    pmng = KAPI7.IPropertyMng(app)
-    pk = KAPI7.IPropertyKeeper(part)
-
-    p: KAPI7.IProperty = pmng.GetProperty(doc, p_id)
+    """
+    Возвращает значение свойства `p_id` компонента `part`.
 
-    _, p_value, is_from_source = pk.GetPropertyValue(p, None, True, None)
-    return p_value
+    Для чтения свойств множества компонентов следует использовать `properties.PropertyReader`.
+    """
+    return PropertyReader(doc, [p_id]).read(part)[0]
 
 
 def set_property_value(doc: KAPI7.IKompasDocument, part: KAPI7.IPart7, p_id: float, p_value: typing.Any) -> bool:
     # FIXME doc можно получить через open_document(part.FileName) - ?
-
-    if not isinstance(p_id, float):
-        raise Exception("p_id должно быть типа float")
-
-    app = get_app7()
-    pmng = KAPI7.IPropertyMng(app)
+    p: KAPI7.IProperty = PropertyDescriptors().get(doc, p_id)
     pk = KAPI7.IPropertyKeeper(part)
+    return pk.SetPropertyValue(p, p_value, True)
 
-    p: KAPI7.IProperty = pmng.GetProperty(doc, p_id)
 
-    return pk.SetPropertyValue(p, p_value, True)
+RENAME_BATCH_SIZE = 1000
+""" Количество строк таблицы, которые `rename_parts()` передает на запись за один раз. """
+
 
+def iterate_rename_batches(
+        data: typing.Iterable[typing.Sequence],
+        batch_size: int = RENAME_BATCH_SIZE,
+        ) -> typing.Iterator[list[tuple[str, dict[float, typing.Any]]]]:
+    """
+    Читает строки таблицы `[обозначение, наименование, путь к файлу, комментарий]`
+    и возвращает изменения свойств `[(файл, {p_id: значение}), ...]`
+    частями не больше `batch_size` строк.
+    """
+    batch: list[tuple[str, dict[float, typing.Any]]] = []
 
-def rename_parts(data: list[tuple[str, str, str]]) -> None:
-    for line in data:
+    for line in progress.iterate(data, text="Изменение свойств"):
         # поле comment может быть пустым, тогда выдается line из 3 значений => not enough values to unpack
-        line = (line + ["", "", "", ""])[:4]
+        line = (list(line) + ["", "", "", ""])[:4]
 
         marking, name, filepath, comment = line
-
-        try:
-            doc, part = open_part(filepath, is_hidden=True)  # FIXME может быть ошибка, если файла по пути не существует
-        except:
-            print("Не удалось открыть документ", filepath)
+        if filepath == "":
             continue
 
-        try:
-            # FIXME свойства почему-то не_меняются в Компас22; но, кажется, менялись в Компас16, когда я в нем работал
-            set_property_value(doc, part, PROPERTY_MARKING, marking)
-            set_property_value(doc, part, PROPERTY_NAME, name)
-            set_property_value(doc, part, PROPERTY_COMMENT, comment)
-            part.Update()
-        except:
-            print("Не удалось изменить свойства в документе", filepath)
-            continue
+        # FIXME свойства почему-то не_меняются в Компас22; но, кажется, менялись в Компас16, когда я в нем работал
+        batch.append((filepath, {
+            PROPERTY_MARKING: marking,
+            PROPERTY_NAME: name,
+            PROPERTY_COMMENT: comment,
+        }))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if len(batch) != 0:
+        yield batch
+
+
+def rename_parts(
+        data: typing.Iterable[typing.Sequence],
+        instances_count: int = 0,
+        batch_size: int = RENAME_BATCH_SIZE,
+        ) -> BulkWriteReport:
+    """
+    Записывает обозначения, наименования и комментарии из строк таблицы
+    `[обозначение, наименование, путь к файлу, комментарий]` в файлы моделей.
 
-        try:
-            doc.Save()
-        except:
-            print("Не удалось сохранить документ", filepath)
+    Строки `data` читаются и записываются частями по `batch_size` строк, поэтому
+    `data` может быть генератором (см. `rename_parts_from_file()`), и вся таблица
+    не загружается в память.
+
+    Файлы, в которых значения не изменились, не открываются на запись и не сохраняются;
+    все части записываются на одних и тех же `instances_count` скрытых экземплярах
+    Компас (см. `properties.write_properties_batches()`). Если файл указан
+    в нескольких строках, в нем остаются значения последней строки.
+    """
+    report = write_properties_batches(iterate_rename_batches(data, batch_size), instances_count)
 
     print("Изменение свойств завершено.")
+    return report
 
 
-def get_selected_parts_properties() -> list[list]:
+def rename_parts_from_file(filepath: str, instances_count: int = 0) -> BulkWriteReport:
+    """
+    Построчно читает таблицу `filepath` (ODS, XLSX или CSV; для ODS и XLSX -
+    лист `BULK_RENAME_SHEET_NAME`) и записывает свойства (см. `rename_parts()`).
+    """
+    return rename_parts(iter_sheet_rows(filepath, BULK_RENAME_SHEET_NAME), instances_count)
+
+
+def iterate_selected_parts_properties(structure_cache: StructureCache | None = None) -> typing.Iterator[list]:
+    """
+    Генератор строк `[обозначение, наименование, путь к файлу, комментарий]`
+    для выбранных компонентов текущей сборки (или для всех компонентов
+    первого уровня, если ничего не выбрано).
+    """
     def ensure_not_None(value):
         if value is None:
             return ""
@@ -269,38 +405,111 @@ def get_selected_parts_properties() -> list[list]:
     if len(parts) == 0:
         parts = iterate_child_parts(toppart)
 
-    lines = []
+    reader = PropertyReader(doc, [PROPERTY_COMMENT], structure_cache=structure_cache)
+
     for part in parts:
-        line = [
+        comment, = reader.read(part)
+        yield [
             ensure_not_None(part.Marking),
             ensure_not_None(part.Name),
             ensure_not_None(part.FileName),
-            ensure_not_None(get_property_value(doc, part, PROPERTY_COMMENT)),
+            ensure_not_None(comment),
         ]
-        lines.append(line)
 
-    return lines
 
+def get_selected_parts_properties(structure_cache: StructureCache | None = None) -> list[list]:
+    return list(iterate_selected_parts_properties(structure_cache))
+
+
+def save_selected_parts_properties(filepath: str, structure_cache: StructureCache | None = None) -> int:
+    """
+    Построчно записывает свойства выбранных компонентов (см. `iterate_selected_parts_properties()`)
+    в таблицу `filepath` (ODS, XLSX или CSV). Возвращает количество строк.
+    """
+    count = 0
+    with open_sheet_writer(filepath, BULK_RENAME_SHEET_NAME) as w:
+        for line in iterate_selected_parts_properties(structure_cache):
+            w.write_row(line)
+            count += 1
+    return count
+
+
+
+BULK_RENAME_KEY_COLUMN = 2
+""" номер столбца с путем к файлу в таблице свойств (ключ строки в `EditSession`) """
+
+
+def start_rename_session(temp_folder: str, structure_cache: StructureCache | None = None) -> EditSession:
+    """
+    Выгружает свойства выбранных компонентов во временный файл ODS в папке `temp_folder`
+    и открывает его на редактирование. Возвращает сеанс редактирования,
+    в котором запомнены хэши выгруженных строк.
+    """
+    os.makedirs(temp_folder, exist_ok=True)
+    session = EditSession(ods_utils.create_temp_ods_filepath(temp_folder), BULK_RENAME_SHEET_NAME, BULK_RENAME_KEY_COLUMN)
+    count = session.export(iterate_selected_parts_properties(structure_cache))
+    print(f"Выгружено строк: {count}")
+    session.open_for_edit()
+    return session
+
+
+def _get_applied_rows(rows: list[list], report: BulkWriteReport) -> list[list]:
+    failed = {os.path.normcase(os.path.abspath(path)) for path in report.failed}
+    return [
+        row for row in rows
+        if not os.path.normcase(os.path.abspath(row[BULK_RENAME_KEY_COLUMN])) in failed
+    ]
+
+
+def apply_rename_session(session: EditSession, instances_count: int = 0) -> BulkWriteReport:
+    """
+    Читает файл сеанса редактирования и записывает свойства только из строк,
+    измененных с момента выгрузки или предыдущего применения (см. `rename_parts()`).
+    Успешно записанные строки отмечаются в сеансе примененными.
+    """
+    rows = session.collect_changes()
+    print(f"Измененных строк: {len(rows)}")
+    if len(rows) == 0:
+        return BulkWriteReport()
+    report = rename_parts(rows, instances_count)
+    session.mark_applied(_get_applied_rows(rows, report))
+    return report
+
+
+def watch_rename_session(session: EditSession, stop_event: threading.Event, instances_count: int = 0) -> None:
+    """
+    Записывает свойства из измененных строк после каждого сохранения файла
+    сеанса редактирования, пока не установлено событие `stop_event`
+    (см. `EditSession.watch()`).
+    """
+    def _on_changes(rows: list[list]) -> list[list]:
+        report = rename_parts(rows, instances_count)
+        return _get_applied_rows(rows, report)
+
+    print(f"Отслеживание сохранений файла '{session.filepath}'")
+    session.watch(_on_changes, stop_event)
 
 
 def import_files_tree(path: str) -> list[str]:
-    files: list[str] = [path]
+    """
+    Возвращает список путей ко всем файлам в папке `path` и её подпапках.
+    """
+    return list(FileCatalog(path).scan().iterate_paths())
+
 
-    if os.path.isfile(path):
-        pass
-    elif os.path.isdir(path):
-        for entry in os.listdir(path):
-            entry = os.path.join(path, entry)
-            files.append(path)
-            files.extend(import_files_tree(entry))
-    else:
-        raise Exception(f"Entry is not a file or a directory:", path)
-    return files
+def get_project_file_catalog(project_dir: str, extensions: typing.Iterable[str] = (".m3d", ".a3d")) -> FileCatalog:
+    """
+    Возвращает каталог файлов папки проекта `project_dir`, отсканированный
+    с использованием кэша в папке `FILE_CATALOG_CACHE_FOLDER`.
+    """
+    catalog = FileCatalog(project_dir, extensions, get_cache_filepath(FILE_CATALOG_CACHE_FOLDER, project_dir))
+    catalog.scan()
+    print(f"Каталог файлов проекта: {len(catalog)} файлов, заново прочитано папок: {catalog.rescanned_dirs_count}")
+    return catalog
 
 
 def find_missing_paths(project_dir: str) -> tuple[set[str], dict[str, str]]:
-    filepaths: list[str] = import_files_tree(project_dir)
-    filebasenames: list[str] = [os.path.basename(file) for file in filepaths]
+    catalog = get_project_file_catalog(project_dir)
 
     iterated_parts: set[str] = set()
     replacements: dict[str, str] = {}  # missing_basename: replacement_path
@@ -312,11 +521,8 @@ def find_missing_paths(project_dir: str) -> tuple[set[str], dict[str, str]]:
             parentpart_path = parentpart.FileName
 
             if not missing_file_basename in replacements:
-                replacements[missing_file_basename] = ""
-                try:
-                    i = filebasenames.index(missing_file_basename)
-                    replacements[missing_file_basename] = filepaths[i]
-                except ValueError:
+                replacements[missing_file_basename] = catalog.find_first(missing_file_basename)
+                if replacements[missing_file_basename] == "":
                     print(f"Пропуск замены, так как путь пустой: {repr(missing_file_basename)} в {repr(parentpart_path)}")
 
             parents.add(parentpart_path)
@@ -332,27 +538,222 @@ def find_missing_paths(project_dir: str) -> tuple[set[str], dict[str, str]]:
     return parents, replacements
 
 
-def replace_paths(parent_paths: typing.Iterable[str], replacements: dict[str, str]) -> None:
-    app = get_app7()
-    prev_hidemessage = app.HideMessage
-    app.HideMessage = 2
+def find_missing_paths_indexed(project_dir: str, cache: StructureCache) -> tuple[set[str], dict[str, str]]:
+    """
+    Аналог `find_missing_paths()`, который не обходит дерево текущей сборки в Компас,
+    а использует индекс применяемости по всей папке проекта `project_dir`
+    (см. `where_used.update_where_used_index()`): через Компас заново читаются
+    только измененные сборки.
+    """
+    update_where_used_index(project_dir, cache)
+    catalog = get_project_file_catalog(project_dir)
+
+    replacements: dict[str, str] = {}  # missing_basename: replacement_path
+    parents: set[str] = set()
 
-    for parent_path in parent_paths:
-        print(repr(parent_path))
-        doc, parentpart = open_part(parent_path, True)
+    for parentpart_path, missing_file_basename in get_unresolved_children(cache):
+        if not missing_file_basename in replacements:
+            replacements[missing_file_basename] = catalog.find_first(missing_file_basename)
+            if replacements[missing_file_basename] == "":
+                print(f"Пропуск замены, так как путь пустой: {repr(missing_file_basename)} в {repr(parentpart_path)}")
+        parents.add(parentpart_path)
+
+    return parents, replacements
+
+
+class ParentPathsPlan:
+    """
+    План замены путей в одной родительской модели `parent_path`:
+    `edits` - `{наименование компонента с ненайденным файлом: новый путь}`.
+
+    `level` - уровень выполнения: модели одного уровня не входят друг в друга
+    и могут обрабатываться одновременно; модели уровня `n` обрабатываются
+    после всех моделей уровней `< n`, которые в них входят.
+    `None` - уровень неизвестен (нет кэша структуры), модели обрабатываются последовательно.
+    """
+    def __init__(self, parent_path: str, edits: dict[str, str], level: int | None = None) -> None:
+        self.parent_path: str = parent_path
+        self.edits: dict[str, str] = edits
+        self.level: int | None = level
+
+    def __repr__(self) -> str:
+        return f"<ParentPathsPlan {self.parent_path!r} level={self.level} edits={len(self.edits)}>"
+
+
+def plan_path_replacements(
+        parent_paths: typing.Iterable[str],
+        replacements: dict[str, str],
+        cache: StructureCache | None = None,
+        ) -> list[ParentPathsPlan]:
+    """
+    Составляет план замены путей `replacements` (`{наименование: новый путь}`,
+    см. `find_missing_paths()`) в родительских моделях `parent_paths`.
+
+    Замены с пустым новым путем в план не попадают.
+
+    Если задан кэш структуры `cache`, то для моделей с актуальными записями в план
+    попадают только те замены, которые соответствуют компонентам с ненайденными
+    файлами этой модели (модели без таких компонентов пропускаются), и вычисляются
+    уровни выполнения (см. `ParentPathsPlan.level`). Без кэша уровни
+    не вычисляются (`None`), и модели обрабатываются последовательно.
+    """
+    edits_all = {name: path for name, path in replacements.items() if path != ""}
+
+    plans: list[ParentPathsPlan] = []
+    for parent_path in dict.fromkeys(parent_paths):
+        edits = edits_all
+        if cache is not None and cache.is_up_to_date(parent_path):
+            missing_names = {c.name for c in cache.get_children(parent_path) if c.path == ""}
+            edits = {name: path for name, path in edits_all.items() if name in missing_names}
+        if len(edits) != 0:
+            plans.append(ParentPathsPlan(parent_path, dict(edits)))
+
+    if cache is not None:
+        _assign_plan_levels(plans, cache)
+    return plans
+
+
+def _assign_plan_levels(plans: list[ParentPathsPlan], cache: StructureCache) -> None:
+    keys = {normalize_path(pp.parent_path): pp for pp in plans}
+
+    # { модель: модели плана, входящие в её поддерево (на любом уровне) }
+    nested: dict[str, set[str]] = {}
+
+    def _nested(key: str) -> set[str]:
+        if not key in nested:
+            nested[key] = set()  # защита от циклических ссылок
+            result: set[str] = set()
+            for c in cache.get_children(key):
+                if c.path == "":
+                    continue
+                if c.path in keys:
+                    result.add(c.path)
+                result |= _nested(c.path)
+            nested[key] = result
+        return nested[key]
+
+    levels: dict[str, int] = {}
+
+    def _level(key: str) -> int:
+        if not key in levels:
+            levels[key] = 0
+            levels[key] = max((_level(k) + 1 for k in _nested(key)), default=0)
+        return levels[key]
+
+    for key, pp in keys.items():
+        pp.level = _level(key)
+
+
+def format_paths_plan(plans: list[ParentPathsPlan]) -> str:
+    """
+    Возвращает текстовое описание плана замены путей.
+    """
+    lines = []
+    for pp in sorted(plans, key=lambda pp: (pp.level or 0, pp.parent_path)):
+        lines.append(f"[{pp.level if pp.level is not None else '-'}] {pp.parent_path!r}")
+        for name, new_path in pp.edits.items():
+            lines.append(f"\t{name!r} -> {new_path!r}")
+    return "\n".join(lines)
+
+
+def apply_parent_paths_plan(pp: ParentPathsPlan, do_rebuild: bool = True) -> int:
+    """
+    Открывает родительскую модель, заменяет пути к файлам компонентов по плану `pp`,
+    один раз перестраивает (если `do_rebuild == True`) и сохраняет модель.
+
+    Возвращает количество замененных компонентов.
+    """
+    was_opened = find_opened_document(pp.parent_path) is not None
+    doc, parentpart = open_part(pp.parent_path, True)
+    replaced_count = 0
+    try:
         parts: KAPI7.IParts7 = parentpart.Parts
         for i in range(parts.Count):
             part = parts.Part(i)
-            if part.Name in replacements:
-                new_path = replacements[part.Name]
-                if new_path != "":
-                    print(f"\t{repr(part.Name)} -> {repr(new_path)}")
-                    part.FileName = new_path
-                    part.Update()
-        doc.RebuildDocument()
-        doc.Save()
-
-    app.HideMessage = prev_hidemessage
+            new_path = pp.edits.get(part.Name, "")
+            if new_path != "" and part.FileName == "":
+                part.FileName = new_path
+                part.Update()
+                replaced_count += 1
+        if replaced_count != 0:
+            if do_rebuild:
+                doc.RebuildDocument()
+            doc.Save()
+    finally:
+        if not was_opened:
+            doc.Close(0)
+    print(f"{pp.parent_path!r}: заменено путей: {replaced_count}")
+    return replaced_count
+
+
+def execute_paths_plan(
+        plans: list[ParentPathsPlan],
+        instances_count: int = 0,
+        dry_run: bool = False,
+        do_rebuild: bool = True,
+        ) -> dict[str, int]:
+    """
+    Выполняет план замены путей по уровням: модели одного уровня обрабатываются
+    на `instances_count` скрытых экземплярах Компас одновременно
+    (при `instances_count <= 0` - последовательно в уже запущенном экземпляре Компас).
+
+    Если уровни хотя бы одной модели неизвестны (`ParentPathsPlan.level is None`),
+    то вложенность моделей друг в друга не проверена, и все модели
+    обрабатываются последовательно в уже запущенном экземпляре Компас.
+
+    При `dry_run == True` только выводит план, ничего не изменяя.
+
+    Возвращает `{"OK": ..., "FAIL": ..., "REPLACED": ...}`.
+    """
+    print(format_paths_plan(plans))
+    counts = {"OK": 0, "FAIL": 0, "REPLACED": 0}
+    if dry_run:
+        print(f"Пробный запуск: родительских моделей в плане: {len(plans)}. Изменения не вносились.")
+        return counts
+
+    def _on_result(jr: JobResult) -> None:
+        if jr.is_ok():
+            counts["OK"] += 1
+            counts["REPLACED"] += jr.result
+        else:
+            counts["FAIL"] += 1
+            print(f"Не удалось заменить пути в {jr.item.parent_path!r}: {jr.error}")
+        progress.report(counts["OK"] + counts["FAIL"], len(plans), "Замена путей в родительских моделях")
+
+    if any(pp.level is None for pp in plans):
+        instances_count = 0
+        plans = [ParentPathsPlan(pp.parent_path, pp.edits, 0) for pp in plans]
+
+    levels = sorted({pp.level for pp in plans})
+    for level in levels:
+        progress.check_cancelled()
+        pool = KompasInstancePool(instances_count)
+        pool.run(lambda pp: apply_parent_paths_plan(pp, do_rebuild), [pp for pp in plans if pp.level == level], _on_result)
+
+    print(f"Обработано родительских моделей: {counts['OK']}, ошибок: {counts['FAIL']}, заменено путей: {counts['REPLACED']}.")
+    return counts
+
+
+def replace_paths(
+        parent_paths: typing.Iterable[str],
+        replacements: dict[str, str],
+        instances_count: int = 0,
+        dry_run: bool = False,
+        cache: StructureCache | None = None,
+        do_rebuild: bool = True,
+        ) -> dict[str, int]:
+    """
+    Заменяет пути к файлам компонентов с ненайденными файлами в родительских моделях
+    (см. `plan_path_replacements()` и `execute_paths_plan()`).
+    """
+    app = get_app7()
+    prev_hidemessage = app.HideMessage
+    app.HideMessage = 2
+    try:
+        plans = plan_path_replacements(parent_paths, replacements, cache)
+        return execute_paths_plan(plans, instances_count, dry_run, do_rebuild)
+    finally:
+        app.HideMessage = prev_hidemessage
 
 
 
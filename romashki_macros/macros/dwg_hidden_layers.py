@@ -10,15 +10,19 @@
 ненужных линий - это перенесение на скрытый и непечатаемый слой.
 """
 from .lib_macros.core import *
+from .lib_macros.drawing_index import DrawingIndex, invalidate_drawing_index
 
 
-def dwg_create_hidden_layers(hidden_layer_number = 900, color = 0x999900, do_create_in_all_views: bool = True) -> None:
+def dwg_create_hidden_layers(hidden_layer_number = 900, color = 0x999900, do_create_in_all_views: bool = True) -> int:
     """
     Создает скрытые слои с номером `hidden_layer_number` и цветом `color`
     во всех видах (если `do_create_in_all_views == True`) или только в текущем
     активном виде.
 
     Цвет `color` задается в традиционном формате `0xRRGGBB`.
+
+    Возвращает количество измененных видов (в которых слой создан или сделан
+    скрытым и непечатаемым).
     """
 
     def _create_layer(view: KAPI7.IView) -> bool:
@@ -54,19 +58,33 @@ def dwg_create_hidden_layers(hidden_layer_number = 900, color = 0x999900, do_cre
     views: KAPI7.IViews = vlm.Views
 
     if do_create_in_all_views:
+        # виды, в которых скрытый слой уже есть и настроен, не изменяются;
+        # индекс строится заново: по кэшированному индексу нельзя решать, что изменять
+        index = DrawingIndex.build(doc)
+        ready_views = index.get_views_with_layer(hidden_layer_number, is_visible=False, is_printable=False)
+        ready_indexes = set(vi.index for vi in ready_views)
+
         new_layers_count: int = 0
         for i in range(views.Count):
+            if i in ready_indexes:
+                continue
             view: KAPI7.IView = views.View(i)
             new_layers_count += int(_create_layer(view))
 
+        if len(ready_indexes) != views.Count:
+            invalidate_drawing_index(doc)
+
         print(f"Общее количество видов: {views.Count}. Созданы скрытые слои в {new_layers_count} видах.")
+        return views.Count - len(ready_indexes)
     else:
         view: KAPI7.IView = views.ActiveView
         is_created = _create_layer(view)
+        invalidate_drawing_index(doc)
         if is_created:
             print(f"Создан скрытый слой в текущем виде.")
         else:
             print(f"Скрытый слой уже присутствует в текущем виде.")
+        return 1
 
 
 
@@ -7,6 +7,21 @@
 без пропусков, начиная от наименьшего до самого наибольшего уже проставленных
 в видах чертежа номеров.
 
+Пакетная проверка чертежей проекта (`check_drawings_positions()`) сверяет
+позиции сборочных чертежей с составом их сборок из кэша структуры
+(см. `lib_macros.structure_cache`). Чертежи читаются по одному (на пуле скрытых
+экземпляров Компас), от каждого в памяти остается только счетчик номеров позиций.
+Для каждой сборки (3D-модели ассоциативных видов) выводятся:
+* пропущенные позиции - номера от 1 до количества строк состава сборки,
+    которых нет ни на одном чертеже сборки;
+* повторяющиеся позиции - номера, проставленные более одного раза;
+* лишние позиции - номера, для которых нет строки в составе сборки.
+
+Строкой состава считается уникальный компонент первого уровня, кроме
+компоновочной геометрии и исключенных из расчета компонентов. Связь номера
+позиции с конкретным компонентом хранится в спецификации, поэтому сверяется
+только количество строк.
+
 Для этого макроса нет GUI-интерфейса. Запускать макрос следует командой:
 
     python -m romashki_macros.macros.dwg_positions
@@ -14,46 +29,205 @@
 """
 
 from .lib_macros.core import *
+from .lib_macros import progress
+from .lib_macros.drawing_index import DrawingIndex, get_drawing_index
+from .lib_macros.kompas_pool import KompasInstancePool, JobResult
+from .lib_macros.structure_cache import StructureCache, ChildRecord, normalize_path, update_structure
 
 
 
 
-def get_position_leaders():
+def get_position_leaders(rebuild: bool = False) -> set[int]:
     """
+    Возвращает множество номеров позиций на всех видах активного чертежа
+    (см. `lib_macros.drawing_index`).
+
     В Компас16 была обнаружена такая проблема:
     запуск скрипта, всё отрабатывает нормально; после выполнения в Компасе
     каких-то действий с позициями (удаление, добавление, редактирование)
     и повторном запуске скрипта выдаются неактуальные данные.
     Решается закрытием и открытием чертежа в Компасе.
+    Если индекс чертежа устарел, его можно построить заново (`rebuild == True`).
     """
 
     doc = open_doc2d()
 
     assert get_document_type(doc) == DocumentTypeEnum.type_2D
 
-    vlm: KAPI7.IViewsAndLayersManager = doc.ViewsAndLayersManager
-    views: KAPI7.IViews = vlm.Views
-
-    positions: set[int] = set()
-
-    for i in range(views.Count):
-        view: KAPI7.IView = views.View(i)
-        container: KAPI7.ISymbols2DContainer = KAPI7.ISymbols2DContainer(view)
-        leaders: KAPI7.ILeaders = container.Leaders
-
-        for j in range(leaders.Count):
-            leader: KAPI7.IBaseLeader = leaders.Leader(j)
-            pl = KAPI7.IPositionLeader(leader)
-            if not pl is None:
-                poss: KAPI7.IText = pl.Positions
-                try:
-                    for s in str(poss.Str).splitlines():
-                        pos_number = int(s)
-                        positions.add(pos_number)
-                except:
-                    pass
-
-    return positions
+    return get_drawing_index(doc, rebuild).get_positions()
+
+
+class DrawingPositions:
+    """
+    Позиции одного чертежа: путь к 3D-модели ассоциативных видов
+    и `{номер позиции: количество линий-выносок}`.
+    """
+    __slots__ = ("path", "source_filepath", "positions")
+
+    def __init__(self, path: str, source_filepath: str, positions: dict[int, int]) -> None:
+        self.path: str = path
+        self.source_filepath: str = source_filepath
+        self.positions: dict[int, int] = positions
+
+
+def read_drawing_positions(filepath: str) -> DrawingPositions:
+    """
+    Читает позиции чертежа `filepath`. Документ, открытый функцией, закрывается.
+    """
+    was_opened = find_opened_document(filepath) is not None
+    doc = open_document(filepath, is_hidden=True)
+    try:
+        index = DrawingIndex.build(KAPI7.IKompasDocument2D(doc))
+        return DrawingPositions(filepath, index.get_source_filepath(), index.get_positions_counts())
+    finally:
+        if not was_opened:
+            doc.Close(0)
+
+
+def get_bom_lines(children: typing.Iterable[ChildRecord]) -> dict[str, int]:
+    """
+    Возвращает строки состава сборки `{путь или наименование компонента: количество}`
+    без компоновочной геометрии и исключенных из расчета компонентов.
+    """
+    lines: dict[str, int] = {}
+    for c in children:
+        if c.is_layout_geometry or c.is_excluded:
+            continue
+        key = c.path if c.path != "" else c.name
+        lines[key] = lines.get(key, 0) + c.count
+    return lines
+
+
+class AssemblyPositions:
+    """
+    Позиции всех чертежей одной сборки и результат их сверки с составом сборки.
+    """
+    def __init__(self, source_filepath: str) -> None:
+        self.source_filepath: str = source_filepath
+        self.drawings: list[str] = []
+        self.positions: dict[int, list[str]] = {}
+        """ `{номер позиции: [чертеж - по разу на каждую линию-выноску]}` """
+        self.bom_lines: dict[str, int] | None = None
+        """ строки состава сборки (см. `get_bom_lines()`); `None`, если сборки нет в кэше """
+
+    def add(self, dp: DrawingPositions) -> None:
+        self.drawings.append(dp.path)
+        for pos, count in dp.positions.items():
+            self.positions.setdefault(pos, []).extend([dp.path] * count)
+
+    def get_missing(self) -> list[int]:
+        if self.bom_lines is None:
+            return []
+        return [pos for pos in range(1, len(self.bom_lines) + 1) if not pos in self.positions]
+
+    def get_duplicates(self) -> dict[int, list[str]]:
+        return {pos: paths for pos, paths in sorted(self.positions.items()) if len(paths) > 1}
+
+    def get_orphans(self) -> dict[int, list[str]]:
+        if self.bom_lines is None:
+            return {}
+        n = len(self.bom_lines)
+        return {pos: paths for pos, paths in sorted(self.positions.items()) if pos < 1 or pos > n}
+
+    def has_problems(self) -> bool:
+        return self.bom_lines is None or len(self.get_missing()) + len(self.get_duplicates()) + len(self.get_orphans()) != 0
+
+
+class PositionsCheckReport:
+    """
+    Отчет о пакетной проверке позиций чертежей.
+    """
+    def __init__(self) -> None:
+        self.assemblies: dict[str, AssemblyPositions] = {}
+        """ `{нормализованный путь к сборке: позиции}` """
+        self.no_source: list[str] = []
+        """ чертежи без ассоциативных видов, но с позициями """
+        self.failed: dict[str, str] = {}
+        """ `{чертеж: текст ошибки}` """
+
+    def add(self, dp: DrawingPositions) -> None:
+        if dp.source_filepath == "":
+            if len(dp.positions) != 0:
+                self.no_source.append(dp.path)
+            return
+        key = normalize_path(dp.source_filepath)
+        if not key in self.assemblies:
+            self.assemblies[key] = AssemblyPositions(dp.source_filepath)
+        self.assemblies[key].add(dp)
+
+    def has_problems(self) -> bool:
+        return len(self.failed) != 0 or any(a.has_problems() for a in self.assemblies.values())
+
+    def print_report(self) -> None:
+        for a in self.assemblies.values():
+            if len(a.positions) == 0:
+                continue  # чертежи деталей
+            print(f"Сборка '{a.source_filepath}', чертежей: {len(a.drawings)}")
+            if a.bom_lines is None:
+                print("    нет в кэше структуры")
+                continue
+            print(f"    строк состава: {len(a.bom_lines)}, компонентов: {sum(a.bom_lines.values())}, позиций на чертежах: {len(a.positions)}")
+            missing = a.get_missing()
+            if len(missing) != 0:
+                print(f"    пропущены: {missing}")
+            for pos, paths in a.get_duplicates().items():
+                print(f"    повторяется {pos} ({len(paths)} раз): {sorted(set(paths))}")
+            for pos, paths in a.get_orphans().items():
+                print(f"    лишняя {pos}: {sorted(set(paths))}")
+        for path in self.no_source:
+            print(f"Позиции на чертеже без ассоциативных видов: '{path}'")
+        for path, error in self.failed.items():
+            print(f"Не удалось прочитать чертеж '{path}': {error}")
+        print(self.summary())
+
+    def summary(self) -> str:
+        with_positions = [a for a in self.assemblies.values() if len(a.positions) != 0]
+        problems = sum(1 for a in with_positions if a.has_problems())
+        return f"Сборок: {len(with_positions)}, с замечаниями: {problems}, ошибок чтения чертежей: {len(self.failed)}."
+
+
+def check_drawings_positions(
+        filepaths: typing.Iterable[str],
+        cache: StructureCache,
+        instances_count: int = 0,
+        do_update_structure: bool = True,
+        ) -> PositionsCheckReport:
+    """
+    Сверяет позиции чертежей `filepaths` с составом их сборок из кэша структуры `cache`
+    (см. описание модуля). Чертежи читаются на `instances_count` скрытых экземплярах
+    Компас (при `instances_count <= 0` - в уже запущенном экземпляре Компас).
+
+    Если `do_update_structure == True`, записи кэша о сборках предварительно обновляются
+    (см. `structure_cache.update_structure()`), для чего сборки открываются
+    в запущенном экземпляре Компас.
+    """
+    filepaths = list(filepaths)
+    report = PositionsCheckReport()
+    done_count = 0
+
+    def _on_result(jr: JobResult) -> None:
+        nonlocal done_count
+        done_count += 1
+        if jr.is_ok():
+            report.add(jr.result)
+        else:
+            report.failed[jr.item] = jr.error
+        progress.report(done_count, len(filepaths), "Чтение позиций чертежей")
+
+    KompasInstancePool(instances_count).run(read_drawing_positions, filepaths, _on_result)
+
+    for key, a in report.assemblies.items():
+        if len(a.positions) == 0:
+            continue
+        if do_update_structure and os.path.isfile(a.source_filepath):
+            try:
+                update_structure(a.source_filepath, cache)
+            except Exception as e:
+                print(f"Не удалось обновить структуру сборки '{a.source_filepath}': {e}")
+        if cache.get_file(key) is not None:
+            a.bom_lines = get_bom_lines(cache.get_children(key))
+
+    return report
 
 
 
@@ -68,9 +68,13 @@ class BaseEvent(object):
 
 
 def register_handler(event_group, event_source, event_number: int, handler: typing.Callable[[typing.Any], bool]) -> BaseEvent:
-    def _top_handler(en: int, params: tuple[typing.Any]) -> None:
+    def _top_handler(en: int, params: tuple[typing.Any]) -> bool:
+        # возврат FALSE для некоторых событий (например, kdBeginCloseDocument) запрещает действие,
+        # поэтому для остальных событий группы и при отсутствии результата возвращается True
         if en == event_number:
-            handler(*[_try_do_dispatch(p) for p in params])
+            rc = handler(*[_try_do_dispatch(p) for p in params])
+            return True if rc is None else bool(rc)
+        return True
 
     be = BaseEvent(event_group, _top_handler, event_source)
     be.advise()
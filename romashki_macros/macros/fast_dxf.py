@@ -11,15 +11,20 @@
 * сохранять фрагмент в формате DXF или в формате Компас-Фрагмент;
 * автоматически определять толщину детали:
     - по свойствам листового тела, если оно создано в 3D-модели;
-    - по наименьшему габариту модели.
+    - по наименьшему габариту модели;
+* по выбору, уплотнять геометрию перед переносом во фрагмент: объединять
+    коллинеарные отрезки и соосные дуги, удалять дубликаты и "осколки"
+    (см. `utils.geometry_compaction`).
 
 """
 
 
 
 from .lib_macros.core import *
+from .lib_macros import progress
 
 from ..utils import math_utils
+from ..utils import geometry_compaction
 
 # from ..macros import stamp
 
@@ -202,7 +207,12 @@ def get_dxf_path_from_2d(doc_dwg: KAPI7.IKompasDocument2D, view_dxf: KAPI7.IView
         return get_dxf_path(filename_template, d, 0, "", n)
 
 
-def create_DXF_from_part(filename_template: str, filepath: str = "", do_close_afterall: bool = True):
+def create_DXF_from_part(
+        filename_template: str,
+        filepath: str = "",
+        do_close_afterall: bool = True,
+        compact_tolerance: float = 0.0,
+        ):
     doc5, part5 = open_part_K5(filepath, True)
     if not check_view_projection_K5(doc5):
         raise Exception(f"В модели не создана ориентация \"{FASTDXF_PROJECTION_NAME}\"")
@@ -215,14 +225,14 @@ def create_DXF_from_part(filename_template: str, filepath: str = "", do_close_af
 
     view_dwg: KAPI7.IView = get_dxf_view(doc_dwg, False)
 
-    doc_fragm: KAPI7.IKompasDocument2D = create_dxf_from_dwg_view(view_dwg)
+    doc_fragm: KAPI7.IKompasDocument2D = create_dxf_from_dwg_view(view_dwg, compact_tolerance)
 
     if do_close_afterall:
         doc_dwg.Close(0)
     # остается открытым Фрагмент с контуром для редактирования - например, убрать резьбы/фаски
 
 
-def create_DXF_from_dwg(filename_template: str, do_rename_view: bool = False):
+def create_DXF_from_dwg(filename_template: str, do_rename_view: bool = False, compact_tolerance: float = 0.0):
     doc_dwg: KAPI7.IKompasDocument2D = open_doc2d("")
 
     view_dwg: KAPI7.IView = get_dxf_view(doc_dwg, True)
@@ -243,7 +253,7 @@ def create_DXF_from_dwg(filename_template: str, do_rename_view: bool = False):
     dxf_path = get_dxf_path_from_2d(doc_dwg, view_dwg, filename_template)
     remember_path(dxf_path)
 
-    doc_fragm: KAPI7.IKompasDocument2D = create_dxf_from_dwg_view(view_dwg)
+    doc_fragm: KAPI7.IKompasDocument2D = create_dxf_from_dwg_view(view_dwg, compact_tolerance)
     # остается открытым Фрагмент с контуром для редактирования - например, убрать резьбы/фаски
 
 
@@ -337,41 +347,136 @@ def get_dxf_view(doc_dwg: KAPI7.IKompasDocument2D, use_selected_view: bool = Tru
     return get_view_by_name(doc_dwg, FASTDXF_DWG_VIEW_NAME)
 
 
-def create_dxf_from_dwg_view(view_dwg: KAPI7.IView) -> KAPI7.IKompasDocument2D:
-    """ Копирование геометрии из вида чертежа во фрагмент. """
+def create_dxf_from_dwg_view(
+        view_dwg: KAPI7.IView,
+        compact_tolerance: float = 0.0,
+        ) -> KAPI7.IKompasDocument2D:
+    """
+    Копирование геометрии из вида чертежа во фрагмент.
+
+    Если `compact_tolerance > 0`, то перед копированием отрезки, дуги и окружности
+    уплотняются с этим допуском (см. `geometry_compaction.compact()`),
+    иначе все объекты копируются как есть (см. `copy_dwg_object()`).
+    """
 
     print(f"Используется вид чертежа '{view_dwg.Name}'")
 
     app = get_app7()
+
+    objects = get_visible_dwg_objects(app, view_dwg)
+
+    if compact_tolerance > 0:
+        segments, arcs, circles, other_objects = extract_dwg_view_objects(objects)
+        segments, arcs, circles, report = geometry_compaction.compact(segments, arcs, circles, compact_tolerance)
+        print(report)
+
     doc_fragm: KAPI7.IKompasDocument2D = create_document2d(app, DocumentTypeEnum.ksDocumentFragment)
 
     view_fragm: KAPI7.IView = get_system_view(doc_fragm)
 
-    dc_dwg: KAPI7.IDrawingContainer = KAPI7.IDrawingContainer(view_dwg)
     dc_fragm: KAPI7.IDrawingContainer = KAPI7.IDrawingContainer(view_fragm)
 
-    d_types = {}
+    if compact_tolerance > 0:
+        for segment in progress.iterate(segments, text="Запись отрезков во фрагмент"):
+            add_segment(segment, dc_fragm)
+        for arc in progress.iterate(arcs, text="Запись дуг во фрагмент"):
+            add_arc(arc, dc_fragm)
+        for circle in progress.iterate(circles, text="Запись окружностей во фрагмент"):
+            add_circle(circle, dc_fragm)
+    else:
+        other_objects = objects
 
-    visible_layers_numbers: list[int] = get_visible_layers_numbers(app, view_dwg)
+    for obj in progress.iterate(other_objects, text="Копирование объектов во фрагмент"):
+        copy_dwg_object(obj, dc_fragm)
 
-    for obj in dc_dwg.Objects(0):
+    view_fragm.Update()
+
+    return doc_fragm
 
-        key = str(type(obj))
-        if not key in d_types:
-            d_types[key] = 0
-        d_types[key] += 1
 
+def get_visible_dwg_objects(
+        app: KAPI7.IApplication,
+        view_dwg: KAPI7.IView,
+        ) -> list[KAPI7.IDrawingObject]:
+    """
+    Возвращает объекты вида `view_dwg`, лежащие на видимых слоях.
+    """
+    dc_dwg: KAPI7.IDrawingContainer = KAPI7.IDrawingContainer(view_dwg)
+
+    visible_layers_numbers: list[int] = get_visible_layers_numbers(app, view_dwg)
+
+    visible_objects: list[KAPI7.IDrawingObject] = []
+    objects = ensure_list(dc_dwg.Objects(0))
+    for obj in progress.iterate(objects, text="Чтение геометрии вида"):
         try:
-            obj.LayerNumber
+            if obj.LayerNumber in visible_layers_numbers:
+                visible_objects.append(obj)
         except:
             continue
 
-        if obj.LayerNumber in visible_layers_numbers:
-            copy_dwg_object(obj, dc_fragm)
+    return visible_objects
 
-    view_fragm.Update()
 
-    return doc_fragm
+def extract_dwg_view_objects(
+        objects: typing.Iterable[KAPI7.IDrawingObject],
+        ) -> tuple[
+            list[geometry_compaction.Segment],
+            list[geometry_compaction.Arc],
+            list[geometry_compaction.Circle],
+            list[KAPI7.IDrawingObject],
+        ]:
+    """
+    Считывает объекты `objects` в буфер:
+    отрезки, дуги и окружности --- в виде записей `geometry_compaction`,
+    остальные объекты --- как есть (для последующего `copy_dwg_object()`).
+    """
+    segments: list[geometry_compaction.Segment] = []
+    arcs: list[geometry_compaction.Arc] = []
+    circles: list[geometry_compaction.Circle] = []
+    other_objects: list[KAPI7.IDrawingObject] = []
+
+    for obj in objects:
+        if isinstance(obj, KAPI7.ILineSegment):
+            segments.append(geometry_compaction.Segment(obj.X1, obj.Y1, obj.X2, obj.Y2, obj.Style))
+        elif isinstance(obj, KAPI7.IArc):
+            arcs.append(geometry_compaction.Arc(obj.Xc, obj.Yc, obj.Radius, obj.Angle1, obj.Angle2, obj.Direction, obj.Style))
+        elif isinstance(obj, KAPI7.ICircle):
+            circles.append(geometry_compaction.Circle(obj.Xc, obj.Yc, obj.Radius, obj.Style))
+        else:
+            other_objects.append(obj)
+
+    return segments, arcs, circles, other_objects
+
+
+def add_segment(segment: geometry_compaction.Segment, target_dc: KAPI7.IDrawingContainer) -> None:
+    o: KAPI7.ILineSegment = target_dc.LineSegments.Add()
+    o.Style = segment.style
+    o.X1 = segment.x1
+    o.Y1 = segment.y1
+    o.X2 = segment.x2
+    o.Y2 = segment.y2
+    o.Update()
+
+
+def add_arc(arc: geometry_compaction.Arc, target_dc: KAPI7.IDrawingContainer) -> None:
+    o: KAPI7.IArc = target_dc.Arcs.Add()
+    o.Style = arc.style
+    o.Xc = arc.xc
+    o.Yc = arc.yc
+    o.Angle1 = arc.angle1
+    o.Angle2 = arc.angle2
+    o.Radius = arc.radius
+    o.Direction = arc.direction
+    o.Update()
+
+
+def add_circle(circle: geometry_compaction.Circle, target_dc: KAPI7.IDrawingContainer) -> None:
+    o: KAPI7.ICircle = target_dc.Circles.Add()
+    o.Style = circle.style
+    o.Xc = circle.xc
+    o.Yc = circle.yc
+    o.Radius = circle.radius
+    o.Update()
 
 
 def copy_dwg_object(obj, target_dc: KAPI7.IDrawingContainer) -> None:
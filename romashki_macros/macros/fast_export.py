@@ -56,10 +56,27 @@ def save_as_png_2d(path: str) -> None:
     print(f"png 2D: Exported to \"{path}\"")
 
 
-def save_as_png_3d(path: str) -> None:
-    iKompasObject5, iKompasObject7 = get_kompas_objects()
+PNG_3D_DPI = 96
+""" Разрешение PNG-изображений 3D-моделей, точек на дюйм. """
 
-    doc: KAPI5.ksDocument3D = iKompasObject5.ActiveDocument3D()
+PNG_3D_SIZE_INCHES = 3
+""" Размер наибольшего габарита 3D-модели на PNG-изображении, дюймы. """
+
+
+def save_as_png_3d(
+        path: str,
+        doc: KAPI5.ksDocument3D | None = None,
+        dpi: int = PNG_3D_DPI,
+        size_inches: float = PNG_3D_SIZE_INCHES,
+        ) -> None:
+    """
+    Сохраняет 3D-документ `doc` (по умолчанию - текущий документ) в PNG-изображение
+    по пути `path`. Масштаб подбирается так, чтобы наибольший габарит модели
+    занимал `size_inches` дюймов при разрешении `dpi`.
+    """
+    if doc is None:
+        iKompasObject5, iKompasObject7 = get_kompas_objects()
+        doc = iKompasObject5.ActiveDocument3D()
     if doc == None:
         raise Exception("Current Document is not a 3D document")
 
@@ -70,8 +87,7 @@ def save_as_png_3d(path: str) -> None:
     dz = z2 - z1
     g_max = max(dx, dy, dz)
 
-    DPI = 96
-    scale = 3 * DPI / g_max
+    scale = size_inches * dpi / g_max
 
     # print(scale)
 
@@ -80,7 +96,7 @@ def save_as_png_3d(path: str) -> None:
     rpar.format = LDefin2D.FORMAT_PNG
     rpar.colorBPP = LDefin2D.BPP_COLOR_16
     rpar.greyScale = 0
-    rpar.extResolution = DPI  # dpi
+    rpar.extResolution = dpi  # dpi
     rpar.extScale = scale
     rpar.colorType = LDefin2D.COLOROBJECT
     rpar.onlyThinLine = 0
@@ -28,6 +28,7 @@ from .lib_macros.core import *
 
 from .lib_macros import selection_filter as lib_selection_filter
 from .lib_macros import visible_elements as lib_visible_elements
+from .lib_macros.display_state import state_manager
 
 # from PyQt5 import QtCore, QtGui, QtWidgets
 
@@ -42,12 +43,16 @@ CMD_MATE_COINCIDENT = 20060  # Номер команды "Сопряжение 
 
 
 fast_mate_used = False
-last_visible_elements = 0
-last_selection_filter = 0
 
 
 def fast_mate() -> None:
-    global fast_mate_used, last_selection_filter, last_visible_elements
+    """
+    Первый вызов включает режим Быстрого сопряжения, второй - выключает его.
+
+    Прежние фильтр выбора и отображаемые объекты запоминаются в стеке состояний
+    (см. `lib_macros.display_state`); записываются только отличающиеся флаги.
+    """
+    global fast_mate_used
 
     iKompasObject5, iKompasObject7 = get_kompas_objects()
     app = get_app7(iKompasObject7)
@@ -58,17 +63,16 @@ def fast_mate() -> None:
         print("Быстрое сопряжение: первый вызов")
         # Сохранение настроек, которые были до вызова
         fast_mate_used = not fast_mate_used
-        last_selection_filter = lib_selection_filter.get_objects_filter()
-        last_visible_elements = lib_visible_elements.get_visible_elements(active_doc)
+        state_manager.push(active_doc)
 
         # Установить фильтр выбора объектов на "Системы координат" и "Контрольные точки"
-        lib_selection_filter.set_objects_filter(
+        state_manager.set_objects_filter(
             lib_selection_filter.binaryObjectsFilter.CS | lib_selection_filter.binaryObjectsFilter.ControlPoints
         )
 
         # Скрыть всё, кроме систем координат и контрольных точек
         # и на уровне головной сборки, и в компонентах
-        lib_visible_elements.set_visible_elements(
+        state_manager.set_visible_elements(
             active_doc,
             lib_visible_elements.VisibleElements.Axis \
             | lib_visible_elements.VisibleElements.ControlPoints \
@@ -88,10 +92,7 @@ def fast_mate() -> None:
     else:
         print("Быстрое сопряжение: второй вызов")
         fast_mate_used = not fast_mate_used
-        lib_selection_filter.set_objects_filter(last_selection_filter)
-        last_selection_filter = 0
-        lib_visible_elements.set_visible_elements(active_doc, last_visible_elements)
-        last_visible_elements = 0
+        state_manager.pop()
 
 
 # class MacrosFastMate(MacrosSingleCommand):
@@ -7,14 +7,16 @@ Cодержит функции:
 * для работы с цветом в формате Компас (`0xBBGGRR`),
 * для открытия документов и получения объектов компонента (`Part`),
 * для работы с выбранными объектами в 3D-модели,
-* для итерации по дочерним компонентам модели
+* для итерации по дочерним компонентам модели,
+* для запуска дополнительных скрытых экземпляров Компас и привязки их к потоку
+    (см. также `lib_macros.kompas_pool`)
 * и другие вспомогательные функции.
 
 """
 
 import Kompas6API5 as KAPI5
 import KompasAPI7 as KAPI7
-from win32com.client import Dispatch
+from win32com.client import Dispatch, DispatchEx
 import LDefin2D
 import LDefin3D
 import MiscellaneousHelpers as MH
@@ -23,6 +25,7 @@ import pythoncom
 
 import typing
 import os
+import threading
 
 
 from ...utils.file_utils import ensure_folder  # FIXME импортировать это не здесь, а в конкретном модуле
@@ -104,10 +107,21 @@ def start_kompas() -> bool:
 
 
 
+_thread_local = threading.local()
+""" Хранит экземпляр Компас, привязанный к текущему потоку (см. `bind_kompas_instance()`). """
+
+
 def get_kompas_objects() -> tuple[KAPI5.KompasObject, KAPI7.IKompasAPIObject]:
     """
     Возвращает объекты Компас-API.
+
+    Если к текущему потоку привязан экземпляр Компас (см. `bind_kompas_instance()`),
+    то возвращаются объекты этого экземпляра.
     """
+    bound = getattr(_thread_local, "kompas_objects", None)
+    if bound is not None:
+        return bound
+
     pythoncom.CoInitialize()
 
     iKompasObject5 = Dispatch('KOMPAS.Application.5')
@@ -127,6 +141,64 @@ def get_app7(_ = None) -> KAPI7.IApplication:
     return app
 
 
+def start_kompas_instance(is_visible: bool = False) -> tuple[KAPI5.KompasObject, KAPI7.IKompasAPIObject]:
+    """
+    Запускает новый (отдельный от уже запущенного пользователем) экземпляр Компас
+    и возвращает его объекты в том же виде, что и `get_kompas_objects()`.
+
+    По умолчанию экземпляр запускается скрытым и с отключенными
+    всплывающими сообщениями (`HideMessage = 2`, ответ "Нет").
+
+    Объекты COM нельзя передавать между потоками: функцию следует вызывать
+    в том же потоке, в котором экземпляр будет использоваться.
+    См. также `bind_kompas_instance()`, `quit_kompas_instance()`.
+    """
+    pythoncom.CoInitialize()
+
+    iKompasObject5 = DispatchEx('KOMPAS.Application.5')
+    iKompasObject5 = KAPI5.KompasObject(iKompasObject5._oleobj_.QueryInterface(KAPI5.KompasObject.CLSID, pythoncom.IID_IDispatch))
+    iKompasObject5.Visible = is_visible
+
+    app: KAPI7.IApplication = KAPI7.IApplication(iKompasObject5.ksGetApplication7())
+    app.HideMessage = 2  # Не показывать и отвечать "НЕТ"
+
+    # IApplication наследует IKompasAPIObject; `.Application` возвращает это же приложение
+    iKompasObject7 = KAPI7.IKompasAPIObject(app._oleobj_.QueryInterface(KAPI7.IKompasAPIObject.CLSID, pythoncom.IID_IDispatch))
+
+    return (iKompasObject5, iKompasObject7)
+
+
+def quit_kompas_instance(kompas_objects: tuple[KAPI5.KompasObject, KAPI7.IKompasAPIObject]) -> None:
+    """
+    Закрывает экземпляр Компас, запущенный `start_kompas_instance()`,
+    без сохранения открытых в нём документов.
+
+    Не выбрасывает исключений (Exceptions).
+    """
+    try:
+        iKompasObject5, iKompasObject7 = kompas_objects
+        app: KAPI7.IApplication = iKompasObject7.Application
+        docs: KAPI7.IDocuments = app.Documents
+        for i in reversed(range(docs.Count)):
+            doc: KAPI7.IKompasDocument = docs.Item(i)
+            doc.Close(0)
+        app.Quit()
+    except Exception as e:
+        print(f"Не удалось закрыть экземпляр Компас: {e}")
+
+
+def bind_kompas_instance(kompas_objects: tuple[KAPI5.KompasObject, KAPI7.IKompasAPIObject] | None) -> None:
+    """
+    Привязывает экземпляр Компас `kompas_objects` к текущему потоку:
+    после этого `get_kompas_objects()` и `get_app7()` (а значит, и все функции
+    этого модуля) в этом потоке работают с этим экземпляром.
+
+    `kompas_objects = None` отменяет привязку: функции снова работают
+    с запущенным пользователем экземпляром Компас.
+    """
+    _thread_local.kompas_objects = kompas_objects
+
+
 class DocumentTypeEnum(int):
     ksDocumentUnknown = 0  # Неизвестный тип
     ksDocumentDrawing = 1  # Чертеж
@@ -232,6 +304,29 @@ def create_document2d(
     return doc
 
 
+def normalize_path(path: str) -> str:
+    """
+    Приводит путь к виду для сравнения: абсолютный, нормализованный,
+    без учета регистра в Windows.
+    """
+    return os.path.normcase(os.path.normpath(os.path.abspath(path)))
+
+
+def find_opened_document(filepath: str) -> KAPI7.IKompasDocument | None:
+    """
+    Возвращает документ с путем `filepath` среди открытых в Компас документов
+    или `None`, если такой документ не открыт.
+    Пути сравниваются без учета регистра (см. `normalize_path()`).
+    """
+    key = normalize_path(filepath)
+    docs: KAPI7.IDocuments = get_app7().Documents
+    for i in range(docs.Count):
+        doc: KAPI7.IKompasDocument = docs.Item(i)
+        if doc.PathName != "" and normalize_path(doc.PathName) == key:
+            return doc
+    return None
+
+
 def open_document(filepath: str = "", is_hidden: bool = False) -> KAPI7.IKompasDocument | None:
     """
     Возвращает документ Компас, который сохранен по пути `filepath`.
@@ -252,13 +347,11 @@ def open_document(filepath: str = "", is_hidden: bool = False) -> KAPI7.IKompasD
 
     docs: KAPI7.IDocuments = app.Documents
 
-    for i in range(docs.Count):
-        doc: KAPI7.IKompasDocument = docs.Item(i)
-        if doc.PathName == filepath:
-            print("Найден среди открытых:", repr(filepath))
-            # doc.Active = True  # FIXME точно нужно?
-            # doc.Visible = not is_hidden  # FIXME не работает для просто IKompasDocument
-            break
+    doc = find_opened_document(filepath)
+    if doc is not None:
+        print("Найден среди открытых:", repr(filepath))
+        # doc.Active = True  # FIXME точно нужно?
+        # doc.Visible = not is_hidden  # FIXME не работает для просто IKompasDocument
     else:
         doc: KAPI7.IKompasDocument = docs.Open(filepath, not is_hidden, False)
 
@@ -353,6 +446,17 @@ def open_doc2d_K5(filepath: str = "") -> KAPI5.ksDocument2D:
     return doc2d
 
 
+def get_document_K5(doc: KAPI7.IKompasDocument2D) -> KAPI5.ksDocument2D:
+    """
+    Возвращает объект документа API5 для документа API7 `doc`.
+    """
+    iKompasObject5, iKompasObject7 = get_kompas_objects()
+    doc5 = iKompasObject5.ksGetDocumentByReference(doc.Reference)
+    if doc5 is None:
+        raise Exception(f"Не удается получить документ API5 для '{doc.PathName}'")
+    return KAPI5.ksDocument2D(doc5)
+
+
 def remember_opened_document() -> str:
     """
     Возвращает путь к файлу текущего активного документа.
@@ -0,0 +1,160 @@
+"""
+Модуль-библиотека для управления состоянием отображения 3D-модели:
+отображаемыми объектами (см. `visible_elements`) и фильтром выбора объектов
+(см. `selection_filter`).
+
+Объект `DisplayStateManager` запоминает последние известные маски
+(отображаемые объекты - для каждого документа, фильтр выбора - общий для Компас)
+и при установке новой маски записывает в Компас только отличающиеся флаги.
+
+Для временных режимов (например, `fast_mate`) есть стек состояний:
+`push()` запоминает текущее состояние, `pop()` восстанавливает его,
+записывая только флаги, измененные с момента `push()`.
+
+Пример применения:
+```python
+with state_manager.temporary(doc, visible_mask, filter_mask):
+    ...
+```
+
+Если пользователь изменил отображение или фильтр выбора вручную, запомненные
+маски устаревают; их можно сбросить методом `invalidate()`.
+`push()` всегда читает текущее состояние заново.
+
+"""
+
+from .core import *
+from . import selection_filter as lib_selection_filter
+from . import visible_elements as lib_visible_elements
+
+import contextlib
+
+
+class DisplayState:
+    """
+    Состояние отображения документа: маска отображаемых объектов и маска фильтра выбора.
+    """
+    __slots__ = ("doc", "visible_elements", "objects_filter")
+
+    def __init__(self, doc: KAPI7.IKompasDocument3D, visible_elements: int, objects_filter: int) -> None:
+        self.doc: KAPI7.IKompasDocument3D = doc
+        self.visible_elements: int = visible_elements
+        self.objects_filter: int = objects_filter
+
+
+class DisplayStateManager:
+    """
+    Кэш масок отображения и фильтра выбора со стеком состояний.
+    """
+    def __init__(self) -> None:
+        self._visible_elements: dict[int, int] = {}
+        """ `{IKompasDocument.Reference: маска отображаемых объектов}` """
+        self._objects_filter: int | None = None
+        self._stack: list[DisplayState] = []
+        self._lock = threading.RLock()
+
+    def get_visible_elements(self, doc: KAPI7.IKompasDocument3D, refresh: bool = False) -> int:
+        """
+        Возвращает маску отображаемых объектов документа `doc` (из кэша,
+        если она известна и не задано `refresh == True`).
+        """
+        with self._lock:
+            key = doc.Reference
+            if refresh or not key in self._visible_elements:
+                self._visible_elements[key] = lib_visible_elements.get_visible_elements(doc)
+            return self._visible_elements[key]
+
+    def set_visible_elements(self, doc: KAPI7.IKompasDocument3D, binary_mask: int) -> int:
+        """
+        Устанавливает маску отображаемых объектов документа `doc`,
+        записывая только отличающиеся флаги. Возвращает количество записанных флагов.
+        """
+        with self._lock:
+            key = doc.Reference
+            previous = self._visible_elements.pop(key, None)
+            written_count = lib_visible_elements.set_visible_elements(doc, binary_mask, previous)
+            self._visible_elements[key] = binary_mask
+            return written_count
+
+    def get_objects_filter(self, refresh: bool = False) -> int:
+        """
+        Возвращает маску фильтра выбора объектов (из кэша, если она известна
+        и не задано `refresh == True`).
+        """
+        with self._lock:
+            if refresh or self._objects_filter is None:
+                self._objects_filter = lib_selection_filter.get_objects_filter()
+            return self._objects_filter
+
+    def set_objects_filter(self, binary_mask: int) -> int:
+        """
+        Устанавливает маску фильтра выбора объектов, записывая только
+        отличающиеся фильтры. Возвращает количество записанных фильтров.
+        """
+        with self._lock:
+            previous, self._objects_filter = self._objects_filter, None
+            written_count = lib_selection_filter.set_objects_filter(binary_mask, previous)
+            self._objects_filter = binary_mask
+            return written_count
+
+    def invalidate(self, doc: KAPI7.IKompasDocument3D | None = None) -> None:
+        """
+        Сбрасывает запомненную маску отображаемых объектов документа `doc`
+        (или всех документов и фильтра выбора, если `doc is None`).
+        """
+        with self._lock:
+            if doc is None:
+                self._visible_elements.clear()
+                self._objects_filter = None
+            else:
+                self._visible_elements.pop(doc.Reference, None)
+
+    def push(self, doc: KAPI7.IKompasDocument3D) -> DisplayState:
+        """
+        Читает текущее состояние отображения документа `doc` и фильтр выбора
+        и помещает их в стек.
+        """
+        with self._lock:
+            state = DisplayState(doc, self.get_visible_elements(doc, True), self.get_objects_filter(True))
+            self._stack.append(state)
+            return state
+
+    def pop(self) -> DisplayState:
+        """
+        Восстанавливает состояние с вершины стека и удаляет его из стека.
+        """
+        with self._lock:
+            if len(self._stack) == 0:
+                raise Exception("Стек состояний отображения пуст")
+            state = self._stack.pop()
+            try:
+                self.set_objects_filter(state.objects_filter)
+                self.set_visible_elements(state.doc, state.visible_elements)
+            except Exception:
+                self.invalidate()  # состояние в Компас неизвестно
+                raise
+            return state
+
+    def depth(self) -> int:
+        return len(self._stack)
+
+    @contextlib.contextmanager
+    def temporary(self, doc: KAPI7.IKompasDocument3D, visible_elements: int | None = None, objects_filter: int | None = None):
+        """
+        Контекстный менеджер: устанавливает маски отображаемых объектов
+        и фильтра выбора (если они не `None`), а при выходе восстанавливает
+        прежнее состояние.
+        """
+        self.push(doc)
+        try:
+            if objects_filter is not None:
+                self.set_objects_filter(objects_filter)
+            if visible_elements is not None:
+                self.set_visible_elements(doc, visible_elements)
+            yield
+        finally:
+            self.pop()
+
+
+state_manager = DisplayStateManager()
+""" общий для всех макросов объект управления состоянием отображения """
@@ -0,0 +1,317 @@
+"""
+Модуль-библиотека индекса чертежа `DrawingIndex`.
+
+Индекс строится за один проход по видам чертежа и хранит для каждого вида:
+* имя, номер и масштаб;
+* путь к 3D-модели (для ассоциативных видов);
+* слои (номер, имя, видимость, печать);
+* номера позиций линий-выносок обозначения позиций;
+* количество линий-выносок.
+
+Макросы для чертежей (`dwg_positions`, `dwg_hidden_layers`)
+получают эти данные из индекса, а не обходят виды, слои и выноски заново.
+
+Индексы кэшируются по документу (см. `get_drawing_index()`). Индекс документа
+сбрасывается по событиям Компас (окончание команды редактирования, закрытие
+документа). События доставляются только в главный поток программы (в нем
+работает цикл обработки сообщений), поэтому в других потоках, а также если
+подписаться на события не удалось, индекс не кэшируется (см. `watch_document()`).
+Изменения, сделанные макросами через API, событий не вызывают, поэтому
+после таких изменений макрос сам вызывает `invalidate_drawing_index()`.
+
+"""
+
+from .core import *
+
+
+KD_CLOSE_DOCUMENT = 2
+""" номер события `ksDocumentFileNotify` - документ закрыт """
+KD_END_PROCESS = 12
+""" номер события `ksDocumentFileNotify` - окончание процесса (команды) в документе """
+
+
+class LayerInfo:
+    """
+    Слой вида чертежа.
+    """
+    __slots__ = ("number", "name", "is_visible", "is_printable")
+
+    def __init__(self, number: int, name: str, is_visible: bool, is_printable: bool) -> None:
+        self.number: int = number
+        self.name: str = name
+        self.is_visible: bool = is_visible
+        self.is_printable: bool = is_printable
+
+    def __repr__(self) -> str:
+        return f"LayerInfo({self.number}, {self.name!r}, is_visible={self.is_visible}, is_printable={self.is_printable})"
+
+
+class ViewInfo:
+    """
+    Вид чертежа: свойства, слои и позиции.
+    """
+    __slots__ = ("index", "name", "number", "scale", "source_filepath", "layers", "positions", "leaders_count")
+
+    def __init__(self, index: int, name: str, number: int, scale: float) -> None:
+        self.index: int = index
+        """ порядковый номер вида в `IViews` """
+        self.name: str = name
+        self.number: int = number
+        self.scale: float = scale
+        self.source_filepath: str = ""
+        """ путь к 3D-модели ассоциативного вида; `""` для обычного вида """
+        self.layers: dict[int, LayerInfo] = {}
+        """ `{номер слоя: слой}` """
+        self.positions: list[int] = []
+        """ номера позиций всех линий-выносок вида (с повторами) """
+        self.leaders_count: int = 0
+
+    def get_visible_layers_numbers(self) -> list[int]:
+        return [l.number for l in self.layers.values() if l.is_visible]
+
+    def __repr__(self) -> str:
+        return f"ViewInfo({self.number}, {self.name!r}, scale={self.scale}, layers={len(self.layers)}, leaders={self.leaders_count})"
+
+
+def parse_positions(text: str) -> list[int]:
+    """
+    Возвращает номера позиций из текста линии-выноски (по одному номеру в строке).
+    Строки, не являющиеся числом, пропускаются.
+    """
+    positions: list[int] = []
+    for s in text.splitlines():
+        try:
+            positions.append(int(s))
+        except ValueError:
+            pass
+    return positions
+
+
+def read_view_info(index: int, view: KAPI7.IView) -> ViewInfo:
+    """
+    Читает свойства, слои и линии-выноски вида `view`.
+    """
+    vi = ViewInfo(index, view.Name, view.Number, view.Scale)
+    try:
+        vi.source_filepath = KAPI7.IAssociationView(view).SourceFileName or ""
+    except Exception:
+        pass
+
+    layers: KAPI7.ILayers = view.Layers
+    for i in range(layers.Count):
+        l: KAPI7.ILayer = layers.Layer(i)
+        vi.layers[l.LayerNumber] = LayerInfo(l.LayerNumber, l.Name, bool(l.Visible), bool(l.Printable))
+
+    container: KAPI7.ISymbols2DContainer = KAPI7.ISymbols2DContainer(view)
+    leaders: KAPI7.ILeaders = container.Leaders
+    vi.leaders_count = leaders.Count
+    for j in range(leaders.Count):
+        leader: KAPI7.IBaseLeader = leaders.Leader(j)
+        pl = KAPI7.IPositionLeader(leader)
+        if not pl is None:
+            try:
+                vi.positions.extend(parse_positions(str(pl.Positions.Str)))
+            except:
+                pass
+
+    return vi
+
+
+class DrawingIndex:
+    """
+    Индекс видов, слоев и позиций чертежа. Создается функцией `DrawingIndex.build()`.
+    """
+    def __init__(self, path: str = "") -> None:
+        self.path: str = path
+        self.views: list[ViewInfo] = []
+        self._views_by_number: dict[int, ViewInfo] = {}
+
+    @staticmethod
+    def build(doc: KAPI7.IKompasDocument2D) -> "DrawingIndex":
+        """
+        Строит индекс чертежа `doc` за один проход по видам.
+        """
+        index = DrawingIndex(doc.PathName)
+        vlm: KAPI7.IViewsAndLayersManager = doc.ViewsAndLayersManager
+        views: KAPI7.IViews = vlm.Views
+        for i in range(views.Count):
+            vi = read_view_info(i, views.View(i))
+            index.views.append(vi)
+            index._views_by_number[vi.number] = vi
+        return index
+
+    def get_view(self, number: int) -> ViewInfo | None:
+        """
+        Возвращает вид с номером `number` или `None`.
+        """
+        return self._views_by_number.get(number)
+
+    def get_view_by_name(self, name: str) -> ViewInfo | None:
+        for vi in self.views:
+            if vi.name == name:
+                return vi
+        return None
+
+    def get_source_filepath(self) -> str:
+        """
+        Возвращает путь к 3D-модели первого ассоциативного вида или `""`.
+        """
+        for vi in self.views:
+            if vi.source_filepath != "":
+                return vi.source_filepath
+        return ""
+
+    def get_positions_counts(self) -> dict[int, int]:
+        """
+        Возвращает `{номер позиции: количество линий-выносок с этим номером}` на всех видах.
+        """
+        counts: dict[int, int] = {}
+        for vi in self.views:
+            for pos in vi.positions:
+                counts[pos] = counts.get(pos, 0) + 1
+        return counts
+
+    def get_positions(self) -> set[int]:
+        """
+        Возвращает множество номеров позиций на всех видах.
+        """
+        positions: set[int] = set()
+        for vi in self.views:
+            positions.update(vi.positions)
+        return positions
+
+    def get_leaders_count(self) -> int:
+        return sum(vi.leaders_count for vi in self.views)
+
+    def get_visible_layers_numbers(self, view_number: int) -> list[int]:
+        """
+        Возвращает номера видимых слоев вида с номером `view_number`.
+        """
+        vi = self.get_view(view_number)
+        if vi is None:
+            raise Exception(f"В индексе чертежа нет вида с номером {view_number}")
+        return vi.get_visible_layers_numbers()
+
+    def get_views_with_layer(self, layer_number: int, is_visible: bool | None = None, is_printable: bool | None = None) -> list[ViewInfo]:
+        """
+        Возвращает виды, в которых есть слой с номером `layer_number`
+        (и с заданными видимостью и признаком печати, если они не `None`).
+        """
+        result: list[ViewInfo] = []
+        for vi in self.views:
+            l = vi.layers.get(layer_number)
+            if l is None:
+                continue
+            if is_visible is not None and l.is_visible != is_visible:
+                continue
+            if is_printable is not None and l.is_printable != is_printable:
+                continue
+            result.append(vi)
+        return result
+
+
+_indexes: dict[int, DrawingIndex] = {}
+""" `{IKompasDocument.Reference: индекс}` """
+_watchers: dict[int, typing.Any] = {}
+""" `{IKompasDocument.Reference: events.BaseEvent}` - подписки существуют, пока индекс документа в кэше """
+_indexes_lock = threading.Lock()
+
+
+def get_drawing_index(doc: KAPI7.IKompasDocument2D, rebuild: bool = False) -> DrawingIndex:
+    """
+    Возвращает индекс чертежа `doc` из кэша или строит его.
+    Если `rebuild == True`, индекс строится заново.
+
+    Индекс кэшируется, только если функция вызвана в главном потоке и удалось
+    подписаться на события документа (см. `watch_document()`), иначе кэш мог бы
+    устареть после правок пользователя.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return DrawingIndex.build(doc)
+
+    key = doc.Reference
+    with _indexes_lock:
+        index = _indexes.get(key) if not rebuild else None
+    if index is not None:
+        return index
+
+    index = DrawingIndex.build(doc)
+    if watch_document(doc):
+        with _indexes_lock:
+            if key in _watchers:  # подписка могла быть отменена событием
+                _indexes[key] = index
+    return index
+
+
+def invalidate_drawing_index(doc: KAPI7.IKompasDocument2D | None = None) -> None:
+    """
+    Сбрасывает индекс чертежа `doc` (или индексы всех чертежей, если `doc is None`)
+    и отписывается от событий документа.
+    """
+    with _indexes_lock:
+        keys = list(_indexes.keys() | _watchers.keys()) if doc is None else [doc.Reference]
+        watchers = [_drop_document(key) for key in keys]
+    for watcher in watchers:
+        if watcher is not None:
+            try:
+                watcher.unadvise()
+            except Exception:
+                pass
+
+
+def _drop_document(key: int) -> typing.Any:
+    """
+    Удаляет индекс и подписку документа из кэша (вызывается под `_indexes_lock`).
+    Возвращает подписку или `None`.
+    """
+    _indexes.pop(key, None)
+    return _watchers.pop(key, None)
+
+
+def _on_document_event(key: int, event_number: int) -> bool:
+    # Подписка не отключается внутри обработчика: объект подписки удаляется из кэша
+    # и отключается при сборке мусора, после возврата из обработчика.
+    if event_number in (KD_END_PROCESS, KD_CLOSE_DOCUMENT):
+        with _indexes_lock:
+            _drop_document(key)
+    return True  # FALSE для событий kdBegin... запретил бы действие пользователя
+
+
+def watch_document(doc: KAPI7.IKompasDocument2D) -> bool:
+    """
+    Подписывается на события документа `doc` для сброса его индекса:
+    по окончании команды редактирования и при закрытии документа.
+
+    Возвращает `True`, если подписка выполнена (или уже была выполнена).
+    Подписка отменяется вместе со сбросом индекса (по событию или явно).
+
+    События доставляются в поток, в котором выполнена подписка, только пока
+    в нем работает цикл обработки сообщений, поэтому подписка выполняется
+    только в главном потоке (в других потоках функция возвращает `False`).
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return False
+
+    key = doc.Reference
+    with _indexes_lock:
+        if key in _watchers:
+            return True
+
+    try:
+        from .. import events
+        doc5 = get_document_K5(doc)
+        watcher = events.BaseEvent(KAPI5.ksDocumentFileNotify, lambda en, params: _on_document_event(key, en), doc5)
+        watcher.advise()
+    except Exception as e:
+        print(f"Не удалось подписаться на события документа '{doc.PathName}': {e}")
+        return False
+
+    with _indexes_lock:
+        _watchers[key] = watcher
+    return True
+
+
+if __name__ == "__main__":
+    index = get_drawing_index(open_doc2d())
+    for vi in index.views:
+        print(vi, sorted(set(vi.positions)), vi.layers)
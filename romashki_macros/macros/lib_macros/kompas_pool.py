@@ -0,0 +1,220 @@
+"""
+Модуль-библиотека для пакетной обработки документов на нескольких скрытых
+экземплярах Компас одновременно.
+
+Каждый рабочий поток пула запускает свой экземпляр Компас
+(см. `core.start_kompas_instance()`) и привязывает его к себе
+(см. `core.bind_kompas_instance()`), поэтому внутри функции-задания можно
+пользоваться обычными функциями `core` (`open_document()`, `open_part()` и т.д.).
+
+Пример применения:
+```python
+def job(path: str) -> str:
+    doc = core.open_document(path)
+    ...
+    doc.Close(0)
+    return "OK"
+
+pool = KompasInstancePool(instances_count=3)
+for r in pool.run(job, paths):
+    print(r.item, r.is_ok(), r.result, r.error)
+```
+
+При `instances_count <= 0` задания выполняются последовательно в текущем потоке
+в уже запущенном пользователем экземпляре Компас.
+
+"""
+
+from .core import *
+
+import queue
+import time
+import traceback
+
+
+class JobResult:
+    """
+    Результат выполнения задания пула.
+    """
+    def __init__(self, item: typing.Any) -> None:
+        self.item: typing.Any = item
+        """ исходный элемент, переданный в задание """
+        self.result: typing.Any = None
+        """ значение, возвращенное функцией-заданием """
+        self.error: str = ""
+        """ текст ошибки (исключения); пустая строка, если ошибки нет """
+        self.duration: float = 0.0
+        """ длительность выполнения задания, секунды """
+
+    def is_ok(self) -> bool:
+        return self.error == ""
+
+
+class KompasInstancePool:
+    """
+    Пул скрытых экземпляров Компас для выполнения заданий.
+
+    Обычно экземпляры Компас запускаются и закрываются внутри `run()`.
+    Чтобы выполнить несколько вызовов `run()` на одних и тех же экземплярах
+    (например, обрабатывать длинный список частями), пул используется
+    как контекстный менеджер (см. `start()`, `stop()`):
+    ```python
+    with KompasInstancePool(instances_count=3) as pool:
+        for batch in batches:
+            pool.run(job, batch)
+    ```
+    """
+    def __init__(self, instances_count: int = 1, is_visible: bool = False) -> None:
+        self.instances_count: int = instances_count
+        self.is_visible: bool = is_visible
+        self._is_cancelled: bool = False
+        self._queue: queue.Queue | None = None
+        self._threads: list[threading.Thread] = []
+        self._running_count: int = 0
+        """ количество рабочих потоков, у которых запущен (или запускается) экземпляр Компас """
+        self._lock = threading.Lock()
+
+    def cancel(self) -> None:
+        """
+        Запрашивает отмену: задания, которые еще не начали выполняться, будут пропущены.
+        """
+        self._is_cancelled = True
+
+    def is_cancelled(self) -> bool:
+        return self._is_cancelled
+
+    def start(self) -> None:
+        """
+        Запускает рабочие потоки и экземпляры Компас, которые будут использоваться
+        всеми последующими вызовами `run()` до вызова `stop()`.
+        При `instances_count <= 0` ничего не делает.
+        """
+        self._start(self.instances_count)
+
+    def stop(self) -> None:
+        """
+        Закрывает экземпляры Компас, запущенные `start()`, и завершает рабочие потоки.
+        """
+        if self._queue is None:
+            return
+        for _ in self._threads:
+            self._queue.put(None)
+        for th in self._threads:
+            th.join()
+        self._queue = None
+        self._threads = []
+
+    def __enter__(self) -> "KompasInstancePool":
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def _start(self, threads_count: int) -> None:
+        if threads_count <= 0 or self._queue is not None:
+            return
+        self._queue = queue.Queue()
+        self._running_count = threads_count
+        self._threads = [threading.Thread(target=self._worker, args=(self._queue,), daemon=True) for _ in range(threads_count)]
+        for th in self._threads:
+            th.start()
+
+    def _worker(self, q: queue.Queue) -> None:
+        pythoncom.CoInitialize()
+        kompas_objects = None
+        try:
+            try:
+                kompas_objects = start_kompas_instance(self.is_visible)
+                bind_kompas_instance(kompas_objects)
+            except Exception as e:
+                print(f"Ошибка запуска экземпляра Компас в рабочем потоке пула: {e}")
+                print(traceback.format_exc())
+                with self._lock:
+                    self._running_count -= 1
+                    if self._running_count != 0:
+                        return  # задания выполнят другие рабочие потоки
+                # ни одного экземпляра Компас нет: поток остается, чтобы отметить задания невыполненными
+
+            while True:
+                task = q.get()
+                try:
+                    if task is None:
+                        break
+                    item, do_job, skip_job = task
+                    if kompas_objects is None:
+                        skip_job(item, "Задание не выполнено")
+                    elif self._is_cancelled:
+                        skip_job(item, "Задание отменено")
+                    else:
+                        do_job(item)
+                finally:
+                    q.task_done()
+        finally:
+            bind_kompas_instance(None)
+            if kompas_objects is not None:
+                quit_kompas_instance(kompas_objects)
+            pythoncom.CoUninitialize()
+
+    def run(
+            self,
+            function: typing.Callable[[typing.Any], typing.Any],
+            items: typing.Iterable,
+            on_result: typing.Callable[[JobResult], None] | None = None,
+            ) -> list[JobResult]:
+        """
+        Выполняет `function(item)` для каждого элемента `items`
+        и возвращает список результатов `JobResult` в порядке завершения.
+
+        `on_result(job_result)` вызывается после каждого задания
+        (из рабочего потока, но последовательно, под блокировкой).
+
+        Если пул не запущен `start()`, экземпляры Компас запускаются
+        (не больше, чем количество заданий) и закрываются внутри вызова.
+        """
+        self._is_cancelled = False
+        results: list[JobResult] = []
+        lock = threading.Lock()
+
+        def _add_result(jr: JobResult) -> None:
+            with lock:
+                results.append(jr)
+                if on_result is not None:
+                    on_result(jr)
+
+        def _do_job(item) -> None:
+            jr = JobResult(item)
+            t0 = time.time()
+            try:
+                jr.result = function(item)
+            except Exception as e:
+                jr.error = f"{e.__class__.__name__}: {e}"
+                print(traceback.format_exc())
+            jr.duration = time.time() - t0
+            _add_result(jr)
+
+        def _skip_job(item, error: str) -> None:
+            jr = JobResult(item)
+            jr.error = error
+            _add_result(jr)
+
+        if self.instances_count <= 0:
+            for item in items:
+                if self._is_cancelled:
+                    break
+                _do_job(item)
+            return results
+
+        is_started = self._queue is not None
+        if not is_started:
+            items = list(items)
+            self._start(min(self.instances_count, max(len(items), 1)))
+        try:
+            for item in items:
+                self._queue.put((item, _do_job, _skip_job))
+            self._queue.join()
+        finally:
+            if not is_started:
+                self.stop()
+
+        return results
@@ -0,0 +1,380 @@
+"""
+Модуль-библиотека для поиска компонентов сборки по запросу из нескольких условий.
+
+Дерево компонентов читается через API Компас один раз (см. `PartsTable.build()`)
+и хранится в памяти по столбцам; при построении для столбцов создаются индексы:
+* для строковых столбцов - словарь "значение -> номера строк" и отсортированный
+    список различных значений (поиск по началу значения - двоичный поиск);
+* для логических столбцов - множества строк со значением `True`;
+* для уровня вложенности - словарь "уровень -> номера строк".
+
+Поэтому повторные запросы к той же сборке выполняются без обращений к Компас,
+а регулярные выражения проверяются один раз для каждого различного значения,
+а не для каждого вхождения компонента.
+
+Язык запросов:
+```
+marking ^= "2025.0012" and not excluded
+file ~ "Стандартные изделия" or name = "Болт М8-6gx30"
+(material ~ "12Х18Н10Т" or marking ^= ГОСТ) and depth <= 2 and spc
+```
+
+Свойства компонента:
+* строковые: `marking` (обозначение), `name` (наименование),
+    `file` (путь к файлу), `material` (материал);
+* логические: `layout` (компоновочная геометрия), `excluded` (исключен из расчета),
+    `spc` (создавать объекты спецификации);
+* числовое: `depth` (уровень вложенности, 1 - компоненты первого уровня).
+
+Операторы сравнения:
+* для строковых свойств: `=` и `!=` (равенство без учета регистра),
+    `^=` (начинается с), `~` (регулярное выражение, `re.search()` без учета регистра);
+* для уровня вложенности: `=`, `!=`, `<`, `<=`, `>`, `>=`;
+* логические свойства записываются без оператора.
+
+Условия объединяются операторами `and`, `or`, `not` и скобками.
+Значения со пробелами и спецсимволами записываются в кавычках `"..."` или `'...'`;
+внутри кавычек `\\"` означает кавычку, остальные `\\` сохраняются (для регулярных выражений).
+
+Пример применения:
+```python
+table = PartsTable.build(toppart)
+rows = compile_query('marking ^= "2025.0012" and not excluded')(table)
+parts = table.get_parts(rows)
+```
+
+"""
+
+from .core import *
+from . import progress
+
+import array
+import bisect
+import re
+
+
+STRING_COLUMNS = ("marking", "name", "file", "material")
+BOOL_COLUMNS = ("layout", "excluded", "spc")
+DEPTH_COLUMN = "depth"
+
+
+def _normalize_value(value: typing.Any) -> str:
+    return ("" if value is None else str(value)).casefold()
+
+
+class PartsTable:
+    """
+    Копия дерева компонентов сборки в памяти, хранящаяся по столбцам,
+    с индексами по столбцам (см. описание модуля).
+
+    Строка таблицы - одно вхождение компонента; номер строки - порядок обхода
+    дерева в глубину. Объекты компонентов `IPart7` хранятся для последующего выбора.
+    """
+    def __init__(self) -> None:
+        self.parts: list[KAPI7.IPart7] = []
+        self.columns: dict[str, list] = {column: [] for column in STRING_COLUMNS + BOOL_COLUMNS}
+        self.depth: array.array = array.array("H")
+        self.parent: array.array = array.array("i")
+        """ номер строки родительского компонента (`-1` для компонентов первого уровня) """
+
+        self._values_index: dict[str, dict[str, list[int]]] = {}
+        self._sorted_values: dict[str, list[str]] = {}
+        self._true_rows: dict[str, set[int]] = {}
+        self._depth_index: dict[int, list[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.parts)
+
+    @classmethod
+    def build(cls, toppart: KAPI7.IPart7) -> 'PartsTable':
+        """
+        Читает все компоненты модели `toppart` (на всех уровнях вложенности,
+        включая компоновочную геометрию) за один обход и строит индексы.
+        """
+        table = cls()
+        stack: list[tuple[KAPI7.IPart7, int, int]] = [
+            (part, 1, -1) for part in reversed(list(iterate_child_parts(toppart)))
+        ]
+        while len(stack) != 0:
+            part, depth, parent = stack.pop()
+            progress.check_cancelled()
+            row = table._append(part, depth, parent)
+            if row % 100 == 0:
+                progress.report(row, 0, f"Прочитано компонентов: {row}")
+            children = list(iterate_child_parts(part))
+            for child in reversed(children):
+                stack.append((child, depth + 1, row))
+
+        table.build_indexes()
+        return table
+
+    def _append(self, part: KAPI7.IPart7, depth: int, parent: int) -> int:
+        row = len(self.parts)
+        self.parts.append(part)
+        self.columns["marking"].append(part.Marking or "")
+        self.columns["name"].append(part.Name or "")
+        self.columns["file"].append(part.FileName or "")
+        self.columns["material"].append(part.Material or "")
+        self.columns["layout"].append(bool(part.IsLayoutGeometry))
+        self.columns["excluded"].append(bool(KAPI7.IFeature7(part).Excluded))
+        self.columns["spc"].append(bool(part.CreateSpcObjects))
+        self.depth.append(depth)
+        self.parent.append(parent)
+        return row
+
+    def build_indexes(self) -> None:
+        for column in STRING_COLUMNS:
+            index: dict[str, list[int]] = {}
+            for row, value in enumerate(self.columns[column]):
+                index.setdefault(_normalize_value(value), []).append(row)
+            self._values_index[column] = index
+            self._sorted_values[column] = sorted(index.keys())
+
+        for column in BOOL_COLUMNS:
+            self._true_rows[column] = {row for row, value in enumerate(self.columns[column]) if value}
+
+        self._depth_index = {}
+        for row, depth in enumerate(self.depth):
+            self._depth_index.setdefault(depth, []).append(row)
+
+    def all_rows(self) -> set[int]:
+        return set(range(len(self.parts)))
+
+    def rows_equal(self, column: str, value: str) -> set[int]:
+        return set(self._values_index[column].get(_normalize_value(value), ()))
+
+    def rows_prefix(self, column: str, prefix: str) -> set[int]:
+        """
+        Возвращает строки, значения столбца `column` которых начинаются с `prefix`
+        (двоичный поиск по отсортированному списку различных значений).
+        """
+        prefix = _normalize_value(prefix)
+        keys = self._sorted_values[column]
+        index = self._values_index[column]
+        result: set[int] = set()
+        i = bisect.bisect_left(keys, prefix)
+        while i < len(keys) and keys[i].startswith(prefix):
+            result.update(index[keys[i]])
+            i += 1
+        return result
+
+    def rows_matching(self, column: str, regex: re.Pattern) -> set[int]:
+        """
+        Возвращает строки, в значениях столбца `column` которых найдено
+        регулярное выражение `regex` (проверяется каждое различное значение один раз).
+        """
+        result: set[int] = set()
+        for key, rows in self._values_index[column].items():
+            if regex.search(key) is not None:
+                result.update(rows)
+        return result
+
+    def rows_true(self, column: str) -> set[int]:
+        return set(self._true_rows[column])
+
+    def rows_depth(self, op: str, depth: int) -> set[int]:
+        result: set[int] = set()
+        for d, rows in self._depth_index.items():
+            if _compare(op, d, depth):
+                result.update(rows)
+        return result
+
+    def get_parts(self, rows: typing.Iterable[int]) -> list[KAPI7.IPart7]:
+        """
+        Возвращает компоненты строк `rows` в порядке обхода дерева.
+        """
+        return [self.parts[row] for row in sorted(rows)]
+
+
+def _compare(op: str, a: int, b: int) -> bool:
+    if op == "=": return a == b
+    if op == "!=": return a != b
+    if op == "<": return a < b
+    if op == "<=": return a <= b
+    if op == ">": return a > b
+    if op == ">=": return a >= b
+    raise Exception(f"Неизвестный оператор сравнения: '{op}'")
+
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<lparen>\() |
+        (?P<rparen>\)) |
+        (?P<op>\^=|!=|<=|>=|=|~|<|>) |
+        (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*') |
+        (?P<word>[^\s()"'=!<>~^]+)
+    )""", re.VERBOSE)
+
+_KEYWORDS = ("and", "or", "not")
+
+
+def _tokenize(text: str) -> list[tuple[str, str]]:
+    tokens: list[tuple[str, str]] = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        m = _TOKEN_RE.match(text, pos)
+        if m is None or m.end() == pos:
+            raise Exception(f"Ошибка в запросе: неожиданный символ в позиции {pos + 1}: {text[pos:]!r}")
+        kind = m.lastgroup
+        value = m.group(kind)
+        if kind == "string":
+            value = re.sub(r"""\\(["'])""", r"\1", value[1:-1])
+        elif kind == "word" and value.lower() in _KEYWORDS:
+            kind, value = "keyword", value.lower()
+        tokens.append((kind, value))
+        pos = m.end()
+    return tokens
+
+
+QueryFunction: typing.TypeAlias = typing.Callable[[PartsTable], set[int]]
+""" Скомпилированный запрос: функция, возвращающая номера строк таблицы компонентов """
+
+
+class _Parser:
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.pos = 0
+
+    def peek(self) -> tuple[str, str] | None:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self) -> tuple[str, str]:
+        token = self.peek()
+        if token is None:
+            raise Exception(f"Ошибка в запросе: неожиданный конец запроса: {self.text!r}")
+        self.pos += 1
+        return token
+
+    def is_keyword(self, keyword: str) -> bool:
+        return self.peek() == ("keyword", keyword)
+
+    def parse(self) -> QueryFunction:
+        f = self.parse_or()
+        if self.peek() is not None:
+            raise Exception(f"Ошибка в запросе: лишнее выражение {self.peek()[1]!r}")
+        return f
+
+    def parse_or(self) -> QueryFunction:
+        operands = [self.parse_and()]
+        while self.is_keyword("or"):
+            self.take()
+            operands.append(self.parse_and())
+        if len(operands) == 1:
+            return operands[0]
+        return lambda table: set().union(*(f(table) for f in operands))
+
+    def parse_and(self) -> QueryFunction:
+        operands = [self.parse_not()]
+        while self.is_keyword("and"):
+            self.take()
+            operands.append(self.parse_not())
+        if len(operands) == 1:
+            return operands[0]
+
+        def _and(table: PartsTable) -> set[int]:
+            result = operands[0](table)
+            for f in operands[1:]:
+                if len(result) == 0:
+                    break
+                result &= f(table)
+            return result
+        return _and
+
+    def parse_not(self) -> QueryFunction:
+        if self.is_keyword("not"):
+            self.take()
+            f = self.parse_not()
+            return lambda table: table.all_rows() - f(table)
+        return self.parse_atom()
+
+    def parse_atom(self) -> QueryFunction:
+        kind, value = self.take()
+        if kind == "lparen":
+            f = self.parse_or()
+            if self.take()[0] != "rparen":
+                raise Exception("Ошибка в запросе: не закрыта скобка")
+            return f
+        if kind != "word":
+            raise Exception(f"Ошибка в запросе: ожидалось имя свойства, получено {value!r}")
+        return self.parse_condition(value.lower())
+
+    def parse_condition(self, column: str) -> QueryFunction:
+        if column in BOOL_COLUMNS:
+            return lambda table: table.rows_true(column)
+
+        if not column in STRING_COLUMNS and column != DEPTH_COLUMN:
+            raise Exception(f"Ошибка в запросе: неизвестное свойство {column!r}; "
+                f"допустимы: {', '.join(STRING_COLUMNS + BOOL_COLUMNS + (DEPTH_COLUMN,))}")
+
+        op_kind, op = self.take()
+        if op_kind != "op":
+            raise Exception(f"Ошибка в запросе: после {column!r} ожидался оператор сравнения, получено {op!r}")
+        value_kind, value = self.take()
+        if not value_kind in ("string", "word"):
+            raise Exception(f"Ошибка в запросе: после '{column} {op}' ожидалось значение, получено {value!r}")
+
+        if column == DEPTH_COLUMN:
+            if op in ("~", "^="):
+                raise Exception(f"Ошибка в запросе: оператор {op!r} недопустим для {DEPTH_COLUMN!r}")
+            try:
+                depth = int(value)
+            except ValueError:
+                raise Exception(f"Ошибка в запросе: уровень вложенности должен быть целым числом: {value!r}")
+            return lambda table: table.rows_depth(op, depth)
+
+        if op == "=":
+            return lambda table: table.rows_equal(column, value)
+        if op == "!=":
+            return lambda table: table.all_rows() - table.rows_equal(column, value)
+        if op == "^=":
+            return lambda table: table.rows_prefix(column, value)
+        if op == "~":
+            try:
+                regex = re.compile(value, re.IGNORECASE | re.DOTALL)
+            except re.error as e:
+                raise Exception(f"Ошибка в запросе: ошибка в регулярном выражении {value!r}: {e}")
+            return lambda table: table.rows_matching(column, regex)
+        raise Exception(f"Ошибка в запросе: оператор {op!r} недопустим для строкового свойства {column!r}")
+
+
+def compile_query(text: str) -> QueryFunction:
+    """
+    Разбирает запрос `text` (см. описание модуля) и возвращает функцию,
+    которая по таблице компонентов возвращает множество номеров подходящих строк.
+    Ошибки в запросе вызывают исключение при компиляции.
+    """
+    if text.strip() == "":
+        raise Exception("Пустой запрос")
+    return _Parser(text).parse()
+
+
+def select_objects(doc: KAPI7.IKompasDocument, objects: list, do_add: bool = False) -> None:
+    """
+    Выбирает объекты `objects` в документе `doc` одним вызовом `ISelectionManager.Select()`
+    (массивом объектов); если это не удается (исключение или `Select()` вернул `False`),
+    объекты выбираются по одному.
+
+    Если `do_add == False`, предыдущий выбор сбрасывается.
+    """
+    sm: KAPI7.ISelectionManager = doc.SelectionManager
+    if not do_add:
+        sm.UnselectAll()
+    if len(objects) == 0:
+        return
+    try:
+        if sm.Select(objects):
+            return
+    except Exception:
+        pass
+
+    failed_count = 0
+    for obj in objects:
+        try:
+            if not sm.Select(obj):
+                failed_count += 1
+        except Exception:
+            failed_count += 1
+    if failed_count != 0:
+        print(f"Не удалось выбрать объектов: {failed_count} из {len(objects)}")
@@ -0,0 +1,101 @@
+"""
+Модуль-библиотека для сообщения о ходе выполнения макроса и для кооперативной
+отмены длительных макросов.
+
+Функции макросов вызывают `report()` и `check_cancelled()` на границах циклов
+(или итерируют через `iterate()`). Если макрос запущен обычным образом,
+эти вызовы ничего не делают. Если макрос запущен в фоновом потоке
+(см. `gui.executor`), то к потоку привязан `ProgressContext`: сообщения о ходе
+выполнения передаются в графический интерфейс, а после запроса отмены
+`check_cancelled()` выбрасывает `CancelledError`.
+
+Пример применения:
+```python
+from .lib_macros import progress
+
+for part in progress.iterate(parts, text="Перекрашивание"):
+    ...
+```
+"""
+
+import threading
+import typing
+
+
+class CancelledError(Exception):
+    """ Исключение, выбрасываемое при отмене выполнения макроса пользователем. """
+    def __init__(self, *args: object) -> None:
+        super().__init__(*args or ("Выполнение отменено пользователем",))
+
+
+class ProgressContext:
+    """
+    Контекст выполнения макроса: хранит флаг отмены и передает сообщения
+    о ходе выполнения в функцию `on_progress(done, total, text)`.
+    """
+    def __init__(self, on_progress: typing.Callable[[int, int, str], None] | None = None) -> None:
+        self._on_progress = on_progress
+        self._is_cancelled: bool = False
+
+    def cancel(self) -> None:
+        """ Запрашивает отмену. Может вызываться из любого потока. """
+        self._is_cancelled = True
+
+    def is_cancelled(self) -> bool:
+        return self._is_cancelled
+
+    def report(self, done: int, total: int = 0, text: str = "") -> None:
+        if self._on_progress is not None:
+            self._on_progress(done, total, text)
+
+
+_thread_local = threading.local()
+
+
+def set_context(context: ProgressContext | None) -> None:
+    """ Привязывает контекст `context` к текущему потоку (`None` - отвязывает). """
+    _thread_local.context = context
+
+
+def get_context() -> ProgressContext | None:
+    """ Возвращает контекст, привязанный к текущему потоку, или `None`. """
+    return getattr(_thread_local, "context", None)
+
+
+def report(done: int, total: int = 0, text: str = "") -> None:
+    """
+    Сообщает о ходе выполнения: выполнено `done` из `total` шагов
+    (`total == 0` - количество шагов неизвестно), `text` - описание текущего шага.
+    """
+    context = get_context()
+    if context is not None:
+        context.report(done, total, text)
+
+
+def check_cancelled() -> None:
+    """
+    Выбрасывает `CancelledError`, если пользователь запросил отмену.
+    Следует вызывать на границах циклов, где прерывание безопасно.
+    """
+    context = get_context()
+    if context is not None and context.is_cancelled():
+        raise CancelledError()
+
+
+def iterate(iterable: typing.Iterable, total: int | None = None, text: str = "") -> typing.Iterator:
+    """
+    Итерирует по `iterable`, перед каждым элементом проверяя отмену
+    (см. `check_cancelled()`) и сообщая о ходе выполнения (см. `report()`).
+
+    Если `total` не задан, используется `len(iterable)` (если это возможно).
+    """
+    if total is None:
+        try:
+            total = len(iterable)  # type: ignore
+        except TypeError:
+            total = 0
+    for i, item in enumerate(iterable):
+        check_cancelled()
+        report(i, total, text)
+        yield item
+    report(total, total, text)
@@ -0,0 +1,274 @@
+"""
+Модуль-библиотека для пакетного чтения и записи свойств компонентов
+через Менеджер свойств Компас (`IPropertyMng`, `IPropertyKeeper`).
+
+Объекты свойств (`IProperty`) получаются через `IPropertyMng.GetProperty()`
+один раз для каждого типа документа и номера свойства (см. `PropertyDescriptors`).
+
+Чтение нескольких свойств множества компонентов документа - `PropertyReader`.
+
+Пакетная запись `write_properties_bulk()` (или частями - `write_properties_batches()`):
+* группирует изменения по файлам;
+* читает текущие значения свойств за один проход и пропускает файлы,
+    в которых значения не изменились (такие файлы не сохраняются);
+* распределяет измененные файлы по пулу скрытых экземпляров Компас
+    (см. `kompas_pool`);
+* возвращает отчет о количестве записанных, пропущенных и неудачных файлов.
+
+Номера свойств (`p_id`) обязательно должны быть типа `float`.
+
+"""
+
+from .core import *
+from . import progress
+from .kompas_pool import KompasInstancePool, JobResult
+
+
+def _check_property_id(p_id: float) -> None:
+    if not isinstance(p_id, float):
+        raise Exception("p_id должно быть типа float")
+
+
+def normalize_property_value(value: typing.Any) -> typing.Any:
+    """
+    Приводит значение свойства к виду для сравнения (`None` считается пустой строкой).
+    """
+    return "" if value is None else value
+
+
+class PropertyDescriptors:
+    """
+    Кэш объектов свойств `IProperty` по типу документа и номеру свойства.
+
+    Объект следует использовать в одном потоке с одним экземпляром Компас.
+    """
+    def __init__(self, app: KAPI7.IApplication | None = None) -> None:
+        self._pmng: KAPI7.IPropertyMng = KAPI7.IPropertyMng(app if app is not None else get_app7())
+        self._properties: dict[tuple[int, float], KAPI7.IProperty] = {}
+
+    def get(self, doc: KAPI7.IKompasDocument, p_id: float) -> KAPI7.IProperty:
+        """
+        Возвращает объект свойства с номером `p_id` для документов типа документа `doc`.
+        """
+        key = (doc.DocumentType, p_id)
+        p = self._properties.get(key)
+        if p is None:
+            _check_property_id(p_id)
+            p = self._pmng.GetProperty(doc, p_id)
+            if p is None:
+                raise Exception(f"Свойство с номером {p_id} не найдено")
+            self._properties[key] = p
+        return p
+
+    def get_many(self, doc: KAPI7.IKompasDocument, p_ids: typing.Iterable[float]) -> list[KAPI7.IProperty]:
+        return [self.get(doc, p_id) for p_id in p_ids]
+
+
+def read_property_values(part: KAPI7.IPart7, properties: typing.Iterable[KAPI7.IProperty]) -> tuple:
+    """
+    Читает значения свойств `properties` компонента `part` за один проход.
+    """
+    pk = KAPI7.IPropertyKeeper(part)
+    values = []
+    for p in properties:
+        _, p_value, is_from_source = pk.GetPropertyValue(p, None, True, None)
+        values.append(p_value)
+    return tuple(values)
+
+
+class PropertyReader:
+    """
+    Объект для чтения значений нескольких свойств (`p_ids`) компонентов документа `doc`.
+
+    Объекты свойств получаются один раз при создании; значения свойств компонента
+    читаются за один проход и возвращаются кортежем в порядке `p_ids`.
+    Значения читаются "по источнику", т.е. из файла компонента.
+
+    Если задан кэш структуры `structure_cache`, то значения свойств компонентов,
+    файлы которых не изменились, берутся из кэша, а прочитанные из Компас
+    значения сохраняются в кэш.
+    """
+    def __init__(
+            self,
+            doc: KAPI7.IKompasDocument,
+            p_ids: typing.Sequence[float],
+            descriptors: PropertyDescriptors | None = None,
+            structure_cache: typing.Any = None,
+            ) -> None:
+        descriptors = descriptors if descriptors is not None else PropertyDescriptors()
+        self.p_ids: tuple[float, ...] = tuple(p_ids)
+        self._properties: list[KAPI7.IProperty] = descriptors.get_many(doc, self.p_ids)
+        self._structure_cache = structure_cache
+        """ `structure_cache.StructureCache` или `None` """
+
+    def read(self, part: KAPI7.IPart7) -> tuple:
+        """
+        Возвращает кортеж значений свойств компонента `part`.
+        """
+        filepath = part.FileName if self._structure_cache is not None else ""
+        if filepath != "":
+            values = self._structure_cache.get_property_values(filepath, self.p_ids)
+            if values is not None:
+                return values
+
+        values = read_property_values(part, self._properties)
+
+        if filepath != "":
+            self._structure_cache.store_property_values(filepath, dict(zip(self.p_ids, values)))
+        return values
+
+    def read_rows(self, parts: typing.Iterable[KAPI7.IPart7]) -> list[tuple]:
+        """
+        Возвращает список кортежей значений свойств компонентов `parts`.
+        """
+        return [self.read(part) for part in parts]
+
+
+def write_file_properties(
+        filepath: str,
+        values: dict[float, typing.Any],
+        descriptors: PropertyDescriptors | None = None,
+        ) -> bool:
+    """
+    Записывает свойства `values` (`{p_id: значение}`) в модель `filepath`.
+
+    Сначала читает текущие значения; записываются и сохраняются только изменившиеся
+    свойства. Возвращает `True`, если файл был изменен и сохранен,
+    и `False`, если все значения уже совпадали.
+
+    Документ, открытый функцией, закрывается после записи.
+    """
+    was_opened = find_opened_document(filepath) is not None
+    doc, part = open_part(filepath, is_hidden=True)
+    descriptors = descriptors if descriptors is not None else PropertyDescriptors()
+
+    try:
+        p_ids = list(values.keys())
+        properties = descriptors.get_many(doc, p_ids)
+        current = read_property_values(part, properties)
+
+        changed = [
+            (p, values[p_id])
+            for p_id, p, value in zip(p_ids, properties, current)
+            if normalize_property_value(value) != normalize_property_value(values[p_id])
+        ]
+        if len(changed) == 0:
+            return False
+
+        pk = KAPI7.IPropertyKeeper(part)
+        for p, value in changed:
+            if not pk.SetPropertyValue(p, value, True):
+                raise Exception(f"Не удалось изменить свойство '{p.Name}'")
+        part.Update()
+        if not doc.Save():
+            raise Exception("Не удалось сохранить документ")
+        return True
+    finally:
+        if not was_opened:
+            doc.Close(0)
+
+
+class BulkWriteReport:
+    """
+    Отчет о пакетной записи свойств.
+    """
+    def __init__(self) -> None:
+        self.written: list[str] = []
+        """ файлы, в которые записаны свойства """
+        self.skipped: list[str] = []
+        """ файлы, в которых значения свойств не изменились """
+        self.failed: dict[str, str] = {}
+        """ `{файл: текст ошибки}` """
+
+    def summary(self) -> str:
+        return f"Записано файлов: {len(self.written)}, без изменений: {len(self.skipped)}, ошибок: {len(self.failed)}."
+
+
+def group_changes_by_file(changes: typing.Iterable[tuple[str, dict[float, typing.Any]]]) -> dict[str, dict[float, typing.Any]]:
+    """
+    Объединяет изменения `[(файл, {p_id: значение}), ...]` по файлам.
+    Если одно свойство файла задано несколько раз с разными значениями,
+    используется последнее значение (с предупреждением).
+    """
+    result: dict[str, dict[float, typing.Any]] = {}
+    for filepath, values in changes:
+        key = os.path.normcase(os.path.abspath(filepath))
+        if not key in result:
+            result[key] = {}
+        file_values = result[key]
+        for p_id, value in values.items():
+            if p_id in file_values and file_values[p_id] != value:
+                print(f"Свойство {p_id} файла '{filepath}' задано несколько раз: {file_values[p_id]!r} -> {value!r}")
+            file_values[p_id] = value
+    return result
+
+
+def write_properties_bulk(
+        changes: typing.Iterable[tuple[str, dict[float, typing.Any]]],
+        instances_count: int = 0,
+        ) -> BulkWriteReport:
+    """
+    Выполняет пакетную запись свойств `changes` (`[(файл, {p_id: значение}), ...]`)
+    на `instances_count` скрытых экземплярах Компас
+    (при `instances_count <= 0` - в уже запущенном экземпляре Компас).
+
+    Ход выполнения передается в контекст `progress` вызывающего потока;
+    после запроса отмены оставшиеся файлы пропускаются и выбрасывается `CancelledError`.
+
+    См. `write_file_properties()`.
+    """
+    return write_properties_batches([changes], instances_count)
+
+
+def write_properties_batches(
+        batches: typing.Iterable[typing.Iterable[tuple[str, dict[float, typing.Any]]]],
+        instances_count: int = 0,
+        ) -> BulkWriteReport:
+    """
+    То же, что `write_properties_bulk()`, но изменения передаются частями `batches`
+    (например, генератором), и в памяти хранится только текущая часть.
+
+    Изменения группируются по файлам внутри каждой части; части записываются
+    по очереди на одних и тех же экземплярах Компас, поэтому, если файл
+    встречается в нескольких частях, в нем остаются значения последней части.
+    """
+    report = BulkWriteReport()
+    thread_local = threading.local()
+    done_count = 0
+    total_count = 0
+    # `on_result` вызывается из рабочих потоков пула, к которым контекст не привязан
+    context = progress.get_context()
+
+    def _job(item: tuple[str, dict[float, typing.Any]]) -> bool:
+        if not hasattr(thread_local, "descriptors"):
+            thread_local.descriptors = PropertyDescriptors()
+        filepath, values = item
+        return write_file_properties(filepath, values, thread_local.descriptors)
+
+    def _on_result(jr: JobResult) -> None:
+        nonlocal done_count
+        filepath = jr.item[0]
+        if not jr.is_ok():
+            report.failed[filepath] = jr.error
+            print(f"Не удалось изменить свойства в документе '{filepath}': {jr.error}")
+        elif jr.result:
+            report.written.append(filepath)
+        else:
+            report.skipped.append(filepath)
+        done_count += 1
+        if context is not None:
+            context.report(done_count, total_count, "Запись свойств")
+            if context.is_cancelled():
+                pool.cancel()
+
+    with KompasInstancePool(instances_count) as pool:
+        for changes in batches:
+            grouped = group_changes_by_file(changes)
+            total_count += len(grouped)
+            pool.run(_job, grouped.items(), _on_result)
+            if context is not None and context.is_cancelled():
+                break
+
+    print(report.summary())
+    progress.check_cancelled()
+    return report
@@ -47,6 +47,10 @@ class binaryObjectsFilter:
 #   ksFilterThread        = 15;
 
 
+OBJECTS_FILTERS_COUNT = 18
+""" количество фильтров выбора, которые читаются и записываются (номера `1...18`) """
+
+
 def get_objects_filter() -> int:
     """
     Возвращает текущие активированные фильтры выбора объектов
@@ -55,25 +59,40 @@ def get_objects_filter() -> int:
     app = get_app7()
     ss: KAPI7.ISystemSettings = app.SystemSettings
     binary_mask = 0
-    for i in range(1, 19):
+    for i in range(1, OBJECTS_FILTERS_COUNT + 1):
         binary_mask |= (2 ** (i - 1)) * ss.ObjectsFilter3D(i)
     return binary_mask
 
 
-def set_objects_filter(binary_mask: int) -> None:
+def set_objects_filter(binary_mask: int, previous_mask: int | None = None) -> int:
     """
     Устанавливает фильтры выбора объектов на указанные
     в виде бинарной маски `binary_mask` (см. `binaryObjectsFilter`).
+
+    Если задана маска `previous_mask`, которая установлена сейчас,
+    то записываются только отличающиеся фильтры.
+
+    Возвращает количество вызовов `SetObjectsFilter3D()`.
     """
+    if previous_mask is not None and previous_mask == binary_mask:
+        return 0
+
     app = get_app7()
     ss: KAPI7.ISystemSettings = app.SystemSettings
     if binary_mask == 0:
         ss.SetObjectsFilter3D(LDefin3D.ksFilterAll, True)
-        return
+        return 1
+
+    # при фильтре "Все объекты" (маска 0) значения отдельных фильтров не определены
+    changed = binary_mask ^ previous_mask if previous_mask else -1
 
-    for i in range(1, 19):
-        value = bool(binary_mask & (2 ** (i - 1)))
-        ss.SetObjectsFilter3D(i, value)
+    written_count = 0
+    for i in range(1, OBJECTS_FILTERS_COUNT + 1):
+        bit = 2 ** (i - 1)
+        if changed & bit:
+            ss.SetObjectsFilter3D(i, bool(binary_mask & bit))
+            written_count += 1
+    return written_count
 
 
 
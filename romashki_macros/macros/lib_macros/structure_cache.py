@@ -0,0 +1,404 @@
+"""
+Модуль-библиотека для хранения структуры 3D-моделей проекта в локальной базе SQLite.
+
+Для каждого файла модели хранится:
+* "отпечаток" файла: путь, размер и время изменения;
+* свойства: обозначение, наименование, материал, масса;
+* список дочерних компонентов первого уровня: путь к файлу, наименование,
+    количество вхождений и признаки (компоновочная геометрия, исключен из расчета);
+* значения свойств Менеджера свойств по номерам свойств (см. `properties.PropertyReader`).
+
+Запись считается актуальной, если размер и время изменения файла на диске
+совпадают с сохраненными. Поэтому запросы к структуре неизмененного проекта
+(спецификация, применяемость, свойства) выполняются без Компас, а через Компас
+заново читаются только измененные файлы (см. `update_structure()`).
+
+Пример применения:
+```python
+with StructureCache() as cache:
+    update_structure("D:\\Project\\Сборка.a3d", cache)
+    for child in cache.get_children("D:\\Project\\Сборка.a3d"):
+        print(child.path, child.count)
+```
+
+"""
+
+from .core import *
+from . import progress
+
+from ... import config
+
+import json
+import sqlite3
+
+
+DEFAULT_DB_PATH = os.path.join(config.PROGRAM_TEMP_FOLDER, "structure_cache.sqlite3")
+
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    marking TEXT NOT NULL,
+    name TEXT NOT NULL,
+    material TEXT NOT NULL,
+    mass REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS children (
+    parent TEXT NOT NULL,
+    child TEXT NOT NULL,
+    child_name TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    is_layout_geometry INTEGER NOT NULL,
+    is_excluded INTEGER NOT NULL,
+    PRIMARY KEY (parent, child, child_name, is_layout_geometry, is_excluded)
+);
+CREATE INDEX IF NOT EXISTS children_by_child ON children (child);
+CREATE TABLE IF NOT EXISTS properties (
+    path TEXT NOT NULL,
+    p_id REAL NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (path, p_id)
+);
+"""
+
+
+def get_file_stat(path: str) -> tuple[int, int] | None:
+    """
+    Возвращает `(размер, время изменения в нс)` файла `path` или `None`, если файла нет.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+class FileRecord:
+    """
+    Запись о файле модели.
+    """
+    __slots__ = ("path", "size", "mtime_ns", "marking", "name", "material", "mass")
+
+    def __init__(
+            self,
+            path: str,
+            size: int = 0,
+            mtime_ns: int = 0,
+            marking: str = "",
+            name: str = "",
+            material: str = "",
+            mass: float = 0.0,
+            ) -> None:
+        self.path: str = path
+        self.size: int = size
+        self.mtime_ns: int = mtime_ns
+        self.marking: str = marking
+        self.name: str = name
+        self.material: str = material
+        self.mass: float = mass
+
+    def __repr__(self) -> str:
+        return f"<FileRecord {self.path!r} {self.marking!r} {self.name!r}>"
+
+
+class ChildRecord:
+    """
+    Запись о дочернем компоненте первого уровня.
+
+    Если файл компонента не найден (путь пустой), `path == ""`,
+    а компонент определяется по наименованию `name`.
+    """
+    __slots__ = ("path", "name", "count", "is_layout_geometry", "is_excluded")
+
+    def __init__(self, path: str, name: str, count: int = 1, is_layout_geometry: bool = False, is_excluded: bool = False) -> None:
+        self.path: str = path
+        self.name: str = name
+        self.count: int = count
+        self.is_layout_geometry: bool = is_layout_geometry
+        self.is_excluded: bool = is_excluded
+
+    def key(self) -> tuple[str, str, bool, bool]:
+        return (self.path, self.name, self.is_layout_geometry, self.is_excluded)
+
+    def __repr__(self) -> str:
+        return f"<ChildRecord {self.path or self.name!r} x{self.count}>"
+
+
+class StructureCache:
+    """
+    База SQLite со структурой и свойствами файлов моделей.
+
+    Объект следует использовать в том потоке, в котором он создан.
+    """
+    def __init__(self, db_path: str = DEFAULT_DB_PATH) -> None:
+        self.db_path: str = db_path
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._conn.executescript("DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS children; DROP TABLE IF EXISTS properties;")
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> 'StructureCache':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def get_file(self, path: str) -> FileRecord | None:
+        """
+        Возвращает сохраненную запись о файле `path` (даже неактуальную) или `None`.
+        """
+        row = self._conn.execute(
+            "SELECT path, size, mtime_ns, marking, name, material, mass FROM files WHERE path = ?",
+            (normalize_path(path),),
+        ).fetchone()
+        return FileRecord(*row) if row is not None else None
+
+    def is_up_to_date(self, path: str) -> bool:
+        """
+        Проверяет, что запись о файле `path` есть и соответствует файлу на диске.
+        """
+        st = get_file_stat(path)
+        if st is None:
+            return False
+        row = self._conn.execute("SELECT size, mtime_ns FROM files WHERE path = ?", (normalize_path(path),)).fetchone()
+        return row is not None and tuple(row) == st
+
+    def get_children(self, path: str) -> list[ChildRecord]:
+        """
+        Возвращает дочерние компоненты первого уровня файла `path`.
+        """
+        rows = self._conn.execute(
+            "SELECT child, child_name, count, is_layout_geometry, is_excluded FROM children WHERE parent = ? ORDER BY rowid",
+            (normalize_path(path),),
+        ).fetchall()
+        return [ChildRecord(c, n, cnt, bool(lg), bool(ex)) for c, n, cnt, lg, ex in rows]
+
+    def get_parents(self, path: str) -> list[tuple[str, int]]:
+        """
+        Возвращает список `[(путь к родительскому файлу, количество вхождений), ...]`
+        для файла `path` по всем сохраненным файлам.
+        """
+        rows = self._conn.execute(
+            "SELECT parent, SUM(count) FROM children WHERE child = ? GROUP BY parent ORDER BY parent",
+            (normalize_path(path),),
+        ).fetchall()
+        return [(p, cnt) for p, cnt in rows]
+
+    def get_unresolved_children(self) -> list[tuple[str, str]]:
+        """
+        Возвращает список `[(родительский файл, наименование компонента), ...]`
+        компонентов с ненайденными файлами (пустым путем).
+        """
+        rows = self._conn.execute(
+            "SELECT DISTINCT parent, child_name FROM children WHERE child = '' ORDER BY parent, child_name"
+        ).fetchall()
+        return [(p, n) for p, n in rows]
+
+    def iterate_files(self) -> typing.Iterator[FileRecord]:
+        """
+        Итерирует по всем сохраненным записям о файлах.
+        """
+        for row in self._conn.execute("SELECT path, size, mtime_ns, marking, name, material, mass FROM files ORDER BY path"):
+            yield FileRecord(*row)
+
+    def store(self, record: FileRecord, children: typing.Iterable[ChildRecord]) -> None:
+        """
+        Сохраняет запись о файле и его дочерние компоненты (заменяя прежние).
+        """
+        path = normalize_path(record.path)
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, marking, name, material, mass) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, record.size, record.mtime_ns, record.marking, record.name, record.material, record.mass),
+            )
+            self._conn.execute("DELETE FROM children WHERE parent = ?", (path,))
+            self._conn.executemany(
+                "INSERT INTO children (parent, child, child_name, count, is_layout_geometry, is_excluded) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (path, normalize_path(c.path) if c.path != "" else "", c.name, c.count, int(c.is_layout_geometry), int(c.is_excluded))
+                    for c in children
+                ],
+            )
+
+    def get_property_values(self, path: str, p_ids: typing.Sequence[float]) -> tuple | None:
+        """
+        Возвращает сохраненные значения свойств `p_ids` файла `path`,
+        если все они сохранены и соответствуют файлу на диске; иначе `None`.
+        """
+        st = get_file_stat(path)
+        if st is None or len(p_ids) == 0:
+            return None
+        rows = self._conn.execute(
+            f"SELECT p_id, value FROM properties WHERE path = ? AND size = ? AND mtime_ns = ? AND p_id IN ({', '.join('?' * len(p_ids))})",
+            (normalize_path(path), st[0], st[1], *p_ids),
+        ).fetchall()
+        values = {p_id: json.loads(value) for p_id, value in rows}
+        if len(values) != len(set(p_ids)):
+            return None
+        return tuple(values[p_id] for p_id in p_ids)
+
+    def store_property_values(self, path: str, values: dict[float, typing.Any]) -> None:
+        """
+        Сохраняет значения свойств `values` (`{p_id: значение}`) файла `path`.
+        """
+        st = get_file_stat(path)
+        if st is None:
+            return
+        key = normalize_path(path)
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO properties (path, p_id, size, mtime_ns, value) VALUES (?, ?, ?, ?, ?)",
+                [(key, p_id, st[0], st[1], json.dumps(value, ensure_ascii=False)) for p_id, value in values.items()],
+            )
+
+    def remove(self, path: str) -> None:
+        """
+        Удаляет запись о файле `path` и о его дочерних компонентах.
+        """
+        path = normalize_path(path)
+        with self._conn:
+            self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+            self._conn.execute("DELETE FROM children WHERE parent = ?", (path,))
+            self._conn.execute("DELETE FROM properties WHERE path = ?", (path,))
+
+    def remove_missing_files(self) -> int:
+        """
+        Удаляет записи о файлах, которых больше нет на диске. Возвращает количество удаленных записей.
+        """
+        missing = [r.path for r in self.iterate_files() if get_file_stat(r.path) is None]
+        for path in missing:
+            self.remove(path)
+        return len(missing)
+
+
+def read_part_record(part: KAPI7.IPart7, path: str = "") -> tuple[FileRecord, list[ChildRecord]]:
+    """
+    Читает из компонента `part` свойства файла и список дочерних компонентов первого уровня
+    (одинаковые компоненты с одинаковыми признаками объединяются с подсчетом количества).
+    """
+    path = path if path != "" else part.FileName
+    st = get_file_stat(path) or (0, 0)
+
+    try:
+        mass = float(KAPI7.IMassInertiaParam7(part).Mass)
+    except Exception:
+        mass = 0.0
+
+    record = FileRecord(path, st[0], st[1], part.Marking, part.Name, part.Material, mass)
+
+    children: dict[tuple, ChildRecord] = {}
+    for child in iterate_child_parts(part):
+        c = ChildRecord(child.FileName, child.Name, 1, child.IsLayoutGeometry, KAPI7.IFeature7(child).Excluded)
+        key = c.key()
+        if key in children:
+            children[key].count += 1
+        else:
+            children[key] = c
+    return record, list(children.values())
+
+
+def find_stale_files(root_path: str, cache: StructureCache) -> set[str]:
+    """
+    Обходит сохраненную структуру файла `root_path` (без Компас) и возвращает
+    множество нормализованных путей файлов, записи о которых отсутствуют
+    или не соответствуют файлам на диске.
+    """
+    stale: set[str] = set()
+    visited: set[str] = set()
+    stack = [normalize_path(root_path)]
+    while len(stack) != 0:
+        path = stack.pop()
+        if path in visited:
+            continue
+        visited.add(path)
+        if not cache.is_up_to_date(path):
+            stale.add(path)
+            continue
+        for c in cache.get_children(path):
+            if c.path != "":
+                stack.append(c.path)
+    return stale
+
+
+def update_structure(root_path: str, cache: StructureCache) -> int:
+    """
+    Обновляет в базе `cache` структуру файла `root_path` и всех его компонентов.
+
+    Если все записи актуальны, Компас не используется. Иначе сборка `root_path`
+    открывается в Компас один раз, дерево обходится по уникальным файлам,
+    и заново читаются только измененные или новые файлы.
+    Сборка, открытая функцией, закрывается.
+
+    Возвращает количество обновленных записей.
+    """
+    stale = find_stale_files(root_path, cache)
+    if len(stale) == 0:
+        return 0
+
+    # `find_stale_files()` не заходит в неактуальные и отсутствующие записи,
+    # поэтому их новые компоненты проверяются при обходе
+    def _is_stale(key: str) -> bool:
+        if not key in stale and not cache.is_up_to_date(key):
+            stale.add(key)
+        return key in stale
+
+    # { путь: есть ли в поддереве неактуальные файлы } - по сохраненной структуре
+    stale_subtrees: dict[str, bool] = {}
+
+    def _is_subtree_stale(key: str) -> bool:
+        if _is_stale(key):
+            return True
+        if not key in stale_subtrees:
+            stale_subtrees[key] = False  # защита от циклических ссылок
+            stale_subtrees[key] = any(_is_subtree_stale(c.path) for c in cache.get_children(key) if c.path != "")
+        return stale_subtrees[key]
+
+    updated_count = 0
+    visited: set[str] = set()
+
+    def _update(part: KAPI7.IPart7, path: str) -> None:
+        nonlocal updated_count
+        progress.check_cancelled()
+        record, children = read_part_record(part, path)
+        cache.store(record, children)
+        updated_count += 1
+        progress.report(updated_count, 0, f"Обновлено записей структуры: {updated_count}")
+
+    def _f(part: KAPI7.IPart7) -> bool:
+        path = part.FileName
+        if path == "":
+            return False
+        key = normalize_path(path)
+        if key in visited:
+            return False  # поддерево уже обойдено
+        visited.add(key)
+        if not _is_stale(key):
+            return _is_subtree_stale(key)
+        _update(part, path)
+        return True
+
+    was_opened = find_opened_document(root_path) is not None
+    doc, toppart = open_part(root_path, True)
+    try:
+        visited.add(normalize_path(root_path))
+        if normalize_path(root_path) in stale:
+            _update(toppart, root_path)
+        apply_to_children_r(toppart, _f)
+    finally:
+        if not was_opened:
+            doc.Close(0)
+
+    print(f"Обновлено записей в кэше структуры: {updated_count}")
+    return updated_count
@@ -41,86 +41,94 @@ class VisibleElements:
     LayoutGeometry_InComponents = 2 << 27
 
 
+VISIBLE_ELEMENTS_PROPERTIES: list[tuple[int, int, str]] = [
+    (VisibleElements.AuxiliaryGeom,  VisibleElements.AuxiliaryGeom_InComponents,  "HideAllAuxiliaryGeom"),
+    (VisibleElements.Axis,           VisibleElements.Axis_InComponents,           "HideAllAxis"),
+    (VisibleElements.ControlPoints,  VisibleElements.ControlPoints_InComponents,  "HideAllControlPoints"),
+    (VisibleElements.Curves,         VisibleElements.Curves_InComponents,         "HideAllCurves"),
+    (VisibleElements.Designations,   VisibleElements.Designations_InComponents,   "HideAllDesignations"),
+    (VisibleElements.Dimensions,     VisibleElements.Dimensions_InComponents,     "HideAllDimensions"),
+    (VisibleElements.Places,         VisibleElements.Places_InComponents,         "HideAllPlaces"),
+    (VisibleElements.Planes,         VisibleElements.Planes_InComponents,         "HideAllPlanes"),
+    (VisibleElements.Sketches,       VisibleElements.Sketches_InComponents,       "HideAllSketches"),
+    (VisibleElements.Surfaces,       VisibleElements.Surfaces_InComponents,       "HideAllSurfaces"),
+    (VisibleElements.Threads,        VisibleElements.Threads_InComponents,        "HideAllThreads"),
+    (VisibleElements.LayoutGeometry, VisibleElements.LayoutGeometry_InComponents, "HideLayoutGeometry"),
+]
+"""
+`[(бит маски, бит маски "в компонентах", свойство документа), ...]`.
+Свойство `HideLayoutGeometry` принадлежит интерфейсу `IKompasDocument3D1`, остальные - `IKompasDocument3D`.
+"""
+
+ALL_VISIBLE_ELEMENTS: int = sum(bit | bit_ic for bit, bit_ic, name in VISIBLE_ELEMENTS_PROPERTIES)
+
+
+def _get_property_owner(active_doc: KAPI7.IKompasDocument3D, active_doc1: KAPI7.IKompasDocument3D1, name: str):
+    return active_doc1 if name == "HideLayoutGeometry" else active_doc
+
+
 def get_visible_elements(active_doc: KAPI7.IKompasDocument3D) -> int:
     """
     Возвращает фильтр отображаемых вспомогательных объектов
     в документе `active_doc`
     в виде бинарной маски (см. `VisibleElements`).
+
+    Режим `HideInComponentsMode` переключается один раз и восстанавливается.
     """
     binary_mask = 0
 
     active_doc1: KAPI7.IKompasDocument3D1 = KAPI7.IKompasDocument3D1(active_doc)
 
-    active_doc.HideInComponentsMode = False
-
-    binary_mask += VisibleElements.AuxiliaryGeom  * (1 - int(active_doc.HideAllAuxiliaryGeom))
-    binary_mask += VisibleElements.Axis           * (1 - int(active_doc.HideAllAxis))
-    binary_mask += VisibleElements.ControlPoints  * (1 - int(active_doc.HideAllControlPoints))
-    binary_mask += VisibleElements.Curves         * (1 - int(active_doc.HideAllCurves))
-    binary_mask += VisibleElements.Designations   * (1 - int(active_doc.HideAllDesignations))
-    binary_mask += VisibleElements.Dimensions     * (1 - int(active_doc.HideAllDimensions))
-    binary_mask += VisibleElements.Places         * (1 - int(active_doc.HideAllPlaces))
-    binary_mask += VisibleElements.Planes         * (1 - int(active_doc.HideAllPlanes))
-    binary_mask += VisibleElements.Sketches       * (1 - int(active_doc.HideAllSketches))
-    binary_mask += VisibleElements.Surfaces       * (1 - int(active_doc.HideAllSurfaces))
-    binary_mask += VisibleElements.Threads        * (1 - int(active_doc.HideAllThreads))
-    binary_mask += VisibleElements.LayoutGeometry * (1 - int(active_doc1.HideLayoutGeometry))
-
-    active_doc.HideInComponentsMode = True
-
-    binary_mask += VisibleElements.AuxiliaryGeom_InComponents  * (1 - int(active_doc.HideAllAuxiliaryGeom))
-    binary_mask += VisibleElements.Axis_InComponents           * (1 - int(active_doc.HideAllAxis))
-    binary_mask += VisibleElements.ControlPoints_InComponents  * (1 - int(active_doc.HideAllControlPoints))
-    binary_mask += VisibleElements.Curves_InComponents         * (1 - int(active_doc.HideAllCurves))
-    binary_mask += VisibleElements.Designations_InComponents   * (1 - int(active_doc.HideAllDesignations))
-    binary_mask += VisibleElements.Dimensions_InComponents     * (1 - int(active_doc.HideAllDimensions))
-    binary_mask += VisibleElements.Places_InComponents         * (1 - int(active_doc.HideAllPlaces))
-    binary_mask += VisibleElements.Planes_InComponents         * (1 - int(active_doc.HideAllPlanes))
-    binary_mask += VisibleElements.Sketches_InComponents       * (1 - int(active_doc.HideAllSketches))
-    binary_mask += VisibleElements.Surfaces_InComponents       * (1 - int(active_doc.HideAllSurfaces))
-    binary_mask += VisibleElements.Threads_InComponents        * (1 - int(active_doc.HideAllThreads))
-    binary_mask += VisibleElements.LayoutGeometry_InComponents * (1 - int(active_doc1.HideLayoutGeometry))
+    mode = bool(active_doc.HideInComponentsMode)
+    for in_components in (mode, not mode):
+        if in_components != mode:
+            active_doc.HideInComponentsMode = in_components
+        for bit, bit_ic, name in VISIBLE_ELEMENTS_PROPERTIES:
+            if not getattr(_get_property_owner(active_doc, active_doc1, name), name):
+                binary_mask |= bit_ic if in_components else bit
+    active_doc.HideInComponentsMode = mode
 
     return binary_mask
 
 
-def set_visible_elements(active_doc: KAPI7.IKompasDocument3D, binary_mask: int) -> None:
+def set_visible_elements(active_doc: KAPI7.IKompasDocument3D, binary_mask: int, previous_mask: int | None = None) -> int:
     """
     Устаналивает фильтр отображаемых вспомогательных объектов
     в документе `active_doc`
     в виде бинарной маски `binary_mask` (см. `VisibleElements`).
+
+    Если задана маска `previous_mask`, которая установлена в документе сейчас,
+    то записываются только отличающиеся флаги, а режим `HideInComponentsMode`
+    переключается, только если отличаются флаги "в компонентах" (или, наоборот,
+    на уровне документа). Режим `HideInComponentsMode` восстанавливается.
+
+    Возвращает количество записанных флагов.
     """
+    changed = ALL_VISIBLE_ELEMENTS if previous_mask is None else (binary_mask ^ previous_mask) & ALL_VISIBLE_ELEMENTS
+    if changed == 0:
+        return 0
+
     active_doc1: KAPI7.IKompasDocument3D1 = KAPI7.IKompasDocument3D1(active_doc)
 
-    active_doc.HideInComponentsMode = False
-
-    active_doc.HideAllAuxiliaryGeom = not bool(binary_mask & VisibleElements.AuxiliaryGeom)
-    active_doc.HideAllAxis          = not bool(binary_mask & VisibleElements.Axis)
-    active_doc.HideAllControlPoints = not bool(binary_mask & VisibleElements.ControlPoints)
-    active_doc.HideAllCurves        = not bool(binary_mask & VisibleElements.Curves)
-    active_doc.HideAllDesignations  = not bool(binary_mask & VisibleElements.Designations)
-    active_doc.HideAllDimensions    = not bool(binary_mask & VisibleElements.Dimensions)
-    active_doc.HideAllPlaces        = not bool(binary_mask & VisibleElements.Places)
-    active_doc.HideAllPlanes        = not bool(binary_mask & VisibleElements.Planes)
-    active_doc.HideAllSketches      = not bool(binary_mask & VisibleElements.Sketches)
-    active_doc.HideAllSurfaces      = not bool(binary_mask & VisibleElements.Surfaces)
-    active_doc.HideAllThreads       = not bool(binary_mask & VisibleElements.Threads)
-    active_doc1.HideLayoutGeometry  = not bool(binary_mask & VisibleElements.LayoutGeometry)
-
-    active_doc.HideInComponentsMode = True
-
-    active_doc.HideAllAuxiliaryGeom = not bool(binary_mask & VisibleElements.AuxiliaryGeom_InComponents)
-    active_doc.HideAllAxis          = not bool(binary_mask & VisibleElements.Axis_InComponents)
-    active_doc.HideAllControlPoints = not bool(binary_mask & VisibleElements.ControlPoints_InComponents)
-    active_doc.HideAllCurves        = not bool(binary_mask & VisibleElements.Curves_InComponents)
-    active_doc.HideAllDesignations  = not bool(binary_mask & VisibleElements.Designations_InComponents)
-    active_doc.HideAllDimensions    = not bool(binary_mask & VisibleElements.Dimensions_InComponents)
-    active_doc.HideAllPlaces        = not bool(binary_mask & VisibleElements.Places_InComponents)
-    active_doc.HideAllPlanes        = not bool(binary_mask & VisibleElements.Planes_InComponents)
-    active_doc.HideAllSketches      = not bool(binary_mask & VisibleElements.Sketches_InComponents)
-    active_doc.HideAllSurfaces      = not bool(binary_mask & VisibleElements.Surfaces_InComponents)
-    active_doc.HideAllThreads       = not bool(binary_mask & VisibleElements.Threads_InComponents)
-    active_doc1.HideLayoutGeometry  = not bool(binary_mask & VisibleElements.LayoutGeometry_InComponents)
+    written_count = 0
+    mode = bool(active_doc.HideInComponentsMode)
+    for in_components in (mode, not mode):
+        properties = [
+            (bit_ic if in_components else bit, name)
+            for bit, bit_ic, name in VISIBLE_ELEMENTS_PROPERTIES
+            if changed & (bit_ic if in_components else bit)
+        ]
+        if len(properties) == 0:
+            continue
+        if in_components != mode:
+            active_doc.HideInComponentsMode = in_components
+        for b, name in properties:
+            setattr(_get_property_owner(active_doc, active_doc1, name), name, not bool(binary_mask & b))
+            written_count += 1
+    if bool(active_doc.HideInComponentsMode) != mode:
+        active_doc.HideInComponentsMode = mode
+
+    return written_count
 
 
 if __name__ == "__main__":
@@ -0,0 +1,141 @@
+"""
+Модуль-библиотека для определения применяемости файлов моделей:
+в каких сборках папки проекта используется файл и в каком количестве.
+
+Обратный индекс "дочерний файл -> родительские файлы" хранится в кэше структуры
+(см. `structure_cache`, индекс по столбцу `child`). Индекс по всей папке проекта
+обновляется инкрементально функцией `update_where_used_index()`: список сборок
+берется из каталога файлов (см. `utils.file_catalog`), и через Компас заново
+читаются только сборки, измененные с момента предыдущего обновления.
+
+Пример применения:
+```python
+with StructureCache() as cache:
+    update_where_used_index("D:\\Project", cache)
+    for parent, count in get_where_used("D:\\Project\\Деталь.m3d", cache).items():
+        print(parent, count)
+```
+
+"""
+
+from .core import *
+from . import progress
+from .structure_cache import StructureCache, normalize_path, read_part_record
+
+from ...utils.file_catalog import FileCatalog, get_cache_filepath
+
+from ... import config
+
+
+FILE_CATALOG_CACHE_FOLDER = os.path.join(config.PROGRAM_TEMP_FOLDER, "file_catalogs")
+
+ASSEMBLY_EXTENSIONS = (".a3d",)
+
+
+def get_assemblies_catalog(project_dir: str) -> FileCatalog:
+    """
+    Возвращает каталог файлов сборок папки проекта `project_dir` (с кэшем на диске).
+    """
+    catalog = FileCatalog(project_dir, ASSEMBLY_EXTENSIONS, get_cache_filepath(FILE_CATALOG_CACHE_FOLDER, project_dir))
+    return catalog.scan()
+
+
+def update_where_used_index(project_dir: str, cache: StructureCache, catalog: FileCatalog | None = None) -> int:
+    """
+    Обновляет в кэше структуры `cache` записи обо всех сборках папки проекта `project_dir`:
+    через Компас открываются только новые и измененные сборки, записи об удаленных
+    файлах удаляются.
+
+    Возвращает количество обновленных записей.
+    """
+    catalog = catalog if catalog is not None else get_assemblies_catalog(project_dir)
+
+    stale = [path for path in catalog.iterate_paths() if not cache.is_up_to_date(path)]
+    removed_count = cache.remove_missing_files()
+    print(f"Сборок в папке проекта: {len(catalog)}, требуется обновить: {len(stale)}, удалено записей: {removed_count}")
+    if len(stale) == 0:
+        return 0
+
+    app = get_app7()
+    docs: KAPI7.IDocuments = app.Documents
+    opened_paths = {normalize_path(docs.Item(i).PathName) for i in range(docs.Count)}
+
+    prev_hidemessage = app.HideMessage
+    app.HideMessage = 2
+    updated_count = 0
+    try:
+        for path in progress.iterate(stale, text="Обновление индекса применяемости"):
+            try:
+                doc, toppart = open_part(path, True)
+            except Exception as e:
+                print(f"Не удается открыть сборку '{path}': {e}")
+                continue
+            try:
+                record, children = read_part_record(toppart, path)
+                cache.store(record, children)
+                updated_count += 1
+            finally:
+                if not normalize_path(path) in opened_paths:
+                    doc.Close(0)
+    finally:
+        app.HideMessage = prev_hidemessage
+
+    return updated_count
+
+
+def get_direct_parents(path: str, cache: StructureCache) -> list[tuple[str, int]]:
+    """
+    Возвращает список `[(родительский файл, количество вхождений), ...]` файлов,
+    в которые `path` входит непосредственно (на первом уровне).
+    """
+    return cache.get_parents(path)
+
+
+def get_where_used(path: str, cache: StructureCache) -> dict[str, int]:
+    """
+    Возвращает словарь `{файл сборки: общее количество вхождений}` для всех сборок,
+    в которые файл `path` входит на любом уровне вложенности.
+
+    Количество вычисляется за один проход по сборкам-предкам в топологическом порядке
+    (каждая связь "родитель - дочерний файл" учитывается один раз).
+    """
+    path = normalize_path(path)
+
+    parents: dict[str, list[tuple[str, int]]] = {}
+    postorder: list[str] = []
+    stack: list[tuple[str, typing.Iterator[tuple[str, int]]]] = []
+
+    def _push(p: str) -> None:
+        parents[p] = cache.get_parents(p)
+        stack.append((p, iter(parents[p])))
+
+    _push(path)
+    while len(stack) != 0:
+        p, it = stack[-1]
+        for parent, count in it:
+            if not parent in parents:
+                _push(parent)
+                break
+        else:
+            stack.pop()
+            postorder.append(p)
+
+    totals: dict[str, int] = {path: 1}
+    for p in reversed(postorder):  # каждый файл раньше своих родителей
+        for parent, count in parents[p]:
+            totals[parent] = totals.get(parent, 0) + totals[p] * count
+    del totals[path]
+    return dict(sorted(totals.items()))
+
+
+def get_unresolved_children(cache: StructureCache, parent_paths: typing.Iterable[str] | None = None) -> list[tuple[str, str]]:
+    """
+    Возвращает список `[(родительский файл, наименование компонента), ...]`
+    компонентов, файлы которых не были найдены при чтении родительских файлов
+    (по всем сохраненным файлам или только по `parent_paths`).
+    """
+    result = cache.get_unresolved_children()
+    if parent_paths is not None:
+        keys = {normalize_path(p) for p in parent_paths}
+        result = [(parent, name) for parent, name in result if parent in keys]
+    return result
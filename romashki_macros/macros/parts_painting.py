@@ -12,6 +12,10 @@
     который зачем-то перекрашивает деталь в темно-серый цвет и меняет её
     оптические свойства.
 
+* для покраски компонентов по правилам (см. `PaintRule`): например, покупные
+изделия - серым, компоненты с обозначением `2025.0012...` - синим. Все правила
+проверяются за один обход дерева сборки, применяется первое подходящее правило.
+
 * для покраски дочерних компонентов в цвет "По исходному объекту".
 То есть, чтобы дочерние компоненты имели тот же цвет, что и цвет сборки.
 
@@ -22,10 +26,16 @@
 Перекрашивание может выполняться как для выбранного единичного компонента, так и
 рекурсивно для его компонентов тоже.
 
+Перекрашивание выполняется в два прохода: сначала читаются текущие цвета
+компонентов (см. `collect_parts_to_paint()`), затем изменяются только компоненты,
+цвет которых отличается от требуемого.
+
 """
 
 from .lib_macros.core import *
+from .lib_macros import progress
 
+import re
 import typing
 
 
@@ -67,25 +77,133 @@ class UseColorEnum:
 
 
 
+PAINT_TOLERANCE = 1e-3
+""" допуск сравнения оптических свойств краски (Компас хранит их с пониженной точностью) """
+
+
+def read_paint(cp: KAPI7.IColorParam7) -> PaintData:
+    """
+    Возвращает текущую краску объекта `cp`.
+    """
+    _, color_kompas, Am, Di, Sp, Sh, Tr, Em = cp.GetAdvancedColor()
+    return (color_kompas_to_traditional(color_kompas), Am, Di, Sp, Sh, 1 - Tr, Em)
+
+
+def is_paint_equal(paint1: PaintData, paint2: PaintData) -> bool:
+    if paint1[0] != paint2[0]:
+        return False
+    return all(abs(v1 - v2) < PAINT_TOLERANCE for v1, v2 in zip(paint1[1:], paint2[1:]))
+
+
+def is_paint_applied(part: KAPI7.IPart7, paint: PaintData | None, useColor: int) -> bool:
+    """
+    Возвращает `True`, если у компонента `part` уже установлены
+    способ задания цвета `useColor` и (для `useColorOur`) краска `paint`.
+    """
+    cp = KAPI7.IColorParam7(part)
+    if cp.UseColor != useColor:
+        return False
+    if useColor != UseColorEnum.useColorOur:
+        return True
+    return is_paint_equal(read_paint(cp), paint)
+
+
+def is_paintable(part: KAPI7.IPart7) -> bool:
+    """
+    Возвращает `False` (с сообщением) для компоновочной геометрии
+    и исключенных из расчета компонентов.
+    """
+    if part.IsLayoutGeometry or KAPI7.IFeature7(part).Excluded:
+        print(f"Пропускается от перекрашивания: {part.Marking} {part.Name} {part.FileName}")
+        return False
+    return True
+
+
+def _add_source_file(part: KAPI7.IPart7, seen_files: set[str]) -> bool:
+    """
+    Добавляет файл-источник компонента в множество `seen_files`.
+    Возвращает `False`, если файл уже был добавлен ранее.
+    """
+    if part.FileName == "":
+        return True
+    key = os.path.normcase(part.FileName)
+    if key in seen_files:
+        return False
+    seen_files.add(key)
+    return True
+
+
+def apply_paint(part: KAPI7.IPart7, paint: PaintData | None, useColor: int) -> None:
+    """
+    Устанавливает компоненту `part` способ задания цвета `useColor`
+    и (для `useColorOur`) краску `paint`.
+    """
+    print(f"Перекрашивается: {part.Marking} {part.Name} {part.FileName}")
+    cp = KAPI7.IColorParam7(part)
+    cp.UseColor = useColor
+    if useColor == UseColorEnum.useColorOur:
+        color, Am, Di, Sp, Sh, Tr, Em = paint
+        cp.SetAdvancedColor(color_traditional_to_kompas(color), Am, Di, Sp, Sh, 1 - Tr, Em)
+    part.Update()
+
+
+def collect_parts_to_paint(
+        parts: list[KAPI7.IPart7],
+        paint: PaintData | None,
+        useColor: int,
+        is_recursive: bool,
+        ) -> list[KAPI7.IPart7]:
+    """
+    Проход чтения: возвращает компоненты из `parts` (и, если `is_recursive`,
+    их дочерние компоненты), которые нужно перекрасить.
+
+    Пропускаются компоновочная геометрия, исключенные из расчета компоненты
+    и компоненты, цвет которых уже совпадает с требуемым.
+
+    При покраске собственным цветом (`useColorOur`) краска хранится в файле-источнике,
+    поэтому каждый файл перекрашивается один раз: повторные вхождения того же файла
+    (и их дочерние компоненты) не обходятся.
+    """
+    result: list[KAPI7.IPart7] = []
+    seen_files: set[str] = set()
+    do_dedupe = useColor == UseColorEnum.useColorOur
+    visited_count = 0
+    unchanged_count = 0
+
+    def visit(part: KAPI7.IPart7) -> bool:
+        nonlocal visited_count, unchanged_count
+        progress.check_cancelled()
+        if not is_paintable(part):
+            return False
+        if do_dedupe and not _add_source_file(part, seen_files):
+            return False
+
+        visited_count += 1
+        progress.report(visited_count, 0, f"Проверено компонентов: {visited_count}")
+        if is_paint_applied(part, paint, useColor):
+            unchanged_count += 1
+        else:
+            result.append(part)
+        return True
+
+    for part in parts:
+        visit(part)
+
+    if is_recursive:
+        for part in parts:
+            apply_to_children_r(part, visit)
+
+    print(f"Проверено компонентов: {visited_count}, уже имеют нужный цвет: {unchanged_count}")
+    return result
+
+
 def paint_parts(
         paint: PaintData | None,
         useColor = UseColorEnum.useColorOur,
         is_recursive = False,
         ) -> None:
-    def apply_color(part: KAPI7.IPart7):
-        if part.IsLayoutGeometry or KAPI7.IFeature7(part).Excluded:
-            print(f"Пропускается от перекрашивания: {part.Marking} {part.Name} {part.FileName}")
-            return False
-        print(f"Перекрашивается: {part.Marking} {part.Name} {part.FileName}")
-        cp = KAPI7.IColorParam7(part)
-        cp.UseColor = useColor
-        if useColor == UseColorEnum.useColorOur:
-            assert paint is not None
-            color, Am, Di, Sp, Sh, Tr, Em = paint
-            color_kompas = color_traditional_to_kompas(color)
-            cp.SetAdvancedColor(color_kompas, Am, Di, Sp, Sh, 1 - Tr, Em)
-        part.Update()
-        return True
+    if useColor == UseColorEnum.useColorOur:
+        assert paint is not None
 
     doc, toppart = open_part()
     parts: list[KAPI7.IPart7] = get_selected(doc, KAPI7.IPart7)
@@ -99,23 +217,176 @@ def paint_parts(
     else:
         print(f"Выбрано компонентов: {len(parts)}. ")
 
+    parts_to_paint = collect_parts_to_paint(parts, paint, useColor, is_recursive)
+
+    for part in progress.iterate(parts_to_paint, text="Перекрашивание компонентов"):
+        apply_paint(part, paint, useColor)
+
+    print(f"Перекрашено компонентов: {len(parts_to_paint)}")
+    print("Перекрашивание окончено.")
+
+
+PAINT_RULE_FIELDS = ("marking", "name", "file", "material")
+"""
+Свойства компонента, по которым задаются условия правил покраски:
+обозначение, наименование, путь к файлу, материал.
+"""
+
+
+class PaintRule:
+    """
+    Правило покраски: если свойства компонента соответствуют всем условиям
+    `conditions` (`{свойство: регулярное выражение}`, см. `PAINT_RULE_FIELDS`),
+    то компонент красится краской `paint`.
+
+    Регулярные выражения компилируются один раз при создании правила,
+    ищутся в любом месте значения (`re.search()`) без учета регистра;
+    для проверки начала значения следует использовать `^`.
+    Правило без условий соответствует любому компоненту.
+    """
+    def __init__(self, name: str, conditions: dict[str, str], paint: PaintData) -> None:
+        self.name: str = name
+        self.paint: PaintData = tuple(paint)
+        self.conditions: list[tuple[str, re.Pattern]] = []
+        for field, pattern in conditions.items():
+            if not field in PAINT_RULE_FIELDS:
+                raise Exception(f"Правило покраски '{name}': неизвестное свойство '{field}'")
+            try:
+                self.conditions.append((field, re.compile(pattern, re.IGNORECASE | re.DOTALL)))
+            except re.error as e:
+                raise Exception(f"Правило покраски '{name}': ошибка в регулярном выражении {pattern!r}: {e}")
+
+    def matches(self, values: dict[str, str]) -> bool:
+        for field, regex in self.conditions:
+            if regex.search(values[field]) is None:
+                return False
+        return True
+
+
+def compile_paint_rules(rules_config: list[dict]) -> list[PaintRule]:
+    """
+    Создает правила покраски из списка словарей конфигурации
+    `{"name": str, "conditions": {свойство: str}, "paint": PaintData, "is_enabled": bool}`
+    (отключенные правила пропускаются).
+    """
+    return [
+        PaintRule(r["name"], r["conditions"], r["paint"])
+        for r in rules_config
+        if r.get("is_enabled", True)
+    ]
+
+
+def get_rule_fields(rules: list[PaintRule]) -> set[str]:
+    """
+    Возвращает множество свойств, используемых в условиях правил
+    (через API Компас читаются только они).
+    """
+    return {field for rule in rules for field, regex in rule.conditions}
+
+
+def read_rule_values(part: KAPI7.IPart7, fields: set[str]) -> dict[str, str]:
+    values = {}
+    if "marking" in fields:
+        values["marking"] = part.Marking or ""
+    if "name" in fields:
+        values["name"] = part.Name or ""
+    if "file" in fields:
+        values["file"] = part.FileName or ""
+    if "material" in fields:
+        values["material"] = part.Material or ""
+    return values
+
+
+def match_paint_rule(rules: list[PaintRule], values: dict[str, str]) -> PaintRule | None:
+    """
+    Возвращает первое правило из `rules`, которому соответствуют значения `values`,
+    или `None`.
+    """
+    for rule in rules:
+        if rule.matches(values):
+            return rule
+    return None
+
+
+def collect_parts_by_rules(parts: list[KAPI7.IPart7], rules: list[PaintRule]) -> list[tuple[KAPI7.IPart7, PaintRule]]:
+    """
+    Обходит компоненты `parts` и все их дочерние компоненты за один проход
+    и для каждого компонента выбирает первое подходящее правило.
+
+    Возвращает список `[(компонент, правило), ...]` компонентов, цвет которых
+    отличается от краски правила. Каждый файл-источник проверяется один раз
+    (см. `collect_parts_to_paint()`).
+    """
+    fields = get_rule_fields(rules)
+    result: list[tuple[KAPI7.IPart7, PaintRule]] = []
+    seen_files: set[str] = set()
+    visited_count = 0
+    unmatched_count = 0
+    unchanged_count = 0
+
+    def visit(part: KAPI7.IPart7) -> bool:
+        nonlocal visited_count, unmatched_count, unchanged_count
+        progress.check_cancelled()
+        if not is_paintable(part):
+            return False
+        if not _add_source_file(part, seen_files):
+            return False
+
+        visited_count += 1
+        progress.report(visited_count, 0, f"Проверено компонентов: {visited_count}")
+        rule = match_paint_rule(rules, read_rule_values(part, fields))
+        if rule is None:
+            unmatched_count += 1
+        elif is_paint_applied(part, rule.paint, UseColorEnum.useColorOur):
+            unchanged_count += 1
+        else:
+            result.append((part, rule))
+        return True
+
     for part in parts:
-        apply_color(part)
+        if visit(part):
+            apply_to_children_r(part, visit)
 
-    if is_recursive:
-        for part in parts:
-            apply_to_children_r(part, apply_color)
+    print(f"Проверено компонентов: {visited_count}, без подходящего правила: {unmatched_count}, уже имеют нужный цвет: {unchanged_count}")
+    return result
+
+
+def paint_parts_by_rules(rules: list[PaintRule]) -> dict[str, int]:
+    """
+    Красит выбранные компоненты (или все компоненты текущей сборки, если ничего
+    не выбрано) и все их дочерние компоненты по правилам `rules`:
+    применяется первое подходящее правило. Компоновочная геометрия
+    и исключенные из расчета компоненты не красятся.
 
+    Возвращает словарь `{имя правила: количество перекрашенных компонентов}`.
+    """
+    if len(rules) == 0:
+        raise Exception("Не задано ни одного правила покраски")
+
+    doc, toppart = open_part()
+    parts: list[KAPI7.IPart7] = get_selected(doc, KAPI7.IPart7)
+    if len(parts) == 0:
+        print("Компоненты не выбраны. Будут перекрашиваться все компоненты текущей модели.")
+        parts = list(iterate_child_parts(toppart))
+    else:
+        print(f"Выбрано компонентов: {len(parts)}. ")
+
+    parts_to_paint = collect_parts_by_rules(parts, rules)
+
+    counts: dict[str, int] = {rule.name: 0 for rule in rules}
+    for part, rule in progress.iterate(parts_to_paint, text="Перекрашивание компонентов"):
+        apply_paint(part, rule.paint, UseColorEnum.useColorOur)
+        counts[rule.name] += 1
+
+    for name, count in counts.items():
+        print(f"Правило '{name}': перекрашено компонентов: {count}")
     print("Перекрашивание окончено.")
+    return counts
 
 
 def get_current_color() -> PaintData:
     doc, part = open_part()
-    cp = KAPI7.IColorParam7(part)
-    _, color_kompas, Am, Di, Sp, Sh, Tr, Em = cp.GetAdvancedColor()
-    Tr = 1 - Tr
-    color = color_kompas_to_traditional(color_kompas)
-    paint = [color, Am, Di, Sp, Sh, Tr, Em]
+    paint = list(read_paint(KAPI7.IColorParam7(part)))
     print("Текущие параметры:", paint)
     return paint
 
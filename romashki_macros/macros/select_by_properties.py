@@ -11,13 +11,28 @@
 выполнял выделение этих компонентов.
 
 
-Для этого макроса нет GUI-интерфейса. Запускать макрос следует командой:
+Также макрос выбирает компоненты на всех уровнях вложенности по запросу
+из нескольких условий (обозначение, наименование, файл, материал, уровень
+вложенности и др.; см. `lib_macros.parts_query`):
+
+    marking ^= "2025.0012" and not excluded
+    file ~ "Стандартные изделия" and name ~ "Болт М8"
+
+Дерево компонентов читается из Компас один раз, после чего запросы
+выполняются по копии дерева в памяти.
+
+
+Для этого макроса нет GUI-интерфейса. Запускать макрос следует командой
+(запросы вводятся в консоли):
 
     python -m romashki_macros.macros.select_by_properties
 
 """
 
 from .lib_macros.core import *
+from .lib_macros.parts_query import PartsTable, compile_query, select_objects
+
+import re
 
 
 
@@ -39,18 +54,55 @@ def select_parts_by_marking_re(marking_re: re.Pattern) -> None:
 
     # FIXME а где-то здесь не нужно ли сбросить выделение ранее выбранных компонентов?
 
-    for part in iterate_child_parts(toppart):
-        if _check(part):
-            m = marking_re.match(part.Marking)
-            if m:
-                sm.Select(part)
+    parts = [
+        part for part in iterate_child_parts(toppart)
+        if _check(part) and marking_re.match(part.Marking)
+    ]
+    select_objects(doc, parts, do_add=True)
 
 
+def load_parts_table() -> tuple[KAPI7.IKompasDocument3D, PartsTable]:
+    """
+    Читает дерево компонентов текущей сборки в память (см. `PartsTable`).
+    """
+    doc, toppart = open_part()
+    table = PartsTable.build(toppart)
+    print(f"Прочитано компонентов: {len(table)}")
+    return doc, table
 
-if __name__ == "__main__":
-    import re
 
-    r = re.compile(r"(?!2025\.0012).*", re.DOTALL | re.IGNORECASE)  # выбор компонентов, обозначения которых не_начинаются с "2025.0012"
-    select_parts_by_marking_re(r)
+def select_parts_by_query(
+        query: str,
+        doc: KAPI7.IKompasDocument3D | None = None,
+        table: PartsTable | None = None,
+        do_add: bool = False,
+        ) -> list[KAPI7.IPart7]:
+    """
+    Выбирает в текущей сборке компоненты (на всех уровнях вложенности),
+    соответствующие запросу `query` (см. `lib_macros.parts_query`).
+
+    Если задана таблица компонентов `table` (с документом `doc`), дерево
+    компонентов повторно не читается. Если `do_add == False`, предыдущий выбор
+    сбрасывается. Возвращает выбранные компоненты.
+    """
+    f = compile_query(query)
+    if table is None:
+        doc, table = load_parts_table()
 
+    parts = table.get_parts(f(table))
+    select_objects(doc, parts, do_add)
+    print(f"Выбрано компонентов: {len(parts)}")
+    return parts
 
+
+
+if __name__ == "__main__":
+    doc, table = load_parts_table()
+    while True:
+        query = input("запрос> ").strip()
+        if query == "":
+            break
+        try:
+            select_parts_by_query(query, doc, table)
+        except Exception as e:
+            print(e)
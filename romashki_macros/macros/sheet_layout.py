@@ -20,13 +20,16 @@
 from .lib_macros.core import *
 
 
-def set_sheets_layout_library(lib_filepath: str) -> None:
+def set_sheets_layout_library(lib_filepath: str) -> int:
     """
     Изменяет стили оформления всех листов, на имеющиеся в библиотеке по пути `lib_filepath`.
     Номера стилей сохраняются теми же. Следовательно, номера стилей должны быть такими же,
     как и в стандартной библиотеке `graphic.lyt`.
 
     При `lib_filepath = ""` устанавливается стандартное обозначение из библиотеки `graphic.lyt`.
+
+    Листы, у которых уже задана эта библиотека, не изменяются.
+    Возвращает количество измененных листов.
     """
 
     iKompasObject5, iKompasObject7 = get_kompas_objects()
@@ -35,10 +38,15 @@ def set_sheets_layout_library(lib_filepath: str) -> None:
     lss: KAPI7.ILayoutSheets = doc2d.LayoutSheets
 
 
+    changed_count = 0
     for i in range(lss.Count):
         ls: KAPI7.ILayoutSheet = lss.Item(i)
+        if lib_filepath != "" and os.path.normcase(ls.LayoutLibraryFileName or "") == os.path.normcase(lib_filepath):
+            continue
         ls.LayoutLibraryFileName = lib_filepath
         ls.Update()
+        changed_count += 1
+    return changed_count
 
 
 def get_sheet_format(sheet_index: int = 0) -> tuple[int, bool]:
@@ -63,12 +71,14 @@ def get_sheet_format(sheet_index: int = 0) -> tuple[int, bool]:
     return (f.Format, f.VerticalOrientation)
 
 
-def set_sheet_format(format_number: int, is_vertical: bool, sheet_index: int = 0):
+def set_sheet_format(format_number: int, is_vertical: bool, sheet_index: int = 0) -> bool:
     """
     Изменяет у текущего документа формат и ориентацию листа
     с индексом (не номером) `sheet_index`.
 
     `format_number` может принимать значения `0...5` для A0...A5 соответственно.
+
+    Возвращает `False`, если формат и ориентация листа уже были такими.
     """
     doc2d: KAPI7.IKompasDocument2D = open_doc2d()
     lss: KAPI7.ILayoutSheets = doc2d.LayoutSheets
@@ -81,10 +91,14 @@ def set_sheet_format(format_number: int, is_vertical: bool, sheet_index: int = 0
     ls: KAPI7.ILayoutSheet = lss.Item(sheet_index)
     f: KAPI7.ISheetFormat = ls.Format
 
+    if f.Format == format_number and bool(f.VerticalOrientation) == bool(is_vertical):
+        return False
+
     f.Format = format_number
     f.VerticalOrientation = is_vertical
 
     ls.Update()
+    return True
 
 
 
@@ -3,17 +3,34 @@
 
 Макрос предоставляет функционал:
 * заполнить основную надпись по шаблону;
+* заполнить по шаблону основные надписи всех листов множества документов
+    (записываются только отличающиеся ячейки, сохраняются только измененные документы);
 * заполнить все ячейки основной надписи их номерами;
+* найти номера существующих ячеек основной надписи (без изменения документа)
+    с кэшированием по библиотеке оформлений и номеру стиля;
 * получить содержимое ячейки основной надписи;
 * форматировать дату (текущую или заданную) по шаблону.
 
+Шаблон основной надписи - словарь `{номер ячейки: текст}`, в тексте которого
+могут быть переменные (см. `TemplateKeywords`), например `$$$marking$$$`.
+Шаблон компилируется один раз (см. `compile_stamp_template()`), а значения
+переменных документа читаются один раз на документ и кэшируются на время сеанса
+(см. `DocumentVariablesCache`).
+
 Один из самых первых разработанных автором макросов, один из наиболее часто применяемых.
 
 """
 
 from .lib_macros.core import *
+from .lib_macros import progress
+from .lib_macros.kompas_pool import KompasInstancePool, JobResult
+from .lib_macros.properties import BulkWriteReport
+
+from .. import config
 
 import datetime
+import json
+import re
 
 
 class StampCellNumbers:
@@ -55,6 +72,17 @@ class StampCellNumbers:
     PervPrimen = 25
 
 
+def get_cell_names() -> dict[int, str]:
+    """
+    Возвращает словарь `{номер ячейки: имя}` ячеек, заданных в `StampCellNumbers`.
+    """
+    return {
+        value: name
+        for name, value in vars(StampCellNumbers).items()
+        if not name.startswith("_") and isinstance(value, int)
+    }
+
+
 
 def format_date(date: datetime.date|None = None, fmt: str = "%d.%m.%y") -> str:
     """
@@ -71,27 +99,191 @@ def format_date(date: datetime.date|None = None, fmt: str = "%d.%m.%y") -> str:
     return date.strftime(fmt)
 
 
-def stamp_numbers(max_number: int = 10000, min_number: int = 0) -> None:
+STAMP_CELLS_CACHE_FILEPATH = os.path.join(config.PROGRAM_TEMP_FOLDER, "stamp_cells.json")
+
+STAMP_CELLS_CACHE_VERSION = 1
+
+MAX_CELL_NUMBER = 10000
+""" верхняя граница (не включительно) номеров ячеек при поиске ячеек основной надписи """
+
+
+class StampCellsCache:
+    """
+    Кэш на диске (JSON) номеров существующих ячеек основных надписей
+    по библиотеке оформлений (`LayoutLibraryFileName`) и номеру стиля оформления.
+
+    Запись кэша считается устаревшей, если файл библиотеки изменился.
+    Чтение и запись кэша защищены блокировкой, файл записывается атомарно
+    (через временный файл), поэтому кэш можно использовать из нескольких потоков.
+    """
+    _lock = threading.Lock()
+
+    def __init__(self, filepath: str = STAMP_CELLS_CACHE_FILEPATH) -> None:
+        self.filepath: str = filepath
+        self._layouts: dict[str, dict] | None = None
+
+    @staticmethod
+    def _get_key(library_filepath: str, style_number: int) -> str:
+        return f"{os.path.normcase(library_filepath)}|{int(style_number)}"
+
+    @staticmethod
+    def _get_library_mtime(library_filepath: str) -> int:
+        try:
+            return os.stat(library_filepath).st_mtime_ns
+        except OSError:
+            return 0
+
+    def _load(self) -> dict[str, dict]:
+        if self._layouts is None:
+            try:
+                with open(self.filepath, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") != STAMP_CELLS_CACHE_VERSION:
+                    raise ValueError()
+                self._layouts = dict(data["layouts"])
+            except (OSError, ValueError, KeyError, TypeError):
+                self._layouts = {}
+        return self._layouts
+
+    def _save(self) -> None:
+        folder = os.path.dirname(os.path.abspath(self.filepath))
+        os.makedirs(folder, exist_ok=True)
+        tmp_path = f"{self.filepath}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": STAMP_CELLS_CACHE_VERSION, "layouts": self._layouts}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.filepath)
+
+    def get(self, library_filepath: str, style_number: int) -> list[int] | None:
+        """
+        Возвращает номера ячеек оформления или `None`, если их нет в кэше или запись устарела.
+        """
+        with self._lock:
+            record = self._load().get(self._get_key(library_filepath, style_number))
+        if record is None or record["mtime_ns"] != self._get_library_mtime(library_filepath):
+            return None
+        return list(record["cells"])
+
+    def store(self, library_filepath: str, style_number: int, cells: list[int]) -> None:
+        with self._lock:
+            self._layouts = None  # перечитать файл, чтобы не потерять записи из других процессов
+            self._load()[self._get_key(library_filepath, style_number)] = {
+                "library": library_filepath,
+                "style": int(style_number),
+                "mtime_ns": self._get_library_mtime(library_filepath),
+                "cells": sorted(cells),
+            }
+            self._save()
+
+    def iterate_layouts(self) -> list[tuple[str, int, list[int]]]:
+        """
+        Возвращает список `[(библиотека оформлений, номер стиля, номера ячеек), ...]`.
+        """
+        with self._lock:
+            self._layouts = None
+            layouts = list(self._load().values())
+        return [(r["library"], r["style"], list(r["cells"])) for r in layouts]
+
+    def get_all_cells(self) -> list[int]:
+        """
+        Возвращает отсортированный список номеров ячеек всех оформлений из кэша.
+        """
+        cells: set[int] = set()
+        for library, style, layout_cells in self.iterate_layouts():
+            cells.update(layout_cells)
+        return sorted(cells)
+
+
+def probe_stamp_cells(
+        doc5: KAPI5.ksDocument2D,
+        sheet_number: int,
+        max_number: int = MAX_CELL_NUMBER,
+        min_number: int = 0,
+        ) -> list[int]:
+    """
+    Возвращает номера существующих ячеек основной надписи листа `sheet_number`
+    (номера листов начинаются с 1).
+
+    Ячейки проверяются переходом к ячейке `ksStamp.ksColumnNumber()` без записи текста,
+    поэтому документ не изменяется.
+    """
+    stamp5: KAPI5.ksStamp = doc5.GetStampEx(sheet_number)
+    if stamp5 is None:
+        raise Exception(f"Не удается получить основную надпись листа {sheet_number}")
+
+    cells: list[int] = []
+    stamp5.ksOpenStamp()
+    try:
+        for col_id in range(min_number, max_number):
+            if stamp5.ksColumnNumber(col_id):
+                cells.append(col_id)
+    finally:
+        stamp5.ksCloseStamp()
+    return cells
+
+
+def get_stamp_cells(
+        doc: KAPI7.IKompasDocument2D | None = None,
+        cache: StampCellsCache | None = None,
+        max_number: int = MAX_CELL_NUMBER,
+        ) -> list[list[int]]:
+    """
+    Возвращает номера существующих ячеек основной надписи каждого листа документа `doc`
+    (по умолчанию - текущего документа).
+
+    Для каждого оформления (библиотека и номер стиля) ячейки ищутся один раз:
+    результат сохраняется в кэш `cache` и используется для других листов и документов.
+    """
+    doc = doc if doc is not None else open_doc2d()
+    cache = cache if cache is not None else StampCellsCache()
+
+    lss: KAPI7.ILayoutSheets = doc.LayoutSheets
+    doc5: KAPI5.ksDocument2D | None = None
+    result: list[list[int]] = []
+
+    for i in range(lss.Count):
+        ls: KAPI7.ILayoutSheet = lss.Item(i)
+        library, style = ls.LayoutLibraryFileName, ls.LayoutStyleNumber
+
+        cells = cache.get(library, style)
+        if cells is None:
+            print(f"Поиск ячеек основной надписи: оформление {style} из '{library}'")
+            if doc5 is None:
+                doc5 = get_document_K5(doc)
+            cells = probe_stamp_cells(doc5, i + 1, max_number)
+            cache.store(library, style, cells)
+        result.append(cells)
+
+    return result
+
+
+def stamp_numbers(max_number: int = MAX_CELL_NUMBER, min_number: int = 0) -> None:
     """
     Заполняет все ячейки основных надписей всех листов в текущем графическом
     документе номерами этих ячеек.
 
     Позволяет выяснить, какой номер у определенной ячейки.
+
+    Номера существующих ячеек берутся из кэша (см. `get_stamp_cells()`),
+    поэтому записываются только существующие ячейки.
     """
     doc = open_doc2d()
 
     lss: KAPI7.ILayoutSheets = doc.LayoutSheets
+    sheets_cells = get_stamp_cells(doc, max_number=max_number)
 
     for i in range(lss.Count):
         ls: KAPI7.ILayoutSheet = lss.Item(i)
 
         stamp: KAPI7.IStamp = ls.Stamp
 
-        for col_id in range(min_number, max_number):
+        for col_id in sheets_cells[i]:
+            if not (min_number <= col_id < max_number):
+                continue
             txt: KAPI7.IText = stamp.Text(col_id)
             txt.Str = f"{col_id}"
 
         stamp.Update()
+        print(f"Лист {i + 1}: заполнено ячеек: {len(sheets_cells[i])}")
 
 
 def stamp(data: dict[int|str, str], sheet_number: int = 1) -> None:
@@ -123,6 +315,368 @@ def stamp(data: dict[int|str, str], sheet_number: int = 1) -> None:
     stamp.Update()
 
 
+class TemplateKeywords:
+    """
+    Ключевые слова (переменные) шаблона основной надписи.
+
+    Значения берутся из документа чертежа (имя файла, номер листа, количество листов)
+    и из 3D-модели, с которой связаны ассоциативные виды чертежа
+    (обозначение, наименование, материал, масса).
+    """
+    CurrentDate = "$$$current_date$$$"
+    FileName = "$$$file_name$$$"
+    Marking = "$$$marking$$$"
+    Name = "$$$name$$$"
+    Material = "$$$material$$$"
+    Mass = "$$$mass$$$"
+    SheetNumber = "$$$sheet_number$$$"
+    SheetsCount = "$$$sheets_count$$$"
+
+
+re_template_keyword = re.compile(r"\$\$\$([a-z_]+)\$\$\$")
+
+TEMPLATE_VARIABLES = tuple(
+    re_template_keyword.fullmatch(value).group(1)
+    for name, value in vars(TemplateKeywords).items()
+    if not name.startswith("_") and isinstance(value, str)
+)
+""" имена переменных шаблона: `current_date`, `file_name`, ... """
+
+MODEL_VARIABLES = ("marking", "name", "material", "mass")
+""" переменные, значения которых берутся из 3D-модели """
+
+
+class CompiledStampTemplate:
+    """
+    Шаблон основной надписи, разобранный на последовательности
+    `[(текст, имя переменной), ...]` для каждой ячейки.
+
+    Неизвестные ключевые слова остаются в тексте без изменений.
+    """
+    def __init__(self, template: dict[int|str, str]) -> None:
+        self.cells: list[tuple[int, list[tuple[str, str]]]] = []
+        self.variables: set[str] = set()
+        """ имена переменных, используемых в шаблоне """
+
+        for col_id, value in template.items():
+            tokens: list[tuple[str, str]] = []
+            pos = 0
+            literal = ""
+            for m in re_template_keyword.finditer(value):
+                literal += value[pos:m.start()]
+                pos = m.end()
+                if m.group(1) in TEMPLATE_VARIABLES:
+                    tokens.append((literal, m.group(1)))
+                    self.variables.add(m.group(1))
+                    literal = ""
+                else:
+                    literal += m.group(0)
+            tokens.append((literal + value[pos:], ""))
+            self.cells.append((int(col_id), tokens))
+
+    def render(self, variables: dict[str, str]) -> dict[int, str]:
+        """
+        Возвращает словарь `{номер ячейки: текст}` с подставленными значениями переменных.
+
+        Ячейки, в которых используется переменная, отсутствующая в `variables`,
+        в результат не включаются (их текст не изменяется).
+        """
+        return {
+            col_id: "".join(literal + (variables[name] if name != "" else "") for literal, name in tokens)
+            for col_id, tokens in self.cells
+            if all(name == "" or name in variables for _, name in tokens)
+        }
+
+
+_compiled_templates: dict[tuple, CompiledStampTemplate] = {}
+_compiled_templates_lock = threading.Lock()
+
+
+def compile_stamp_template(template: dict[int|str, str]) -> CompiledStampTemplate:
+    """
+    Возвращает скомпилированный шаблон (см. `CompiledStampTemplate`);
+    шаблоны с одинаковым содержимым компилируются один раз.
+    """
+    key = tuple((str(col_id), value) for col_id, value in template.items())
+    with _compiled_templates_lock:
+        compiled = _compiled_templates.get(key)
+        if compiled is None:
+            compiled = CompiledStampTemplate(template)
+            _compiled_templates[key] = compiled
+    return compiled
+
+
+def format_mass(mass: float) -> str:
+    """
+    Форматирует массу для основной надписи: до двух знаков после запятой,
+    без незначащих нулей, с десятичной запятой.
+    """
+    return f"{round(mass, 2):g}".replace(".", ",")
+
+
+def get_drawing_source_filepath(doc: KAPI7.IKompasDocument) -> str:
+    """
+    Возвращает путь к 3D-модели первого ассоциативного вида чертежа `doc`
+    или `""`, если ассоциативных видов нет.
+    """
+    try:
+        views: KAPI7.IViews = KAPI7.IKompasDocument2D(doc).ViewsAndLayersManager.Views
+    except Exception:
+        return ""  # например, у спецификации нет видов
+    for i in range(views.Count):
+        try:
+            filepath = KAPI7.IAssociationView(views.View(i)).SourceFileName
+        except Exception:
+            continue
+        if filepath:
+            return filepath
+    return ""
+
+
+def read_model_variables(filepath: str) -> dict[str, str]:
+    """
+    Читает за одно открытие значения переменных 3D-модели `filepath`
+    (см. `MODEL_VARIABLES`). Модель, открытая функцией, закрывается.
+    """
+    was_opened = find_opened_document(filepath) is not None
+    doc, part = open_part(filepath, is_hidden=True)
+    try:
+        try:
+            mass = float(KAPI7.IMassInertiaParam7(part).Mass)
+        except Exception:
+            mass = 0.0
+        return {
+            "marking": part.Marking or "",
+            "name": part.Name or "",
+            "material": part.Material or "",
+            "mass": format_mass(mass),
+        }
+    finally:
+        if not was_opened:
+            doc.Close(0)
+
+
+class DocumentVariablesCache:
+    """
+    Кэш значений переменных шаблона на время сеанса работы программы.
+
+    Путь к 3D-модели чертежа запоминается по пути и времени изменения файла чертежа,
+    значения переменных модели - по пути и времени изменения файла модели,
+    поэтому свойства одной модели читаются один раз для всех ее чертежей и всех ячеек.
+    Кэш можно использовать из нескольких потоков.
+    """
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._sources: dict[tuple[str, int], str] = {}
+        self._models: dict[tuple[str, int], dict[str, str]] = {}
+
+    @staticmethod
+    def _get_key(filepath: str) -> tuple[str, int]:
+        try:
+            mtime_ns = os.stat(filepath).st_mtime_ns
+        except OSError:
+            mtime_ns = 0
+        return (os.path.normcase(os.path.abspath(filepath)), mtime_ns)
+
+    def get_source_filepath(self, doc: KAPI7.IKompasDocument) -> str:
+        if doc.PathName == "" or doc.Changed:
+            return get_drawing_source_filepath(doc)
+        key = self._get_key(doc.PathName)
+        with self._lock:
+            if key in self._sources:
+                return self._sources[key]
+        filepath = get_drawing_source_filepath(doc)
+        with self._lock:
+            self._sources[key] = filepath
+        return filepath
+
+    def get_model_variables(self, filepath: str) -> dict[str, str]:
+        key = self._get_key(filepath)
+        with self._lock:
+            if key in self._models:
+                return self._models[key]
+        values = read_model_variables(filepath)
+        with self._lock:
+            self._models[key] = values
+        return values
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sources.clear()
+            self._models.clear()
+
+
+session_variables_cache = DocumentVariablesCache()
+""" кэш переменных шаблона на время сеанса (см. `DocumentVariablesCache`) """
+
+
+def get_document_variables(
+        doc: KAPI7.IKompasDocument,
+        variables: typing.Iterable[str],
+        date_format: str = "%d.%m.%y",
+        cache: DocumentVariablesCache | None = None,
+        ) -> dict[str, str]:
+    """
+    Возвращает значения переменных `variables` для документа `doc`
+    (кроме `sheet_number`, который зависит от листа).
+    Свойства 3D-модели читаются, только если они используются.
+
+    Если у документа нет ассоциативных видов, переменные модели в результат
+    не включаются, и ячейки с ними не изменяются (см. `CompiledStampTemplate.render()`).
+    """
+    cache = cache if cache is not None else session_variables_cache
+    variables = set(variables)
+    values: dict[str, str] = {}
+
+    if "current_date" in variables:
+        values["current_date"] = format_date(fmt=date_format)
+    if "file_name" in variables:
+        values["file_name"] = os.path.splitext(os.path.basename(doc.PathName))[0]
+    if "sheets_count" in variables:
+        values["sheets_count"] = str(doc.LayoutSheets.Count)
+
+    if len(variables.intersection(MODEL_VARIABLES)) != 0:
+        source_filepath = cache.get_source_filepath(doc)
+        if source_filepath != "":
+            values.update(cache.get_model_variables(source_filepath))
+        else:
+            print(f"В документе '{doc.PathName}' нет ассоциативных видов; ячейки с переменными модели не изменяются")
+
+    return values
+
+
+def _normalize_cell_text(text: str | None) -> str:
+    return "" if text is None else text.replace("\r\n", "\n")
+
+
+def fill_document_stamps(
+        doc: KAPI7.IKompasDocument,
+        template: dict[int|str, str] | CompiledStampTemplate,
+        date_format: str = "%d.%m.%y",
+        sheet_numbers: typing.Iterable[int] | None = None,
+        ) -> int:
+    """
+    Заполняет по шаблону `template` основные надписи листов `sheet_numbers`
+    (по умолчанию - всех листов) документа `doc`. Номера листов начинаются с 1.
+
+    Значения переменных документа читаются один раз (см. `get_document_variables()`);
+    ячейки с переменными, значения которых неизвестны, не изменяются.
+    Сначала читается текущий текст ячейки; записываются только отличающиеся ячейки,
+    и обновляются только измененные основные надписи.
+
+    Возвращает количество измененных ячеек.
+    """
+    if not isinstance(template, CompiledStampTemplate):
+        template = compile_stamp_template(template)
+
+    lss: KAPI7.ILayoutSheets = doc.LayoutSheets
+    variables = get_document_variables(doc, template.variables, date_format)
+    sheet_numbers = list(sheet_numbers) if sheet_numbers is not None else list(range(1, lss.Count + 1))
+    data = template.render(variables) if not "sheet_number" in template.variables else None
+    changed_count = 0
+
+    for sheet_number in sheet_numbers:
+        ls: KAPI7.ILayoutSheet = lss.Item(sheet_number - 1)
+        stamp: KAPI7.IStamp = ls.Stamp
+
+        if "sheet_number" in template.variables:
+            variables["sheet_number"] = str(sheet_number)
+            data = template.render(variables)
+
+        sheet_changed_count = 0
+        for col_id, value in data.items():
+            txt: KAPI7.IText = stamp.Text(col_id)
+            if _normalize_cell_text(txt.Str) != _normalize_cell_text(value):
+                txt.Str = value
+                sheet_changed_count += 1
+
+        if sheet_changed_count != 0:
+            stamp.Update()
+        changed_count += sheet_changed_count
+
+    return changed_count
+
+
+def stamp_template(template: dict[int|str, str], date_format: str = "%d.%m.%y", sheet_number: int = 1) -> int:
+    """
+    Заполняет по шаблону `template` основную надпись листа `sheet_number` текущего документа.
+    """
+    doc: KAPI7.IKompasDocument = get_app7().ActiveDocument
+    if doc is None:
+        raise Exception("Нет текущего документа")
+    changed_count = fill_document_stamps(doc, template, date_format, [sheet_number])
+    print(f"Изменено ячеек: {changed_count}")
+    return changed_count
+
+
+def stamp_file(filepath: str, template: dict[int|str, str] | CompiledStampTemplate, date_format: str = "%d.%m.%y") -> bool:
+    """
+    Заполняет основные надписи всех листов документа `filepath` по шаблону `template`
+    (см. `fill_document_stamps()`).
+
+    Документ сохраняется, только если изменена хотя бы одна ячейка; документ,
+    открытый функцией, закрывается. Возвращает `True`, если документ был изменен.
+    """
+    was_opened = find_opened_document(filepath) is not None
+    doc = open_document(filepath, is_hidden=True)
+    try:
+        changed_count = fill_document_stamps(doc, template, date_format)
+        if changed_count == 0:
+            return False
+        if not doc.Save():
+            raise Exception("Не удалось сохранить документ")
+        return True
+    finally:
+        if not was_opened:
+            doc.Close(0)
+
+
+def stamp_files(
+        filepaths: list[str],
+        template: dict[int|str, str],
+        date_format: str = "%d.%m.%y",
+        instances_count: int = 0,
+        ) -> BulkWriteReport:
+    """
+    Заполняет по шаблону `template` основные надписи документов `filepaths`
+    на `instances_count` скрытых экземплярах Компас
+    (при `instances_count <= 0` - в уже запущенном экземпляре Компас).
+
+    См. `stamp_file()`.
+    """
+    report = BulkWriteReport()
+    template = compile_stamp_template(template)
+
+    def _on_result(jr: JobResult) -> None:
+        if not jr.is_ok():
+            report.failed[jr.item] = jr.error
+            print(f"Не удалось заполнить основную надпись документа '{jr.item}': {jr.error}")
+        elif jr.result:
+            report.written.append(jr.item)
+            print(f"Заполнена основная надпись: '{jr.item}'")
+        else:
+            report.skipped.append(jr.item)
+        progress.report(len(report.written) + len(report.skipped) + len(report.failed), len(filepaths), "Заполнение основных надписей")
+
+    pool = KompasInstancePool(instances_count)
+    pool.run(lambda path: stamp_file(path, template, date_format), filepaths, _on_result)
+
+    print(report.summary())
+    return report
+
+
+def find_drawings(folder: str, extensions: tuple[str, ...] = (".cdw", ".spw")) -> list[str]:
+    """
+    Возвращает отсортированный список файлов с расширениями `extensions` в папке `folder` (рекурсивно).
+    """
+    result: list[str] = []
+    for dirpath, dirnames, filenames in os.walk(folder):
+        for filename in filenames:
+            if filename.lower().endswith(extensions):
+                result.append(os.path.join(dirpath, filename))
+    return sorted(result)
+
+
 def get_stamp_data(cell_number: int, doc: KAPI7.IKompasDocument2D|None = None, sheet_number: int = 1) -> str:
     """
     Возвращает содержимое ячейки с номером `cell_number` в документе `doc` на листе с номером `sheet_number`.
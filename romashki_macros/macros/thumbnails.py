@@ -0,0 +1,261 @@
+"""
+Макрос для создания PNG-миниатюр 3D-моделей (деталей и сборок) с кэшированием.
+
+Миниатюры используются, например, в таблицах спецификаций (BOM). Создание
+миниатюры через `fast_export.save_as_png_3d()` требует открытия документа
+и растеризации, поэтому готовые миниатюры хранятся в папке кэша.
+
+Ключ кэша состоит из "отпечатка" исходного файла (путь, размер, время изменения)
+и параметров растеризации (разрешение, размер). Поэтому при повторном создании
+миниатюр заново растеризуются только измененные модели.
+
+Размер папки кэша ограничивается: при превышении лимита удаляются миниатюры,
+которые дольше всего не использовались (см. `ThumbnailCache.evict()`).
+
+Пакетный режим `render_assembly_thumbnails()` обходит дерево сборки один раз
+и создает по одной миниатюре на каждый уникальный файл компонента.
+
+Запуск из командной строки:
+
+    python -m romashki_macros.macros.thumbnails --assembly "D:\\Project\\Сборка.a3d" --jobs 2
+
+"""
+
+from .lib_macros.core import *
+from .lib_macros.kompas_pool import KompasInstancePool, JobResult
+from .lib_macros import progress
+
+from . import fast_export
+from .batch_export import collect_sources_from_assembly
+
+from .. import config
+from ..utils.file_utils import ensure_folder
+
+import hashlib
+
+
+DEFAULT_CACHE_FOLDER = os.path.join(config.PROGRAM_TEMP_FOLDER, "thumbnails")
+
+DEFAULT_MAX_SIZE = 200 * 1024 * 1024
+""" Лимит размера папки кэша миниатюр по умолчанию, байты. """
+
+THUMBNAIL_EXT = ".png"
+
+
+class ThumbnailParams:
+    """
+    Параметры растеризации миниатюры (см. `fast_export.save_as_png_3d()`).
+    """
+    def __init__(self, dpi: int = fast_export.PNG_3D_DPI, size_inches: float = fast_export.PNG_3D_SIZE_INCHES) -> None:
+        self.dpi: int = dpi
+        self.size_inches: float = size_inches
+
+    def key(self) -> str:
+        return f"dpi={self.dpi};size={self.size_inches:g}"
+
+
+def get_source_fingerprint(source: str) -> str:
+    """
+    Возвращает "отпечаток" файла `source`: нормализованный путь, размер и время изменения.
+    Если файла нет, выбрасывает `OSError`.
+    """
+    st = os.stat(source)
+    return f"{os.path.normcase(os.path.abspath(source))};{st.st_size};{st.st_mtime_ns}"
+
+
+class ThumbnailCache:
+    """
+    Папка кэша PNG-миниатюр 3D-моделей.
+    """
+    def __init__(self, folder: str = DEFAULT_CACHE_FOLDER, max_size: int = DEFAULT_MAX_SIZE) -> None:
+        self.folder: str = folder
+        self.max_size: int = max_size
+        """ лимит размера папки кэша, байты (`<= 0` - без ограничения) """
+
+    def get_path(self, source: str, params: ThumbnailParams) -> str:
+        """
+        Возвращает путь к миниатюре файла `source` с параметрами `params`
+        (независимо от того, существует ли миниатюра).
+        """
+        key = f"{get_source_fingerprint(source)};{params.key()}"
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+        name = os.path.splitext(os.path.basename(source))[0]
+        return os.path.join(self.folder, f"{name}_{digest}{THUMBNAIL_EXT}")
+
+    def lookup(self, source: str, params: ThumbnailParams) -> str | None:
+        """
+        Возвращает путь к актуальной миниатюре файла `source` или `None`,
+        если миниатюры нет в кэше. Найденная миниатюра отмечается как использованная.
+        """
+        path = self.get_path(source, params)
+        if not os.path.isfile(path):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def render(self, source: str, params: ThumbnailParams) -> str:
+        """
+        Открывает модель `source` в скрытом режиме, создает её миниатюру в папке кэша
+        и возвращает путь к миниатюре. Требует запущенного (или привязанного
+        к потоку) экземпляра Компас. Модель, открытая функцией, закрывается.
+        """
+        path = self.get_path(source, params)
+        ensure_folder(self.folder)
+        tmp_path = path + ".tmp" + THUMBNAIL_EXT
+
+        was_opened = find_opened_document(source) is not None
+        doc, part = open_part_K5(source, True)
+        try:
+            fast_export.save_as_png_3d(tmp_path, doc, params.dpi, params.size_inches)
+        finally:
+            if not was_opened:
+                doc.close()
+        os.replace(tmp_path, path)
+        return path
+
+    def get_or_render(self, source: str, params: ThumbnailParams) -> str:
+        """
+        Возвращает путь к миниатюре файла `source`, создавая её, если её нет в кэше.
+        """
+        path = self.lookup(source, params)
+        if path is None:
+            path = self.render(source, params)
+        return path
+
+    def evict(self) -> int:
+        """
+        Удаляет миниатюры, которые дольше всего не использовались, пока размер
+        папки кэша не станет меньше лимита `max_size`.
+
+        Возвращает количество удаленных файлов.
+        """
+        if self.max_size <= 0 or not os.path.isdir(self.folder):
+            return 0
+
+        entries: list[tuple[float, int, str]] = []
+        total_size = 0
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                if not entry.is_file() or not entry.name.lower().endswith(THUMBNAIL_EXT):
+                    continue
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total_size += st.st_size
+
+        removed = 0
+        entries.sort()
+        for mtime, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+            removed += 1
+
+        if removed != 0:
+            print(f"Из кэша миниатюр удалено файлов: {removed}")
+        return removed
+
+
+def render_thumbnails(
+        sources: typing.Iterable[str],
+        cache: ThumbnailCache | None = None,
+        params: ThumbnailParams | None = None,
+        instances_count: int = 0,
+        ) -> dict[str, str]:
+    """
+    Создает миниатюры файлов `sources`, которых нет в кэше `cache`,
+    на `instances_count` скрытых экземплярах Компас
+    (при `instances_count <= 0` - в уже запущенном экземпляре Компас).
+
+    Возвращает словарь `{путь к файлу модели: путь к миниатюре}`
+    (файлы, для которых не удалось создать миниатюру, в словарь не попадают).
+    Ненайденные файлы (например, компоненты сборки с ненайденными файлами)
+    пропускаются с сообщением.
+    """
+    cache = cache if cache is not None else ThumbnailCache()
+    params = params if params is not None else ThumbnailParams()
+
+    thumbnails: dict[str, str] = {}
+    missing: list[str] = []
+    not_found_count = 0
+    for source in dict.fromkeys(sources):
+        try:
+            path = cache.lookup(source, params)
+        except OSError as e:
+            not_found_count += 1
+            print(f"Пропущен недоступный файл '{source}': {e}")
+            continue
+        if path is None:
+            missing.append(source)
+        else:
+            thumbnails[source] = path
+
+    print(f"Миниатюр в кэше: {len(thumbnails)}, требуется создать: {len(missing)}, пропущено недоступных файлов: {not_found_count}")
+
+    done_count = 0
+
+    def _on_result(jr: JobResult) -> None:
+        nonlocal done_count
+        done_count += 1
+        progress.report(done_count, len(missing), "Создание миниатюр")
+        if jr.is_ok():
+            thumbnails[jr.item] = jr.result
+        else:
+            print(f"Не удалось создать миниатюру '{jr.item}': {jr.error}")
+
+    pool = KompasInstancePool(instances_count)
+    pool.run(lambda source: cache.render(source, params), missing, _on_result)
+
+    cache.evict()
+    return thumbnails
+
+
+def render_assembly_thumbnails(
+        assembly_path: str,
+        cache: ThumbnailCache | None = None,
+        params: ThumbnailParams | None = None,
+        instances_count: int = 0,
+        ) -> dict[str, str]:
+    """
+    Обходит дерево сборки `assembly_path` один раз и создает миниатюры сборки
+    и всех её уникальных компонентов (см. `render_thumbnails()`).
+    """
+    sources = collect_sources_from_assembly(assembly_path)
+    print(f"Уникальных файлов в сборке: {len(sources)}")
+    return render_thumbnails(sources, cache, params, instances_count)
+
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="python -m romashki_macros.macros.thumbnails",
+        description="Создание PNG-миниатюр 3D-моделей с кэшированием.",
+    )
+    g = parser.add_mutually_exclusive_group(required=True)
+    g.add_argument("--assembly", help="сборка: миниатюры создаются для неё и всех её уникальных компонентов")
+    g.add_argument("--files", nargs="+", help="список файлов моделей")
+    parser.add_argument("--cache-folder", default=DEFAULT_CACHE_FOLDER, help="папка кэша миниатюр")
+    parser.add_argument("--max-size-mb", type=float, default=DEFAULT_MAX_SIZE / 1024 / 1024, help="лимит размера папки кэша, МБ")
+    parser.add_argument("--dpi", type=int, default=fast_export.PNG_3D_DPI, help="разрешение миниатюр, точек на дюйм")
+    parser.add_argument("--size", type=float, default=fast_export.PNG_3D_SIZE_INCHES, help="размер наибольшего габарита модели, дюймы")
+    parser.add_argument("--jobs", type=int, default=0, help="количество скрытых экземпляров Компас (0 - использовать запущенный)")
+    args = parser.parse_args()
+
+    cache = ThumbnailCache(args.cache_folder, int(args.max_size_mb * 1024 * 1024))
+    params = ThumbnailParams(args.dpi, args.size)
+
+    if args.assembly:
+        thumbnails = render_assembly_thumbnails(os.path.abspath(args.assembly), cache, params, args.jobs)
+    else:
+        thumbnails = render_thumbnails([os.path.normpath(os.path.abspath(f)) for f in args.files], cache, params, args.jobs)
+
+    for source, path in thumbnails.items():
+        print(f"{source!r} -> {path!r}")
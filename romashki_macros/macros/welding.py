@@ -54,6 +54,7 @@
 """
 
 from .lib_macros.core import *
+from .lib_macros import progress
 
 from ..utils import math_utils
 # from ..utils import math_utils_3d  # TODO перейти на это вместо моих собственных объявлений Point и функций
@@ -598,7 +599,7 @@ def create_welds(
     s_errors: str = ""
     polylines7: list[KAPI7.IPolyLine] = []
 
-    for line in lines:
+    for line in progress.iterate(lines, text="Создание ломаных линий швов"):
         try:
             pl7: KAPI7.IPolyLine = create_weld_polyline(weldpart, line, wls, not do_create_polylines_only, prefix)
             polylines7.append(pl7)
@@ -608,7 +609,7 @@ def create_welds(
     # создание твердых тел сварных швов
 
     if not do_create_polylines_only:
-        for pl7 in polylines7:
+        for pl7 in progress.iterate(polylines7, text="Создание твердых тел швов"):
             create_weld_body(weldpart, pl7, wls, prefix)
 
         if weldpart_path != "":
@@ -834,7 +835,7 @@ def find_and_create_weld_bodies(
 
     errors = ""
 
-    for pl7 in polylines7:
+    for pl7 in progress.iterate(polylines7, text="Создание твердых тел швов"):
         try:
             create_weld_body(weldpart, pl7, wls, prefix)
             if do_hide_polylines:
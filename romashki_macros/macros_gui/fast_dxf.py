@@ -16,7 +16,8 @@
 * сохранить текущий фрагмент в DXF;
 * настраивать:
     * шаблон имени файла DXF при сохранении фрагмента;
-    * опцию переименовывания вида чертежа на кодовое слово "DXF".
+    * опцию переименовывания вида чертежа на кодовое слово "DXF";
+    * опцию уплотнения геометрии фрагмента и её допуск.
 
 Принцип работы с макросом:
 * Создание DXF из 3D-модели:
@@ -52,6 +53,7 @@ from ..gui.macros import Macros
 from ..utils.resources import get_resource_path
 
 from ..macros.fast_dxf import *
+from ..utils import geometry_compaction
 
 import traceback
 
@@ -65,11 +67,16 @@ class MacrosFastDXF(Macros):
         config_reader.ensure_dict_value(
             self.config(), "filename_template", str,
             f"S={TEMPLATE_KEYWORD_THICKNESS} {TEMPLATE_KEYWORD_MARKING} {TEMPLATE_KEYWORD_NAME}")
+        config_reader.ensure_dict_value(self.config(), "do_compact_geometry", bool, False)
+        config_reader.ensure_dict_value(self.config(), "compact_tolerance", float, geometry_compaction.DEFAULT_TOLERANCE)
 
     def settings_widget(self) -> QtWidgets.QWidget:
         def _apply_changes():
             self.config()["do_rename_selected_view_to_DXF"] = cb_do_rename_view_in_dwg.isChecked()
             self.config()["filename_template"] = le_filename_fmt.text()
+            self.config()["do_compact_geometry"] = cb_do_compact.isChecked()
+            self.config()["compact_tolerance"] = sb_compact_tolerance.value()
+            sb_compact_tolerance.setEnabled(cb_do_compact.isChecked())
             _show_filename_example()
             config.save_delayed()
 
@@ -107,10 +114,30 @@ class MacrosFastDXF(Macros):
         cb_do_rename_view_in_dwg.setChecked(self.config()["do_rename_selected_view_to_DXF"])
         cb_do_rename_view_in_dwg.stateChanged.connect(_apply_changes)
 
+        cb_do_compact = QtWidgets.QCheckBox("Уплотнять геометрию фрагмента (объединять отрезки и дуги, удалять дубликаты)")
+        cb_do_compact.setToolTip(
+            "Коллинеарные отрезки и соосные дуги одного радиуса объединяются,\n"
+            "дубликаты и объекты длиной меньше допуска удаляются."
+        )
+        cb_do_compact.setChecked(self.config()["do_compact_geometry"])
+        cb_do_compact.stateChanged.connect(_apply_changes)
+
+        sb_compact_tolerance = QtWidgets.QDoubleSpinBox()
+        sb_compact_tolerance.setDecimals(4)
+        sb_compact_tolerance.setRange(0.0001, 1.0)
+        sb_compact_tolerance.setSingleStep(0.005)
+        sb_compact_tolerance.setSuffix(" мм")
+        sb_compact_tolerance.setValue(self.config()["compact_tolerance"])
+        sb_compact_tolerance.setEnabled(self.config()["do_compact_geometry"])
+        sb_compact_tolerance.valueChanged.connect(_apply_changes)
+
         l.addWidget(QtWidgets.QLabel("Шаблон имени файла: "), 0, 0, 1, 1)
         l.addWidget(le_filename_fmt, 0, 1, 1, 1)
         l.addWidget(lbl_filename_example, 1, 1, 1, 1)
         l.addWidget(cb_do_rename_view_in_dwg, 2, 0, 1, 2)
+        l.addWidget(cb_do_compact, 3, 0, 1, 2)
+        l.addWidget(QtWidgets.QLabel("Допуск уплотнения: "), 4, 0, 1, 1)
+        l.addWidget(sb_compact_tolerance, 4, 1, 1, 1)
 
         _show_filename_example()
 
@@ -125,12 +152,12 @@ class MacrosFastDXF(Macros):
         btn_dxf_from_part = QtWidgets.QToolButton()
         btn_dxf_from_part.setIcon(QtGui.QIcon(get_resource_path("img/macros/dxf_from_part.svg")))
         btn_dxf_from_part.setToolTip("Создать DXF для открытой детали")
-        btn_dxf_from_part.clicked.connect(lambda: self.execute(lambda: create_DXF_from_part(self.config()["filename_template"])))
+        btn_dxf_from_part.clicked.connect(self._create_dxf_from_part)
 
         btn_dxf_from_dwg = QtWidgets.QToolButton()
         btn_dxf_from_dwg.setIcon(QtGui.QIcon(get_resource_path("img/macros/dxf_from_dwg.svg")))
         btn_dxf_from_dwg.setToolTip(f"Создать DXF из вида \"{FASTDXF_DWG_VIEW_NAME}\" в открытом чертеже")
-        btn_dxf_from_dwg.clicked.connect(lambda: self.execute(lambda: create_DXF_from_dwg(self.config()["filename_template"], self.config()["do_rename_selected_view_to_DXF"])))
+        btn_dxf_from_dwg.clicked.connect(self._create_dxf_from_dwg)
 
         btn_dxf_projection = QtWidgets.QToolButton()
         btn_dxf_projection.setIcon(QtGui.QIcon(get_resource_path("img/macros/dxf_part_orientation.svg")))
@@ -150,6 +177,27 @@ class MacrosFastDXF(Macros):
             "сохранить текущий фрагмент в DXF": btn_save_fragm,
         }
 
+    def _compact_tolerance(self) -> float:
+        """ Допуск уплотнения геометрии; `0.0`, если уплотнение отключено. """
+        if self.config()["do_compact_geometry"]:
+            return self.config()["compact_tolerance"]
+        return 0.0
+
+    def _create_dxf_from_part(self) -> None:
+        filename_template, compact_tolerance = self.config()["filename_template"], self._compact_tolerance()
+        self.execute_in_background(
+            lambda: create_DXF_from_part(filename_template, compact_tolerance=compact_tolerance),
+            "Создание DXF из модели",
+        )
+
+    def _create_dxf_from_dwg(self) -> None:
+        filename_template, compact_tolerance = self.config()["filename_template"], self._compact_tolerance()
+        do_rename_view = self.config()["do_rename_selected_view_to_DXF"]
+        self.execute_in_background(
+            lambda: create_DXF_from_dwg(filename_template, do_rename_view, compact_tolerance),
+            "Создание DXF из чертежа",
+        )
+
     def _create_main_projection(self) -> None:
         doc, part = open_part_K5()
         create_current_view_projection_K5(doc, MAIN_PROJECTION_NAME, True)
@@ -5,6 +5,8 @@
 * сохранять краску текущей модели в список красок;
 * покрасить текущую модель или выбранные компоненты, в том числе рекурсивно;
 * покрасить \"По исходному объекту\"",
+* покрасить компоненты по правилам (список `paint_rules` в конфигурации):
+    `{"name": "Покупные", "conditions": {"file": "\\\\Покупные\\\\"}, "paint": [...], "is_enabled": true}`;
 * настраивать:
     * опцию рекурсивной покраски дочерних компонентов;
     * список цветов и оптических свойств красок.
@@ -117,6 +119,15 @@ class MacrosPartsPainting(Macros):
             self.config()["paints_list"].append(["Стандартная краска", DEFAULT_PAINT])
         config_reader.ensure_dict_value(self.config(), "do_paint_children", bool, False)
 
+        def check_rule(el) -> bool:
+            if not config_reader.ensure_dict_value(el, "name", str, ""): return False
+            if not config_reader.ensure_dict_value(el, "conditions", dict, {}): return False
+            if not all(isinstance(k, str) and isinstance(v, str) for k, v in el["conditions"].items()): return False
+            if not config_reader.isinstance_for_list_values(el.get("paint"), [int, float, float, float, float, float, float]): return False
+            config_reader.ensure_dict_value(el, "is_enabled", bool, True)
+            return True
+        config_reader.ensure_dict_value_list(self.config(), "paint_rules", dict, check_rule)
+
     def settings_widget(self) -> QtWidgets.QWidget:
         def _create_new_item(name=pretty_print_color(DEFAULT_PAINT[0]), paint=DEFAULT_PAINT) -> QtGui.QStandardItem:
             item = QtGui.QStandardItem()
@@ -218,16 +229,14 @@ class MacrosPartsPainting(Macros):
     def toolbar_widgets(self) -> dict[str, QtWidgets.QWidget]:
         def _apply_paint(paint_index: int) -> None:
             name, paint = self.config()["paints_list"][paint_index]
-            self.execute(
-                lambda: paint_parts(paint, UseColorEnum.useColorOur, self.config()["do_paint_children"])
-            )
+            self._paint_in_background(paint, UseColorEnum.useColorOur)
 
         def _do_paint_children_handler(state: bool) -> None:
             self.config()["do_paint_children"] = state
             config.save_delayed()
 
         btn_paint = gui_widgets.ButtonWithList(QtGui.QIcon(get_resource_path("img/macros/paint_bucket.svg")), "")
-        btn_paint.clicked.connect(lambda: self.execute(self._paint_with_first_color))
+        btn_paint.clicked.connect(self._paint_with_first_color)
         btn_paint.setToolTip("Покрасить текущую модель первой краской в списке")
 
         for i, m in enumerate(self.config()["paints_list"]):
@@ -243,12 +252,24 @@ class MacrosPartsPainting(Macros):
         )
         a_paint_like_owner.setToolTip("Покрасить выбранные компоненты способом \"По исходному объекту\"")
         a_paint_like_owner.triggered.connect(
-            lambda: self.execute(
-                lambda: paint_parts(None, UseColorEnum.useColorOwner, self.config()["do_paint_children"])
-            )
+            lambda: self._paint_in_background(None, UseColorEnum.useColorOwner)
         )
         btn_paint.menu().addAction(a_paint_like_owner)
 
+        a_paint_by_rules = QtWidgets.QAction(
+            QtGui.QIcon(get_resource_path("img/macros/paint_bucket.svg")),
+            "Покрасить по правилам",
+            btn_paint.menu()
+        )
+        a_paint_by_rules.setToolTip(
+            "Покрасить выбранные компоненты (или все компоненты сборки)\n"
+            "и все их дочерние компоненты по правилам покраски\n"
+            "(параметр \"paint_rules\" в файле конфигурации)"
+        )
+        a_paint_by_rules.setEnabled(len(self.config()["paint_rules"]) != 0)
+        a_paint_by_rules.triggered.connect(self._paint_by_rules)
+        btn_paint.menu().addAction(a_paint_by_rules)
+
         btn_paint.menu().addSeparator()
 
         a_paint_children = QtWidgets.QAction("Красить все дочерние компоненты", btn_paint.menu())
@@ -279,5 +300,18 @@ class MacrosPartsPainting(Macros):
             paint = DEFAULT_PAINT
         else:
             name, paint = self.config()["paints_list"][0]
-        paint_parts(paint, UseColorEnum.useColorOur, self.config()["do_paint_children"])
+        self._paint_in_background(paint, UseColorEnum.useColorOur)
+
+    def _paint_in_background(self, paint: PaintData | None, use_color: int) -> None:
+        do_paint_children = self.config()["do_paint_children"]
+        self.execute_in_background(
+            lambda: paint_parts(paint, use_color, do_paint_children),
+            "Покраска компонентов",
+        )
 
+    def _paint_by_rules(self) -> None:
+        rules_config = [dict(r) for r in self.config()["paint_rules"]]
+        self.execute_in_background(
+            lambda: paint_parts_by_rules(compile_paint_rules(rules_config)),
+            "Покраска компонентов по правилам",
+        )
@@ -3,8 +3,11 @@
 
 Графический интерфейс позволяет:
 * заполнить основную надпись по шаблону;
+* заполнить по шаблону основные надписи всех чертежей и спецификаций в папке;
 * заполнить в основной надписи ячейку даты подписи разработчика;
 * заполнить все ячейки основной надписи документа номерами ячеек;
+* найти номера существующих ячеек (без изменения документа); найденные номера
+    предлагаются при вводе номера ячейки в шаблоне;
 * настраивать:
     * шаблоны заполнения основной надписи;
     * шаблон заполнения даты.
@@ -29,29 +32,50 @@ import datetime
 from ..macros.stamp import *
 
 
-class TemplateKeywords:
-    CurrentDate = "$$$current_date$$$"
-
-
-class SpinBoxDelegate(QtWidgets.QStyledItemDelegate):
+TEMPLATE_KEYWORDS_DESCRIPTIONS = [
+    ("текущая дата", TemplateKeywords.CurrentDate),
+    ("имя файла документа", TemplateKeywords.FileName),
+    ("обозначение модели", TemplateKeywords.Marking),
+    ("наименование модели", TemplateKeywords.Name),
+    ("материал модели", TemplateKeywords.Material),
+    ("масса модели", TemplateKeywords.Mass),
+    ("номер листа", TemplateKeywords.SheetNumber),
+    ("количество листов", TemplateKeywords.SheetsCount),
+]
+
+
+class CellNumberDelegate(QtWidgets.QStyledItemDelegate):
+    """
+    Редактор номера ячейки: выпадающий список номеров существующих ячеек
+    из кэша (см. `StampCellsCache`) с возможностью ввести любой номер.
+    Документ Компас при этом не используется.
+    """
     def createEditor(
             self,
             parent: QtWidgets.QWidget,
             option: QtWidgets.QStyleOptionViewItem,
             index: QtCore.QModelIndex
             ) -> QtWidgets.QWidget:
-        editor = QtWidgets.QSpinBox(parent)
+        editor = QtWidgets.QComboBox(parent)
+        editor.setEditable(True)
         editor.setFrame(False)
-        editor.setRange(-(10**9), 10**9)
+        editor.setValidator(QtGui.QIntValidator(-(10**9), 10**9, editor))
+        names = get_cell_names()
+        for cell in StampCellsCache().get_all_cells():
+            editor.addItem(str(cell))
+            if cell in names:
+                editor.setItemData(editor.count() - 1, names[cell], QtCore.Qt.ItemDataRole.ToolTipRole)
         return editor
 
-    def setEditorData(self, editor: QtWidgets.QSpinBox, index: QtCore.QModelIndex) -> None:
-        value = int(index.model().data(index, QtCore.Qt.ItemDataRole.EditRole))
-        editor.setValue(value)
+    def setEditorData(self, editor: QtWidgets.QComboBox, index: QtCore.QModelIndex) -> None:
+        value = str(int(index.model().data(index, QtCore.Qt.ItemDataRole.EditRole)))
+        editor.setCurrentText(value)
 
-    def setModelData(self, editor: QtWidgets.QSpinBox, model: QtCore.QAbstractItemModel, index: QtCore.QModelIndex) -> None:
-        editor.interpretText()
-        value = str(editor.value())
+    def setModelData(self, editor: QtWidgets.QComboBox, model: QtCore.QAbstractItemModel, index: QtCore.QModelIndex) -> None:
+        try:
+            value = str(int(editor.currentText()))
+        except ValueError:
+            return
         model.setData(index, value, QtCore.Qt.ItemDataRole.EditRole)
 
     def updateEditorGeometry(self, editor: QtWidgets.QWidget, option: QtWidgets.QStyleOptionViewItem, index: QtCore.QModelIndex) -> None:
@@ -88,12 +112,16 @@ class ValueEditDelegate(QtWidgets.QStyledItemDelegate):
         if menu is not None:
             menu.addSeparator()
             menu.addAction(QtGui.QIcon(get_resource_path("img/macros/calendar.svg")), "Вставить шаблон: текущая дата", lambda: le.setText(TemplateKeywords.CurrentDate))
+            submenu = menu.addMenu("Вставить переменную")
+            for text, keyword in TEMPLATE_KEYWORDS_DESCRIPTIONS:
+                submenu.addAction(f"{text}: {keyword}", (lambda keyword: lambda: le.insertPlainText(keyword))(keyword))
             menu.exec(event.globalPos())
 
 
 class StampTemplateWidget(QtWidgets.QWidget):
     data_changed = QtCore.pyqtSignal()
     fill_stamp_cell_numbers_requested = QtCore.pyqtSignal()
+    probe_stamp_cells_requested = QtCore.pyqtSignal()
 
     def __init__(self, data: dict[str, str] = {}, parent = None) -> None:
         super().__init__(parent)
@@ -116,7 +144,7 @@ class StampTemplateWidget(QtWidgets.QWidget):
             "значение",
         ])
 
-        self._delegate0 = SpinBoxDelegate()
+        self._delegate0 = CellNumberDelegate()
         self._delegate1 = ValueEditDelegate()
 
         self._view.setItemDelegateForColumn(0, self._delegate0)
@@ -145,6 +173,15 @@ class StampTemplateWidget(QtWidgets.QWidget):
         )
         self._btn_fill_stamp_numbers.clicked.connect(self.request_fill_stamp_cell_numbers)
 
+        self._btn_probe_cells = QtWidgets.QPushButton(QtGui.QIcon(get_resource_path("img/macros/stamp_go.svg")), "Найти ячейки")
+        self._btn_probe_cells.setToolTip(
+            "Найти номера существующих ячеек основных надписей\n"
+            "текущего документа (документ не изменяется).\n\n"
+            "Найденные номера запоминаются для каждого оформления\n"
+            "и предлагаются при вводе номера ячейки"
+        )
+        self._btn_probe_cells.clicked.connect(lambda: self.probe_stamp_cells_requested.emit())
+
         self._layout_btn = QtWidgets.QHBoxLayout()
         self._layout_btn.setAlignment(QtCore.Qt.AlignmentFlag.AlignLeft)
         self._layout_btn.setContentsMargins(0, 0, 0, 0)
@@ -152,6 +189,7 @@ class StampTemplateWidget(QtWidgets.QWidget):
         self._layout_btn.addWidget(self._btn_delete)
         self._layout_btn.addWidget(self._btn_info)
         self._layout_btn.addWidget(self._btn_fill_stamp_numbers)
+        self._layout_btn.addWidget(self._btn_probe_cells)
 
         self._layout = QtWidgets.QVBoxLayout()
         self._layout.setContentsMargins(0, 0, 0, 0)
@@ -242,6 +280,7 @@ class MacrosStamp(Macros):
             }])
 
         config_reader.ensure_dict_value(self.config(), "current_template", int, 0)
+        config_reader.ensure_dict_value(self.config(), "batch_instances_count", int, 2)
 
     def toolbar_widgets(self) -> dict[str, QtWidgets.QWidget]:
         def _select_current_template() -> None:
@@ -276,6 +315,15 @@ class MacrosStamp(Macros):
         btn_stamp.clicked.connect(self.fill_stamp_template)
         btn_stamp.setToolTip("Заполнить основную надпись по шаблону")
 
+        menu_stamp = QtWidgets.QMenu(btn_stamp)
+        menu_stamp.addAction(
+            QtGui.QIcon(get_resource_path("img/macros/stamp_go.svg")),
+            "Заполнить по шаблону все чертежи в папке...",
+            self.fill_stamp_template_in_folder,
+        )
+        btn_stamp.setMenu(menu_stamp)
+        btn_stamp.setPopupMode(QtWidgets.QToolButton.ToolButtonPopupMode.MenuButtonPopup)
+
         return {
             "селектор шаблона": cmbx_stamp_template,
             "кнопка: заполнить по шаблону": btn_stamp,
@@ -354,6 +402,7 @@ class MacrosStamp(Macros):
 
         stamp_template_widget = StampTemplateWidget()
         stamp_template_widget.fill_stamp_cell_numbers_requested.connect(lambda: self.execute(stamp_numbers))
+        stamp_template_widget.probe_stamp_cells_requested.connect(self.probe_stamp_cells)
 
         template_selector = gui_widgets.StringListSelector(_create_new_template)
         for t in self.config()["templates"]:
@@ -384,16 +433,52 @@ class MacrosStamp(Macros):
             })
         )
 
+    def probe_stamp_cells(self) -> None:
+        def _probe():
+            for i, cells in enumerate(get_stamp_cells()):
+                print(f"Лист {i + 1}: ячеек основной надписи: {len(cells)}: {cells}")
+        self.execute_in_background(_probe, "Поиск ячеек основной надписи")
+
     def fill_stamp_template(self) -> None:
         def _fill_stamp_template():
             t_name, t_data = self._get_current_template()
+            stamp_template(t_data, self.config()["date_format"])
+        self.execute(_fill_stamp_template)
+
+    def fill_stamp_template_in_folder(self) -> None:
+        try:
+            t_name, t_data = self._get_current_template()
+        except Exception as e:
+            print(e)
+            return
 
-            stamp_data = {}
-            for key in t_data:
-                stamp_data[key] = t_data[key].replace(TemplateKeywords.CurrentDate, format_date(fmt = self.config()["date_format"]))
+        folder = QtWidgets.QFileDialog.getExistingDirectory(
+            self._parent_widget,
+            f"Заполнить основные надписи по шаблону \"{t_name}\" - выбрать папку",
+        )
+        if folder == "":
+            print("Команда отменена")
+            return
 
-            stamp(stamp_data)
-        self.execute(_fill_stamp_template)
+        filepaths = find_drawings(folder)
+        btn = QtWidgets.QMessageBox.question(
+            self._parent_widget,
+            "Заполнение основных надписей",
+            f"Заполнить по шаблону \"{t_name}\" основные надписи всех листов "
+            f"в {len(filepaths)} документах папки\n{folder}?",
+            QtWidgets.QMessageBox.StandardButton.Yes | QtWidgets.QMessageBox.StandardButton.Cancel,
+        )
+        if btn != QtWidgets.QMessageBox.StandardButton.Yes:
+            print("Команда отменена")
+            return
+
+        template = dict(t_data)
+        date_format = self.config()["date_format"]
+        instances_count = self.config()["batch_instances_count"]
+        self.execute_in_background(
+            lambda: stamp_files(filepaths, template, date_format, instances_count),
+            "Заполнение основных надписей",
+        )
 
     def _get_current_template(self):
         if len(self.config()["templates"]) == 0:
@@ -278,17 +278,29 @@ class WeldingMacros(Macros):
     def _create_welds(self) -> None:
         if not self._check_for_weldpart(): return
         wls = self._get_active_spec()
-        create_welds(self._welddoc_path, wls, False, self.config()["prefix"])
+        welddoc_path, prefix = self._welddoc_path, self.config()["prefix"]
+        self.execute_in_background(
+            lambda: create_welds(welddoc_path, wls, False, prefix),
+            "Создание сварных швов",
+        )
 
     def _create_welds_lines(self) -> None:
         if not self._check_for_weldpart(): return
         wls = self._get_active_spec()
-        create_welds(self._welddoc_path, wls, True, self.config()["prefix"])
+        welddoc_path, prefix = self._welddoc_path, self.config()["prefix"]
+        self.execute_in_background(
+            lambda: create_welds(welddoc_path, wls, True, prefix),
+            "Создание линий сварных швов",
+        )
 
     def _create_welds_bodies(self) -> None:
         if not self._check_for_weldpart(): return
         wls = self._get_active_spec()
-        find_and_create_weld_bodies(self._welddoc_path, wls, True, self.config()["prefix"])
+        welddoc_path, prefix = self._welddoc_path, self.config()["prefix"]
+        self.execute_in_background(
+            lambda: find_and_create_weld_bodies(welddoc_path, wls, True, prefix),
+            "Создание тел сварных швов",
+        )
 
     def _change_welddoc_path(self) -> None:
         try:
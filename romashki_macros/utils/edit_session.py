@@ -0,0 +1,198 @@
+"""
+Модуль предоставляет класс `EditSession` - сеанс редактирования таблицы
+во внешней программе (LibreOffice Calc, Excel) с определением измененных строк.
+
+При выгрузке таблицы (`EditSession.export()`) для каждой строки запоминается
+хэш ее значений по ключу - значению ключевого столбца (например, пути к файлу).
+При повторном чтении (`EditSession.collect_changes()`) возвращаются только строки,
+которые были изменены или добавлены пользователем, поэтому применять нужно
+только их. После применения строки отмечаются примененными
+(`EditSession.mark_applied()`), и при следующем чтении они уже не считаются измененными.
+
+Метод `EditSession.watch()` отслеживает сохранения файла и применяет изменения
+по мере сохранения, пока файл открыт в редакторе.
+
+Пример применения:
+```python
+session = EditSession("D:\\Temp\\123.ods", "PROPERTIES", key_column=2)
+session.export(rows)
+session.open_for_edit()
+rows = session.collect_changes()
+session.mark_applied(apply(rows))
+```
+
+"""
+
+import hashlib
+import os
+import threading
+import time
+import typing
+
+from .sheet_stream import iter_sheet_rows, open_sheet_writer
+
+
+WATCH_POLL_INTERVAL = 1.0
+""" период проверки времени изменения файла, с """
+
+WATCH_SETTLE_TIME = 0.5
+""" время, в течение которого файл не должен изменяться, чтобы считаться сохраненным, с """
+
+
+def normalize_row(row: typing.Sequence) -> tuple[str, ...]:
+    """
+    Приводит строку таблицы к виду для сравнения: значения - к строкам
+    (`None` - к пустой строке, целые числа без `.0`), пустые значения в конце отбрасываются.
+    """
+    values = []
+    for value in row:
+        if value is None:
+            value = ""
+        elif isinstance(value, float) and value.is_integer():
+            value = int(value)
+        values.append(str(value))
+    while len(values) != 0 and values[-1] == "":
+        values.pop()
+    return tuple(values)
+
+
+def get_row_hash(row: typing.Sequence) -> str:
+    """
+    Возвращает хэш значений строки таблицы (см. `normalize_row()`).
+    """
+    return hashlib.sha1("\x1f".join(normalize_row(row)).encode("utf-8")).hexdigest()
+
+
+def normalize_key(value: typing.Any) -> str:
+    """
+    Приводит значение ключевого столбца (путь к файлу) к виду для сравнения.
+    """
+    value = "" if value is None else str(value).strip()
+    if value == "":
+        return ""
+    return os.path.normcase(os.path.normpath(value))
+
+
+class EditSession:
+    """
+    Сеанс редактирования листа `sheet_name` таблицы `filepath` (ODS, XLSX или CSV).
+
+    Строки идентифицируются по значению столбца `key_column` (номер с нуля);
+    строки с пустым ключом игнорируются.
+    """
+    def __init__(self, filepath: str, sheet_name: str = "Sheet1", key_column: int = 0) -> None:
+        self.filepath: str = filepath
+        self.sheet_name: str = sheet_name
+        self.key_column: int = key_column
+
+        self._hashes: dict[str, str] = {}
+        """ `{ключ: хэш последней выгруженной или примененной строки}` """
+        self._file_state: tuple[int, int] | None = None
+        """ `(st_mtime_ns, st_size)` файла на момент последнего чтения или записи """
+
+    def _get_key(self, row: typing.Sequence) -> str:
+        return normalize_key(row[self.key_column]) if len(row) > self.key_column else ""
+
+    def _get_file_state(self) -> tuple[int, int] | None:
+        try:
+            st = os.stat(self.filepath)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def export(self, rows: typing.Iterable[typing.Sequence]) -> int:
+        """
+        Записывает строки `rows` в файл и запоминает их хэши.
+        Возвращает количество записанных строк.
+        """
+        self._hashes.clear()
+        count = 0
+        with open_sheet_writer(self.filepath, self.sheet_name) as w:
+            for row in rows:
+                w.write_row(row)
+                key = self._get_key(row)
+                if key != "":
+                    self._hashes[key] = get_row_hash(row)
+                count += 1
+        self._file_state = self._get_file_state()
+        return count
+
+    def open_for_edit(self) -> bool:
+        """
+        Открывает файл в программе, ассоциированной с его расширением.
+        """
+        from . import ods_utils
+        return ods_utils.open_for_edit(self.filepath)
+
+    def is_modified(self) -> bool:
+        """
+        Возвращает `True`, если файл был изменен (сохранен) с момента последнего чтения или записи.
+        """
+        state = self._get_file_state()
+        return state is not None and state != self._file_state
+
+    def collect_changes(self) -> list[list]:
+        """
+        Читает файл и возвращает строки, которые отличаются от выгруженных
+        или ранее примененных, а также новые строки (с ключом, которого не было).
+
+        Если один ключ встречается в файле несколько раз, возвращаются
+        все измененные строки с этим ключом.
+        """
+        state = self._get_file_state()
+        changed: list[list] = []
+        for row in iter_sheet_rows(self.filepath, self.sheet_name):
+            key = self._get_key(row)
+            if key == "":
+                continue
+            if self._hashes.get(key) != get_row_hash(row):
+                changed.append(list(row))
+        self._file_state = state
+        return changed
+
+    def mark_applied(self, rows: typing.Iterable[typing.Sequence]) -> None:
+        """
+        Отмечает строки `rows` примененными: при следующем чтении
+        они не будут считаться измененными.
+        """
+        for row in rows:
+            key = self._get_key(row)
+            if key != "":
+                self._hashes[key] = get_row_hash(row)
+
+    def watch(
+            self,
+            on_changes: typing.Callable[[list[list]], typing.Iterable[typing.Sequence]],
+            stop_event: threading.Event,
+            poll_interval: float = WATCH_POLL_INTERVAL,
+            settle_time: float = WATCH_SETTLE_TIME,
+            ) -> None:
+        """
+        Отслеживает сохранения файла до установки события `stop_event`.
+
+        После каждого сохранения читает измененные строки и, если они есть,
+        вызывает `on_changes(rows)`; функция должна вернуть успешно примененные
+        строки, они отмечаются примененными (см. `mark_applied()`).
+
+        Функция `on_changes()` вызывается в том же потоке, в котором вызван `watch()`.
+        Если файл еще не дописан редактором и не читается, чтение повторяется
+        при следующей проверке.
+        """
+        while not stop_event.wait(poll_interval):
+            if not self.is_modified():
+                continue
+
+            state = self._get_file_state()
+            time.sleep(settle_time)
+            if self._get_file_state() != state:
+                continue
+
+            try:
+                rows = self.collect_changes()
+            except Exception as e:
+                print(f"Не удается прочитать файл '{self.filepath}': {e}")
+                continue
+
+            if len(rows) != 0:
+                print(f"Файл сохранен, измененных строк: {len(rows)}")
+                self.mark_applied(on_changes(rows))
@@ -0,0 +1,222 @@
+"""
+Модуль предоставляет класс `FileCatalog` - каталог файлов папки проекта
+с индексом "имя файла -> пути к файлам".
+
+Каталог строится обходом папок через `os.scandir()` и может сохраняться
+в JSON-файл кэша. При повторном сканировании содержимое папки берется из кэша,
+если время изменения папки (`st_mtime_ns`) не изменилось, поэтому заново
+читаются только папки, в которых появились, удалились или переименовались файлы.
+Это существенно ускоряет повторное сканирование больших сетевых папок.
+
+Пример применения:
+```python
+catalog = FileCatalog("D:\\Project", (".m3d", ".a3d"), "D:\\Temp\\catalog.json")
+catalog.scan()
+print(catalog.find("Деталь.m3d"))
+```
+
+"""
+
+import hashlib
+import json
+import os
+import typing
+
+
+CACHE_VERSION = 1
+
+
+class _DirRecord:
+    __slots__ = ("mtime_ns", "files", "subdirs")
+
+    def __init__(self, mtime_ns: int, files: list[str], subdirs: list[str]) -> None:
+        self.mtime_ns: int = mtime_ns
+        self.files: list[str] = files
+        """ имена файлов папки (без пути) """
+        self.subdirs: list[str] = subdirs
+        """ имена вложенных папок (без пути) """
+
+
+def normalize_basename(basename: str) -> str:
+    """
+    Приводит имя файла к виду для поиска в индексе
+    (без учета регистра в Windows, см. `os.path.normcase()`).
+    """
+    return os.path.normcase(basename)
+
+
+def get_cache_filepath(cache_folder: str, root: str) -> str:
+    """
+    Возвращает путь к файлу кэша каталога папки `root` в папке `cache_folder`.
+    """
+    digest = hashlib.sha1(os.path.normcase(os.path.abspath(root)).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_folder, f"file_catalog_{digest}.json")
+
+
+class FileCatalog:
+    """
+    Каталог файлов папки `root` (рекурсивно) с индексом "имя файла -> пути".
+
+    Если задан кортеж расширений `extensions` (например, `(".m3d", ".a3d")`),
+    в индекс попадают только файлы с этими расширениями; кэш при этом хранит
+    все файлы, поэтому один файл кэша можно использовать с разными фильтрами.
+
+    Если задан путь `cache_filepath`, то `scan()` загружает кэш перед
+    сканированием и сохраняет его после.
+    """
+    def __init__(self, root: str, extensions: typing.Iterable[str] = (), cache_filepath: str = "") -> None:
+        self.root: str = os.path.normpath(os.path.abspath(root))
+        self.extensions: tuple[str, ...] = tuple(e.lower() for e in extensions)
+        self.cache_filepath: str = cache_filepath
+
+        self._dirs: dict[str, _DirRecord] = {}
+        self._by_basename: dict[str, list[str]] = {}
+        self._files_count: int = 0
+
+        self.rescanned_dirs_count: int = 0
+        """ количество папок, прочитанных заново при последнем сканировании """
+
+    def scan(self) -> 'FileCatalog':
+        """
+        Сканирует папку `root`, используя кэш для неизмененных папок,
+        и перестраивает индекс. Возвращает `self`.
+        """
+        if not os.path.isdir(self.root):
+            raise Exception(f"Папка не существует: '{self.root}'")
+
+        if self.cache_filepath != "" and len(self._dirs) == 0:
+            self.load_cache()
+
+        old_dirs = self._dirs
+        new_dirs: dict[str, _DirRecord] = {}
+        self.rescanned_dirs_count = 0
+
+        stack: list[str] = [self.root]
+        while len(stack) != 0:
+            dirpath = stack.pop()
+            try:
+                mtime_ns = os.stat(dirpath).st_mtime_ns
+            except OSError:
+                continue
+
+            record = old_dirs.get(dirpath)
+            if record is None or record.mtime_ns != mtime_ns:
+                record = self._read_dir(dirpath, mtime_ns)
+                if record is None:
+                    continue
+                self.rescanned_dirs_count += 1
+
+            new_dirs[dirpath] = record
+            for subdir in reversed(record.subdirs):
+                stack.append(os.path.join(dirpath, subdir))
+
+        self._dirs = new_dirs
+        self._build_index()
+
+        if self.cache_filepath != "":
+            self.save_cache()
+        return self
+
+    @staticmethod
+    def _read_dir(dirpath: str, mtime_ns: int) -> _DirRecord | None:
+        files: list[str] = []
+        subdirs: list[str] = []
+        try:
+            with os.scandir(dirpath) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.name)
+                        elif entry.is_file():
+                            files.append(entry.name)
+                    except OSError:
+                        pass
+        except OSError as e:
+            print(f"Не удается прочитать папку '{dirpath}': {e}")
+            return None
+        files.sort()
+        subdirs.sort()
+        return _DirRecord(mtime_ns, files, subdirs)
+
+    def _build_index(self) -> None:
+        by_basename: dict[str, list[str]] = {}
+        files_count = 0
+        for dirpath, record in self._dirs.items():
+            for name in record.files:
+                if len(self.extensions) != 0 and not name.lower().endswith(self.extensions):
+                    continue
+                by_basename.setdefault(normalize_basename(name), []).append(os.path.join(dirpath, name))
+                files_count += 1
+        for paths in by_basename.values():
+            paths.sort()
+        self._by_basename = by_basename
+        self._files_count = files_count
+
+    def load_cache(self) -> bool:
+        """
+        Загружает содержимое папок из файла кэша. Возвращает `True`, если кэш загружен.
+        """
+        try:
+            with open(self.cache_filepath, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != CACHE_VERSION or data.get("root") != self.root:
+                return False
+            self._dirs = {
+                dirpath: _DirRecord(mtime_ns, files, subdirs)
+                for dirpath, (mtime_ns, files, subdirs) in data["dirs"].items()
+            }
+            return True
+        except (OSError, ValueError, KeyError, TypeError):
+            self._dirs = {}
+            return False
+
+    def save_cache(self) -> None:
+        """
+        Сохраняет содержимое папок в файл кэша.
+        """
+        data = {
+            "version": CACHE_VERSION,
+            "root": self.root,
+            "dirs": {
+                dirpath: [record.mtime_ns, record.files, record.subdirs]
+                for dirpath, record in self._dirs.items()
+            },
+        }
+        folder = os.path.dirname(os.path.abspath(self.cache_filepath))
+        os.makedirs(folder, exist_ok=True)
+        tmp_path = self.cache_filepath + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_filepath)
+
+    def find(self, basename: str) -> list[str]:
+        """
+        Возвращает отсортированный список путей ко всем файлам с именем `basename`.
+        """
+        return list(self._by_basename.get(normalize_basename(basename), []))
+
+    def find_first(self, basename: str) -> str:
+        """
+        Возвращает путь к первому найденному файлу с именем `basename` или `""`.
+        """
+        paths = self._by_basename.get(normalize_basename(basename))
+        return paths[0] if paths else ""
+
+    def iterate_paths(self) -> typing.Iterator[str]:
+        """
+        Итерирует по путям всех файлов каталога (с учетом фильтра расширений).
+        """
+        for paths in self._by_basename.values():
+            yield from paths
+
+    def iterate_dirs(self) -> typing.Iterator[str]:
+        """
+        Итерирует по путям всех папок каталога (включая `root`).
+        """
+        return iter(self._dirs.keys())
+
+    def __contains__(self, basename: str) -> bool:
+        return normalize_basename(basename) in self._by_basename
+
+    def __len__(self) -> int:
+        return self._files_count
@@ -0,0 +1,343 @@
+"""
+Модуль предоставляет функционал для уплотнения (компактизации) плоской геометрии:
+отрезков, дуг и окружностей, --- перед сохранением её во фрагмент или DXF.
+
+Ассоциативные виды разверток часто содержат разбитые на части коллинеарные
+отрезки, продублированные дуги на линиях сгиба и отрезки нулевой длины. Функция
+`compact()` в пределах заданного допуска:
+* удаляет "осколки" (отрезки и дуги длиной меньше допуска);
+* удаляет дубликаты и перекрытия;
+* объединяет коллинеарные соприкасающиеся отрезки в один отрезок;
+* объединяет соосные дуги одного радиуса в одну дугу (или в окружность,
+если дуги замыкаются).
+
+Поиск "соседей" выполняется через пространственный хэш (`SpatialHash`), поэтому
+время работы близко к линейному от количества объектов.
+
+Модуль не зависит от Компас-API: объекты передаются в виде простых записей
+`Segment`, `Arc`, `Circle`.
+
+"""
+
+import math
+import typing
+
+
+DEFAULT_TOLERANCE = 0.01
+""" Допуск по умолчанию, мм """
+
+
+class Segment:
+    """ Отрезок `(x1, y1) - (x2, y2)` со стилем линии `style`. """
+    __slots__ = ("x1", "y1", "x2", "y2", "style")
+
+    def __init__(self, x1: float, y1: float, x2: float, y2: float, style: int = 0) -> None:
+        self.x1: float = x1
+        self.y1: float = y1
+        self.x2: float = x2
+        self.y2: float = y2
+        self.style: int = style
+
+    def length(self) -> float:
+        return math.hypot(self.x2 - self.x1, self.y2 - self.y1)
+
+    def __repr__(self) -> str:
+        return f"Segment({self.x1}, {self.y1}, {self.x2}, {self.y2}, style={self.style})"
+
+
+class Arc:
+    """
+    Дуга окружности с центром `(xc, yc)` и радиусом `radius`
+    от угла `angle1` до угла `angle2` (в градусах).
+
+    `direction == True` --- против часовой стрелки (как `KAPI7.IArc.Direction`).
+    """
+    __slots__ = ("xc", "yc", "radius", "angle1", "angle2", "direction", "style")
+
+    def __init__(
+            self,
+            xc: float,
+            yc: float,
+            radius: float,
+            angle1: float,
+            angle2: float,
+            direction: bool = True,
+            style: int = 0,
+            ) -> None:
+        self.xc: float = xc
+        self.yc: float = yc
+        self.radius: float = radius
+        self.angle1: float = angle1
+        self.angle2: float = angle2
+        self.direction: bool = direction
+        self.style: int = style
+
+    def ccw_interval(self) -> tuple[float, float]:
+        """
+        Возвращает угловой интервал дуги `(start, sweep)` в радианах,
+        отсчитываемый против часовой стрелки; `0 <= start < 2*pi`.
+        """
+        a1, a2 = math.radians(self.angle1), math.radians(self.angle2)
+        if not self.direction:
+            a1, a2 = a2, a1
+        start = a1 % math.tau
+        sweep = (a2 - a1) % math.tau
+        if sweep == 0 and not math.isclose(a1, a2):
+            sweep = math.tau
+        return (start, sweep)
+
+    def length(self) -> float:
+        return self.radius * self.ccw_interval()[1]
+
+    def __repr__(self) -> str:
+        return f"Arc({self.xc}, {self.yc}, r={self.radius}, {self.angle1}..{self.angle2}, dir={self.direction}, style={self.style})"
+
+
+class Circle:
+    """ Окружность с центром `(xc, yc)` и радиусом `radius`. """
+    __slots__ = ("xc", "yc", "radius", "style")
+
+    def __init__(self, xc: float, yc: float, radius: float, style: int = 0) -> None:
+        self.xc: float = xc
+        self.yc: float = yc
+        self.radius: float = radius
+        self.style: int = style
+
+    def __repr__(self) -> str:
+        return f"Circle({self.xc}, {self.yc}, r={self.radius}, style={self.style})"
+
+
+class CompactionReport:
+    """
+    Отчет о результатах уплотнения геометрии (см. `compact()`).
+    """
+    def __init__(self) -> None:
+        self.count_before: int = 0
+        self.count_after: int = 0
+        self.slivers_removed: int = 0
+        """ удалено "осколков" --- отрезков и дуг длиной меньше допуска """
+        self.segments_merged: int = 0
+        """ на сколько уменьшилось количество отрезков при объединении (включая дубликаты) """
+        self.arcs_merged: int = 0
+        """ на сколько уменьшилось количество дуг и окружностей при объединении (включая дубликаты) """
+
+    def removed(self) -> int:
+        """ Общее количество удаленных объектов. """
+        return self.count_before - self.count_after
+
+    def __str__(self) -> str:
+        return (
+            f"Уплотнение геометрии: было объектов {self.count_before}, стало {self.count_after}, "
+            f"удалено {self.removed()} (осколков: {self.slivers_removed}, "
+            f"объединено отрезков: {self.segments_merged}, дуг и окружностей: {self.arcs_merged})."
+        )
+
+
+class SpatialHash:
+    """
+    Пространственный хэш: равномерная сетка с ячейками размером `cell_size`.
+
+    Позволяет найти объекты, привязанные к точкам, в окрестности заданной точки
+    радиусом не более `cell_size`, проверяя лишь 9 соседних ячеек.
+    """
+    def __init__(self, cell_size: float) -> None:
+        assert cell_size > 0
+        self._cell_size: float = cell_size
+        self._cells: dict[tuple[int, int], list[tuple[float, float, typing.Any]]] = {}
+
+    def _key(self, x: float, y: float) -> tuple[int, int]:
+        return (math.floor(x / self._cell_size), math.floor(y / self._cell_size))
+
+    def insert(self, x: float, y: float, item: typing.Any) -> None:
+        self._cells.setdefault(self._key(x, y), []).append((x, y, item))
+
+    def query(self, x: float, y: float, radius: float | None = None) -> typing.Iterator[typing.Any]:
+        """
+        Итерирует по объектам, находящимся на расстоянии не более `radius`
+        (по умолчанию --- `cell_size`) от точки `(x, y)`.
+        """
+        if radius is None:
+            radius = self._cell_size
+        assert radius <= self._cell_size
+        i0, j0 = self._key(x, y)
+        for i in (i0 - 1, i0, i0 + 1):
+            for j in (j0 - 1, j0, j0 + 1):
+                for px, py, item in self._cells.get((i, j), ()):
+                    if math.hypot(px - x, py - y) <= radius:
+                        yield item
+
+
+def _merge_intervals(intervals: list[tuple[float, float]], gap: float) -> list[tuple[float, float]]:
+    """
+    Объединяет перекрывающиеся и соприкасающиеся (с зазором не более `gap`)
+    интервалы `(start, end)`.
+    """
+    merged: list[list[float]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + gap:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(s, e) for s, e in merged]
+
+
+def _compact_segments(segments: list[Segment], tolerance: float, report: CompactionReport) -> list[Segment]:
+    if len(segments) == 0:
+        return []
+
+    # Отрезки группируются по прямым. Прямая описывается точкой
+    # `(theta * scale, offset)`, где `theta` в [0, pi) --- угол направления,
+    # `offset` --- расстояние от начала координат до прямой со знаком, а `scale` ---
+    # характерный размер геометрии, так что отклонение по углу на `tolerance / scale`
+    # на всём поле чертежа дает смещение не более `tolerance`.
+    scale = max(max(abs(s.x1), abs(s.y1), abs(s.x2), abs(s.y2)) for s in segments)
+    scale = max(scale, tolerance)
+    period = math.pi * scale
+
+    hashes: dict[int, SpatialHash] = {}
+    groups: list[tuple[float, float, float, list[Segment]]] = []  # (ux, uy, offset, segments)
+
+    for s in segments:
+        dx, dy = s.x2 - s.x1, s.y2 - s.y1
+        theta = math.atan2(dy, dx) % math.pi
+        ux, uy = math.cos(theta), math.sin(theta)
+        offset = s.x1 * -uy + s.y1 * ux
+        key_x = theta * scale
+
+        sh = hashes.setdefault(s.style, SpatialHash(tolerance))
+
+        group = None
+        for group_index in sh.query(key_x, offset):
+            group = groups[group_index]
+            break
+        if group is None:
+            group = (ux, uy, offset, [])
+            sh.insert(key_x, offset, len(groups))
+            # прямые с углом около 0 и около pi совпадают; при этом смещение меняет знак
+            if key_x < tolerance:
+                sh.insert(key_x + period, -offset, len(groups))
+            elif key_x > period - tolerance:
+                sh.insert(key_x - period, -offset, len(groups))
+            groups.append(group)
+        group[3].append(s)
+
+    result: list[Segment] = []
+    for ux, uy, offset, group_segments in groups:
+        ox, oy = -uy * offset, ux * offset
+        intervals = []
+        for s in group_segments:
+            t1 = s.x1 * ux + s.y1 * uy
+            t2 = s.x2 * ux + s.y2 * uy
+            intervals.append((min(t1, t2), max(t1, t2)))
+        merged = _merge_intervals(intervals, tolerance)
+        style = group_segments[0].style
+        if len(merged) == len(group_segments):
+            result.extend(group_segments)  # объединять нечего - координаты остаются исходными
+            continue
+        for t1, t2 in merged:
+            result.append(Segment(ox + ux * t1, oy + uy * t1, ox + ux * t2, oy + uy * t2, style))
+        report.segments_merged += len(group_segments) - len(merged)
+    return result
+
+
+def _compact_arcs(
+        arcs: list[Arc],
+        circles: list[Circle],
+        tolerance: float,
+        report: CompactionReport,
+        ) -> tuple[list[Arc], list[Circle]]:
+    hashes: dict[int, SpatialHash] = {}
+    groups: list[tuple[float, float, float, int, list[Arc], list[Circle]]] = []
+
+    def _find_group(xc: float, yc: float, radius: float, style: int):
+        sh = hashes.setdefault(style, SpatialHash(tolerance))
+        for group_index in sh.query(xc, yc):
+            group = groups[group_index]
+            if abs(group[2] - radius) <= tolerance:
+                return group
+        group = (xc, yc, radius, style, [], [])
+        sh.insert(xc, yc, len(groups))
+        groups.append(group)
+        return group
+
+    for c in circles:
+        _find_group(c.xc, c.yc, c.radius, c.style)[5].append(c)
+    for a in arcs:
+        _find_group(a.xc, a.yc, a.radius, a.style)[4].append(a)
+
+    result_arcs: list[Arc] = []
+    result_circles: list[Circle] = []
+
+    for xc, yc, radius, style, group_arcs, group_circles in groups:
+        count_before = len(group_arcs) + len(group_circles)
+
+        if len(group_circles) > 0:
+            # окружность перекрывает все дуги и другие окружности
+            result_circles.append(group_circles[0])
+            report.arcs_merged += count_before - 1
+            continue
+
+        gap = tolerance / radius
+        intervals: list[tuple[float, float]] = []
+        for a in group_arcs:
+            start, sweep = a.ccw_interval()
+            intervals.append((start, start + sweep))
+            if start + sweep > math.tau:  # дуга переходит через угол 0
+                intervals.append((start - math.tau, start + sweep - math.tau))
+        merged = _merge_intervals(intervals, gap)
+
+        # отсечение частей, вышедших за пределы [0, 2*pi), и склейка через угол 0
+        clipped = [(max(s, 0.0), min(e, math.tau)) for s, e in merged if e > 0 and s < math.tau]
+        clipped = _merge_intervals(clipped, gap)
+        if len(clipped) >= 2 and clipped[0][0] <= gap and clipped[-1][1] >= math.tau - gap:
+            first = clipped.pop(0)
+            last = clipped.pop()
+            clipped.append((last[0], first[1] + math.tau))
+
+        if len(clipped) == 1 and clipped[0][1] - clipped[0][0] >= math.tau - gap:
+            result_circles.append(Circle(xc, yc, radius, style))
+            report.arcs_merged += count_before - 1
+            continue
+
+        if len(clipped) == len(group_arcs):
+            result_arcs.extend(group_arcs)  # объединять нечего
+            continue
+
+        for s, e in clipped:
+            result_arcs.append(Arc(xc, yc, radius, math.degrees(s) % 360, math.degrees(e) % 360, True, style))
+        report.arcs_merged += count_before - len(clipped)
+
+    return result_arcs, result_circles
+
+
+def compact(
+        segments: list[Segment],
+        arcs: list[Arc],
+        circles: list[Circle],
+        tolerance: float = DEFAULT_TOLERANCE,
+        ) -> tuple[list[Segment], list[Arc], list[Circle], CompactionReport]:
+    """
+    Уплотняет геометрию в пределах допуска `tolerance`:
+    удаляет "осколки", дубликаты и перекрытия, объединяет коллинеарные отрезки
+    и соосные дуги одного радиуса. Объекты разных стилей линий не объединяются.
+
+    Возвращает новые списки отрезков, дуг и окружностей и отчет `CompactionReport`.
+    Исходные списки не изменяются.
+    """
+    if tolerance <= 0:
+        raise Exception("Допуск должен быть положительным числом")
+
+    report = CompactionReport()
+    report.count_before = len(segments) + len(arcs) + len(circles)
+
+    kept_segments = [s for s in segments if s.length() >= tolerance]
+    kept_arcs = [a for a in arcs if a.radius >= tolerance and a.length() >= tolerance]
+    kept_circles = [c for c in circles if c.radius >= tolerance]
+    report.slivers_removed = report.count_before - len(kept_segments) - len(kept_arcs) - len(kept_circles)
+
+    new_segments = _compact_segments(kept_segments, tolerance, report)
+    new_arcs, new_circles = _compact_arcs(kept_arcs, kept_circles, tolerance, report)
+
+    report.count_after = len(new_segments) + len(new_arcs) + len(new_circles)
+    return new_segments, new_arcs, new_circles, report
@@ -1,6 +1,10 @@
 """
 Модуль предоставляет удобные функции для работы с файлами ODS (OpenDocument Spreadsheet).
 
+Функции модуля загружают таблицу в память целиком. Для больших таблиц
+следует использовать построчные чтение и запись из модуля `sheet_stream`
+(там же поддерживаются форматы XLSX и CSV).
+
 """
 
 from collections import OrderedDict  # for ods3
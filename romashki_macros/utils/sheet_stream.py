@@ -0,0 +1,469 @@
+"""
+Модуль предоставляет построчное (потоковое) чтение и запись таблиц
+в форматах ODS, XLSX и CSV без загрузки всей таблицы в память.
+
+В отличие от `ods_utils` (через `pyexcel_ods3` таблица целиком загружается
+в `OrderedDict` списков), здесь:
+* чтение ODS и XLSX выполняется разбором XML-потока из ZIP-архива
+    (`zipfile` + `xml.etree.ElementTree.iterparse`), строки возвращаются генератором;
+* запись ODS и XLSX выполняется построчно прямо в ZIP-архив;
+* для CSV используется модуль `csv` (разделитель `;`, кодировка UTF-8 с BOM,
+    как принято для открытия в Excel).
+
+Формат определяется по расширению файла (см. `iter_sheet_rows()`, `open_sheet_writer()`).
+
+Пример применения:
+```python
+with open_sheet_writer("table.ods", "PROPERTIES") as w:
+    for row in rows:
+        w.write_row(row)
+
+for row in iter_sheet_rows("table.ods", "PROPERTIES"):
+    ...
+```
+
+Используется только стандартная библиотека Python.
+
+"""
+
+import csv
+import os
+import re
+import typing
+import zipfile
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape, quoteattr
+
+
+CSV_DELIMITER = ";"
+CSV_ENCODING = "utf-8-sig"
+
+NS_OFFICE = "urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+NS_TABLE = "urn:oasis:names:tc:opendocument:xmlns:table:1.0"
+NS_TEXT = "urn:oasis:names:tc:opendocument:xmlns:text:1.0"
+
+NS_XLSX_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_XLSX_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+
+def _number(value: str) -> int | float:
+    f = float(value)
+    return int(f) if f.is_integer() and abs(f) < 2 ** 53 else f
+
+
+def _trim_row(row: list) -> list:
+    while len(row) != 0 and (row[-1] is None or row[-1] == ""):
+        row.pop()
+    return row
+
+
+def _sheet_format(filepath: str) -> str:
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext in (".ods", ".xlsx", ".csv"):
+        return ext[1:]
+    raise Exception(f"Неподдерживаемый формат таблицы: '{filepath}'")
+
+
+
+########## ODS ##########
+
+
+def _odf_cell_text(cell: ElementTree.Element) -> str:
+    def _inline(el: ElementTree.Element, parts: list[str]) -> None:
+        if el.text:
+            parts.append(el.text)
+        for child in el:
+            if child.tag == f"{{{NS_TEXT}}}s":
+                parts.append(" " * int(child.get(f"{{{NS_TEXT}}}c", "1")))
+            elif child.tag == f"{{{NS_TEXT}}}tab":
+                parts.append("\t")
+            elif child.tag == f"{{{NS_TEXT}}}line-break":
+                parts.append("\n")
+            else:
+                _inline(child, parts)
+            if child.tail:
+                parts.append(child.tail)
+
+    paragraphs = []
+    for p in cell.iter(f"{{{NS_TEXT}}}p"):
+        parts: list[str] = []
+        _inline(p, parts)
+        paragraphs.append("".join(parts))
+    return "\n".join(paragraphs)
+
+
+def _odf_cell_value(cell: ElementTree.Element) -> typing.Any:
+    value_type = cell.get(f"{{{NS_OFFICE}}}value-type")
+    if value_type in ("float", "percentage", "currency"):
+        return _number(cell.get(f"{{{NS_OFFICE}}}value", "0"))
+    if value_type == "boolean":
+        return cell.get(f"{{{NS_OFFICE}}}boolean-value") == "true"
+    return _odf_cell_text(cell)
+
+
+def iter_ods_rows(filepath: str, sheet_name: str = "Sheet1") -> typing.Iterator[list]:
+    """
+    Генератор строк листа `sheet_name` ODS-файла `filepath`.
+
+    Пустые ячейки в конце строк отбрасываются; пустые строки в конце листа
+    (в т.ч. "повторенные" строки, которые записывает LibreOffice) не возвращаются.
+    """
+    tag_table = f"{{{NS_TABLE}}}table"
+    tag_row = f"{{{NS_TABLE}}}table-row"
+    tag_cells = (f"{{{NS_TABLE}}}table-cell", f"{{{NS_TABLE}}}covered-table-cell")
+    attr_name = f"{{{NS_TABLE}}}name"
+    attr_cols_repeated = f"{{{NS_TABLE}}}number-columns-repeated"
+    attr_rows_repeated = f"{{{NS_TABLE}}}number-rows-repeated"
+
+    is_found = False
+    with zipfile.ZipFile(filepath) as zf, zf.open("content.xml") as f:
+        in_sheet = False
+        pending_empty_rows = 0
+        for event, el in ElementTree.iterparse(f, events=("start", "end")):
+            if el.tag == tag_table:
+                if event == "start":
+                    in_sheet = el.get(attr_name) == sheet_name
+                    is_found = is_found or in_sheet
+                else:
+                    el.clear()
+                    if in_sheet:
+                        break
+                continue
+
+            if not in_sheet or event != "end":
+                continue
+
+            if el.tag == tag_row:
+                row: list = []
+                pending_empty_cells = 0  # пустые ячейки добавляются, только если за ними есть непустые
+                for cell in el:
+                    if not cell.tag in tag_cells:
+                        continue
+                    value = _odf_cell_value(cell)
+                    repeated_cells = int(cell.get(attr_cols_repeated, "1"))
+                    if value == "":
+                        pending_empty_cells += repeated_cells
+                        continue
+                    row.extend([""] * pending_empty_cells)
+                    pending_empty_cells = 0
+                    row.extend([value] * repeated_cells)
+                repeated = int(el.get(attr_rows_repeated, "1"))
+                el.clear()
+                if len(row) == 0:
+                    pending_empty_rows += repeated
+                    continue
+                for _ in range(pending_empty_rows):
+                    yield []
+                pending_empty_rows = 0
+                for _ in range(repeated):
+                    yield list(row)
+
+    if not is_found:
+        raise Exception(f"No sheet {repr(sheet_name)} in ODS file {repr(filepath)}")
+
+
+def _odf_text_xml(s: str) -> str:
+    paragraphs = []
+    for line in s.split("\n"):
+        def _spaces(m: re.Match) -> str:
+            n = len(m.group(0))
+            if m.start() == 0:
+                return f'<text:s text:c="{n}"/>'
+            return " " if n == 1 else f' <text:s text:c="{n - 1}"/>'
+        line = re.sub(r" +", _spaces, escape(line)).replace("\t", "<text:tab/>")
+        paragraphs.append(f"<text:p>{line}</text:p>")
+    return "".join(paragraphs)
+
+
+class OdsStreamWriter:
+    """
+    Построчная запись таблицы с одним листом `sheet_name` в ODS-файл `filepath`.
+    """
+    def __init__(self, filepath: str, sheet_name: str = "Sheet1") -> None:
+        self.filepath: str = filepath
+        self._zf = zipfile.ZipFile(filepath, "w", zipfile.ZIP_DEFLATED)
+        self._zf.writestr(zipfile.ZipInfo("mimetype"), "application/vnd.oasis.opendocument.spreadsheet", zipfile.ZIP_STORED)
+        self._zf.writestr(
+            "META-INF/manifest.xml",
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<manifest:manifest xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0" manifest:version="1.2">'
+            '<manifest:file-entry manifest:full-path="/" manifest:media-type="application/vnd.oasis.opendocument.spreadsheet"/>'
+            '<manifest:file-entry manifest:full-path="content.xml" manifest:media-type="text/xml"/>'
+            '</manifest:manifest>',
+        )
+        self._f = self._zf.open("content.xml", "w")
+        self._write(
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            f'<office:document-content xmlns:office="{NS_OFFICE}" xmlns:table="{NS_TABLE}" xmlns:text="{NS_TEXT}" office:version="1.2">'
+            f'<office:body><office:spreadsheet><table:table table:name={quoteattr(sheet_name)}>'
+        )
+
+    def _write(self, s: str) -> None:
+        self._f.write(s.encode("utf-8"))
+
+    def write_row(self, row: typing.Iterable) -> None:
+        cells = []
+        for value in row:
+            if value is None or value == "":
+                cells.append("<table:table-cell/>")
+            elif isinstance(value, bool):
+                cells.append(f'<table:table-cell office:value-type="boolean" office:boolean-value="{str(value).lower()}"><text:p>{str(value).upper()}</text:p></table:table-cell>')
+            elif isinstance(value, (int, float)):
+                cells.append(f'<table:table-cell office:value-type="float" office:value="{value!r}"><text:p>{value!r}</text:p></table:table-cell>')
+            else:
+                cells.append(f'<table:table-cell office:value-type="string">{_odf_text_xml(str(value))}</table:table-cell>')
+        if len(cells) == 0:
+            cells.append("<table:table-cell/>")
+        self._write(f"<table:table-row>{''.join(cells)}</table:table-row>")
+
+    def close(self) -> None:
+        if self._f is None:
+            return
+        self._write("</table:table></office:spreadsheet></office:body></office:document-content>")
+        self._f.close()
+        self._zf.close()
+        self._f = None
+
+    def __enter__(self) -> 'OdsStreamWriter':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+
+########## XLSX ##########
+
+
+def _xlsx_column_index(ref: str) -> int:
+    n = 0
+    for ch in ref:
+        if not ch.isalpha():
+            break
+        n = n * 26 + (ord(ch.upper()) - ord("A") + 1)
+    return n - 1
+
+
+def _xlsx_column_letters(index: int) -> str:
+    letters = ""
+    index += 1
+    while index > 0:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(ord("A") + rem) + letters
+    return letters
+
+
+def _xlsx_sheet_path(zf: zipfile.ZipFile, sheet_name: str) -> str:
+    workbook = ElementTree.fromstring(zf.read("xl/workbook.xml"))
+    rels = ElementTree.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    targets = {r.get("Id"): r.get("Target") for r in rels.iter(f"{{{NS_PKG_REL}}}Relationship")}
+    for sheet in workbook.iter(f"{{{NS_XLSX_MAIN}}}sheet"):
+        if sheet.get("name") == sheet_name:
+            target = targets[sheet.get(f"{{{NS_XLSX_REL}}}id")]
+            return target.lstrip("/") if target.startswith("/") else "xl/" + target
+    raise Exception(f"No sheet {repr(sheet_name)} in XLSX file {repr(zf.filename)}")
+
+
+def iter_xlsx_rows(filepath: str, sheet_name: str = "Sheet1") -> typing.Iterator[list]:
+    """
+    Генератор строк листа `sheet_name` XLSX-файла `filepath`.
+
+    Таблица общих строк (`sharedStrings.xml`) загружается в память целиком,
+    строки листа читаются потоком.
+    """
+    tag_row = f"{{{NS_XLSX_MAIN}}}row"
+    tag_c = f"{{{NS_XLSX_MAIN}}}c"
+    tag_v = f"{{{NS_XLSX_MAIN}}}v"
+    tag_t = f"{{{NS_XLSX_MAIN}}}t"
+    tag_is = f"{{{NS_XLSX_MAIN}}}is"
+    tag_si = f"{{{NS_XLSX_MAIN}}}si"
+
+    with zipfile.ZipFile(filepath) as zf:
+        shared: list[str] = []
+        if "xl/sharedStrings.xml" in zf.namelist():
+            with zf.open("xl/sharedStrings.xml") as f:
+                for event, el in ElementTree.iterparse(f):
+                    if el.tag == tag_si:
+                        shared.append("".join(t.text or "" for t in el.iter(tag_t)))
+                        el.clear()
+
+        with zf.open(_xlsx_sheet_path(zf, sheet_name)) as f:
+            last_row_number = 0
+            for event, el in ElementTree.iterparse(f):
+                if el.tag != tag_row:
+                    continue
+                row_number = int(el.get("r", last_row_number + 1))
+                for _ in range(row_number - last_row_number - 1):
+                    yield []
+                last_row_number = row_number
+
+                row: list = []
+                for c in el.iter(tag_c):
+                    ref = c.get("r")
+                    if ref is not None:
+                        col = _xlsx_column_index(ref)
+                        row.extend([""] * (col - len(row)))
+                    t = c.get("t", "n")
+                    v = c.find(tag_v)
+                    if t == "inlineStr":
+                        is_ = c.find(tag_is)
+                        value = "".join(x.text or "" for x in is_.iter(tag_t)) if is_ is not None else ""
+                    elif v is None or v.text is None:
+                        value = ""
+                    elif t == "s":
+                        value = shared[int(v.text)]
+                    elif t == "b":
+                        value = v.text == "1"
+                    elif t == "n":
+                        value = _number(v.text)
+                    else:
+                        value = v.text
+                    row.append(value)
+                el.clear()
+                yield _trim_row(row)
+
+
+class XlsxStreamWriter:
+    """
+    Построчная запись таблицы с одним листом `sheet_name` в XLSX-файл `filepath`.
+    Строки записываются как `inlineStr` (без таблицы общих строк).
+    """
+    def __init__(self, filepath: str, sheet_name: str = "Sheet1") -> None:
+        self.filepath: str = filepath
+        self._row_number = 0
+        self._zf = zipfile.ZipFile(filepath, "w", zipfile.ZIP_DEFLATED)
+        self._zf.writestr(
+            "[Content_Types].xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            '</Types>',
+        )
+        self._zf.writestr(
+            "_rels/.rels",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            f'<Relationships xmlns="{NS_PKG_REL}">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>',
+        )
+        self._zf.writestr(
+            "xl/workbook.xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            f'<workbook xmlns="{NS_XLSX_MAIN}" xmlns:r="{NS_XLSX_REL}">'
+            f'<sheets><sheet name={quoteattr(sheet_name)} sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>',
+        )
+        self._zf.writestr(
+            "xl/_rels/workbook.xml.rels",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            f'<Relationships xmlns="{NS_PKG_REL}">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+            '</Relationships>',
+        )
+        self._f = self._zf.open("xl/worksheets/sheet1.xml", "w")
+        self._write(
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            f'<worksheet xmlns="{NS_XLSX_MAIN}"><sheetData>'
+        )
+
+    def _write(self, s: str) -> None:
+        self._f.write(s.encode("utf-8"))
+
+    def write_row(self, row: typing.Iterable) -> None:
+        self._row_number += 1
+        r = self._row_number
+        cells = []
+        for i, value in enumerate(row):
+            ref = f"{_xlsx_column_letters(i)}{r}"
+            if value is None or value == "":
+                continue
+            elif isinstance(value, bool):
+                cells.append(f'<c r="{ref}" t="b"><v>{int(value)}</v></c>')
+            elif isinstance(value, (int, float)):
+                cells.append(f'<c r="{ref}"><v>{value!r}</v></c>')
+            else:
+                cells.append(f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{escape(str(value))}</t></is></c>')
+        self._write(f'<row r="{r}">{"".join(cells)}</row>')
+
+    def close(self) -> None:
+        if self._f is None:
+            return
+        self._write("</sheetData></worksheet>")
+        self._f.close()
+        self._zf.close()
+        self._f = None
+
+    def __enter__(self) -> 'XlsxStreamWriter':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+
+########## CSV ##########
+
+
+def iter_csv_rows(filepath: str, delimiter: str = CSV_DELIMITER) -> typing.Iterator[list]:
+    """
+    Генератор строк CSV-файла `filepath`. Все значения возвращаются строками.
+    """
+    with open(filepath, "r", encoding=CSV_ENCODING, newline="") as f:
+        for row in csv.reader(f, delimiter=delimiter):
+            yield _trim_row(row)
+
+
+class CsvStreamWriter:
+    """
+    Построчная запись таблицы в CSV-файл `filepath`.
+    """
+    def __init__(self, filepath: str, delimiter: str = CSV_DELIMITER) -> None:
+        self.filepath: str = filepath
+        self._file = open(filepath, "w", encoding=CSV_ENCODING, newline="")
+        self._writer = csv.writer(self._file, delimiter=delimiter)
+
+    def write_row(self, row: typing.Iterable) -> None:
+        self._writer.writerow(["" if value is None else value for value in row])
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> 'CsvStreamWriter':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+
+def iter_sheet_rows(filepath: str, sheet_name: str = "Sheet1") -> typing.Iterator[list]:
+    """
+    Генератор строк таблицы `filepath` в формате ODS, XLSX или CSV
+    (по расширению файла). Для CSV имя листа `sheet_name` не используется.
+    """
+    fmt = _sheet_format(filepath)
+    if fmt == "ods":
+        return iter_ods_rows(filepath, sheet_name)
+    elif fmt == "xlsx":
+        return iter_xlsx_rows(filepath, sheet_name)
+    else:
+        return iter_csv_rows(filepath)
+
+
+def open_sheet_writer(filepath: str, sheet_name: str = "Sheet1") -> OdsStreamWriter | XlsxStreamWriter | CsvStreamWriter:
+    """
+    Возвращает объект для построчной записи таблицы `filepath` в формате ODS,
+    XLSX или CSV (по расширению файла). Объект следует закрыть методом `close()`
+    (или использовать в `with`).
+    """
+    fmt = _sheet_format(filepath)
+    if fmt == "ods":
+        return OdsStreamWriter(filepath, sheet_name)
+    elif fmt == "xlsx":
+        return XlsxStreamWriter(filepath, sheet_name)
+    else:
+        return CsvStreamWriter(filepath)